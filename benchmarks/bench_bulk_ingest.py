@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+物品写入吞吐对比脚本
+在临时数据库中分别通过单条接口 POST /items 和批量接口 POST /items/bulk 写入物品，
+对比每秒写入行数。
+
+运行方式：poetry run python benchmarks/bench_bulk_ingest.py --rows 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="单条写入与批量写入吞吐对比")
+    parser.add_argument("--rows", type=int, default=100000, help="批量接口写入的物品数量")
+    parser.add_argument("--single-rows", type=int, default=2000, help="单条接口写入的物品数量")
+    args = parser.parse_args()
+
+    # 使用临时数据库，避免污染 faststudy.db（必须在导入应用之前设置）
+    workdir = tempfile.mkdtemp(prefix="faststudy_bench_")
+    os.environ["DATABASE_FILE"] = os.path.join(workdir, "bench.db")
+    os.environ["DB_PROFILE"] = "production"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+
+    start = time.perf_counter()
+    for i in range(args.single_rows):
+        response = client.post("/api/v1/items", json={"name": f"单条{i}", "price": 1.0, "owner_id": 1})
+        response.raise_for_status()
+    single_rate = args.single_rows / (time.perf_counter() - start)
+    print(f"单条接口: {args.single_rows} 行，{single_rate:.0f} 行/秒")
+
+    body = "\n".join(
+        json.dumps({"name": f"批量{i}", "description": f"批量物品 {i}", "price": 1.0, "owner_id": 1})
+        for i in range(args.rows)
+    )
+    start = time.perf_counter()
+    response = client.post("/api/v1/items/bulk", content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+    response.raise_for_status()
+    bulk_rate = args.rows / (time.perf_counter() - start)
+    print(f"批量接口: {response.json()['succeeded']} 行，{bulk_rate:.0f} 行/秒")
+    print(f"吞吐提升: {bulk_rate / single_rate:.1f} 倍")
+
+
+if __name__ == "__main__":
+    main()
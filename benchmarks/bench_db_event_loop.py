@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+数据库查询与LLM流式并发压测脚本
+对比"仅物品接口"与"物品接口 + /langgraph/conversation-stream 并发"两种负载下
+物品接口的 p50/p99 延迟，用于验证异步数据库会话不会阻塞事件循环。
+
+使用前需先启动服务：poetry run uvicorn main:app --reload
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+ITEM_PATHS = [
+    "/api/v1/items?page=1&page_size=10",
+    "/api/v1/items?page=2&page_size=10&search=测试",
+    "/api/v1/items/1",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """计算百分位数（毫秒）
+
+    Args:
+        samples: 延迟样本（秒）
+        pct: 百分位（0-100）
+
+    Returns:
+        float: 对应百分位的延迟（毫秒）
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+async def hit_items(client: httpx.AsyncClient, requests_per_worker: int, samples: List[float]) -> None:
+    """循环请求物品接口并记录延迟"""
+    for i in range(requests_per_worker):
+        path = ITEM_PATHS[i % len(ITEM_PATHS)]
+        start = time.perf_counter()
+        response = await client.get(path)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def hold_conversation_stream(client: httpx.AsyncClient, api_key: str, stop: asyncio.Event) -> None:
+    """持续保持一个对话流式请求，直到压测结束"""
+    payload = {"messages": [{"role": "user", "content": "请写一篇关于 FastAPI 的长文。"}]}
+    headers = {"Authorization": f"Bearer {api_key}"}
+    while not stop.is_set():
+        try:
+            async with client.stream("POST", "/api/v1/langgraph/conversation-stream",
+                                     json=payload, headers=headers) as response:
+                async for _ in response.aiter_bytes():
+                    if stop.is_set():
+                        break
+        except httpx.HTTPError:
+            await asyncio.sleep(0.1)
+
+
+async def run_round(base_url: str, workers: int, requests_per_worker: int,
+                    streams: int, api_key: str) -> List[float]:
+    """执行一轮压测
+
+    Args:
+        base_url: 服务地址
+        workers: 并发请求物品接口的协程数
+        requests_per_worker: 每个协程的请求数
+        streams: 并发的对话流数量（0 表示不施加LLM负载）
+        api_key: LLM 认证令牌
+
+    Returns:
+        List[float]: 物品接口延迟样本（秒）
+    """
+    samples: List[float] = []
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=workers + streams + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        stream_tasks = [asyncio.create_task(hold_conversation_stream(client, api_key, stop))
+                        for _ in range(streams)]
+        # 给流式请求一点时间建立连接
+        if streams:
+            await asyncio.sleep(1)
+        await asyncio.gather(*(hit_items(client, requests_per_worker, samples) for _ in range(workers)))
+        stop.set()
+        for task in stream_tasks:
+            task.cancel()
+        await asyncio.gather(*stream_tasks, return_exceptions=True)
+    return samples
+
+
+def report(label: str, samples: List[float]) -> None:
+    """打印延迟统计"""
+    print(f"{label}: 请求数={len(samples)} "
+          f"p50={percentile(samples, 50):.1f}ms "
+          f"p99={percentile(samples, 99):.1f}ms "
+          f"mean={statistics.mean(samples) * 1000:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="物品接口与LLM流式并发压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--workers", type=int, default=20, help="物品接口并发数")
+    parser.add_argument("--requests", type=int, default=50, help="每个并发的请求数")
+    parser.add_argument("--streams", type=int, default=10, help="并发对话流数量")
+    parser.add_argument("--api-key", default="", help="LLM 认证令牌")
+    args = parser.parse_args()
+
+    baseline = asyncio.run(run_round(args.base_url, args.workers, args.requests, 0, args.api_key))
+    report("仅物品接口", baseline)
+
+    loaded = asyncio.run(run_round(args.base_url, args.workers, args.requests, args.streams, args.api_key))
+    report(f"物品接口 + {args.streams} 个对话流", loaded)
+
+
+if __name__ == "__main__":
+    main()
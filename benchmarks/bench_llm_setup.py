@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM 路由每请求准备开销对比脚本
+对比：
+- 旧实现：每个请求 new 一个工作流（构建 StateGraph 并 compile）或重新创建 ChatPromptTemplate/链
+- 新实现：进程内共享编译好的工作流和链，认证令牌通过运行配置传入
+只统计调用上游之前的准备开销，不发起网络请求。
+
+运行方式：poetry run python benchmarks/bench_llm_setup.py --rounds 200
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable
+
+
+def measure(func: Callable[[], object], rounds: int) -> float:
+    """执行 rounds 次，返回平均耗时（微秒）"""
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM 路由每请求准备开销对比")
+    parser.add_argument("--rounds", type=int, default=200, help="每项重复次数")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from examples.langchain_example import (
+        SIMPLE_CHAIN_PROMPT,
+        auth_config,
+        create_chain,
+        create_simple_chain
+    )
+    from examples.langgraph_example import ConversationWorkflow, DecisionWorkflow, get_workflow
+
+    cases = [
+        ("对话工作流", lambda: ConversationWorkflow(auth_token="bench"),
+         lambda: (get_workflow(ConversationWorkflow), auth_config("bench"))),
+        ("决策工作流", lambda: DecisionWorkflow(auth_token="bench"),
+         lambda: (get_workflow(DecisionWorkflow), auth_config("bench"))),
+        ("简单链", lambda: create_chain(SIMPLE_CHAIN_PROMPT, "input", auth_token="bench"),
+         lambda: (create_simple_chain(), auth_config("bench"))),
+    ]
+    for label, legacy, current in cases:
+        before = measure(legacy, args.rounds)
+        after = measure(current, args.rounds)
+        print(f"{label}: 每请求重建 {before:.1f}us -> 共享实例 {after:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM 流式输出首字节时间 / 吞吐对比脚本
+在本地启动一个模拟上游（OpenAI 兼容 SSE 接口）和应用服务，对比：
+- 旧实现：每个 token 单独写出，并在每次写出后 sleep 10ms
+- 新实现：/langchain/simple-llm-stream（首个 token 立即发送，之后合并成帧）
+的首字节时间（TTFB）、总耗时、每秒 token 数和写出帧数。
+
+运行方式：poetry run python benchmarks/bench_llm_stream.py --tokens 2000 --streams 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from stub_upstream import build_stub_upstream, serve
+
+
+def add_legacy_route(app) -> None:
+    """挂载与旧实现一致的流式路由（逐 token 写出 + 每次 sleep 10ms），作为对比基线"""
+    from fastapi import Header
+    from fastapi.responses import StreamingResponse
+    from examples.langchain_example import simple_llm_call_astream
+
+    @app.post("/bench/legacy-stream")
+    async def legacy_stream(payload: Dict, authorization: str = Header(...)):
+        async def stream_response():
+            async for chunk in simple_llm_call_astream(payload["prompt"], auth_token=authorization[7:]):
+                yield chunk
+                await asyncio.sleep(0.01)
+        return StreamingResponse(stream_response(), media_type="text/plain")
+
+
+async def one_stream(client: httpx.AsyncClient, path: str) -> Dict[str, float]:
+    """发起一个流式请求，记录首字节时间、总耗时、帧数"""
+    start = time.perf_counter()
+    ttfb = None
+    frames = 0
+    text = []
+    async with client.stream("POST", path, json={"prompt": "你好"},
+                             headers={"Authorization": "Bearer bench"}) as response:
+        async for piece in response.aiter_text():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            frames += 1
+            text.append(piece)
+    elapsed = time.perf_counter() - start
+    return {"ttfb": ttfb or elapsed, "elapsed": elapsed, "frames": frames,
+            "tokens": "".join(text).count("tok")}
+
+
+async def run_round(base_url: str, path: str, streams: int) -> List[Dict[str, float]]:
+    """并发执行 streams 个流式请求"""
+    limits = httpx.Limits(max_connections=streams + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        return await asyncio.gather(*(one_stream(client, path) for _ in range(streams)))
+
+
+def report(label: str, results: List[Dict[str, float]]) -> None:
+    """打印统计结果"""
+    ttfb = [r["ttfb"] * 1000 for r in results]
+    elapsed = [r["elapsed"] for r in results]
+    rate = [r["tokens"] / r["elapsed"] for r in results]
+    print(f"{label}: 流数={len(results)} "
+          f"TTFB p50={statistics.median(ttfb):.1f}ms "
+          f"总耗时 p50={statistics.median(elapsed):.2f}s "
+          f"tokens/s p50={statistics.median(rate):.0f} "
+          f"帧数 p50={statistics.median(r['frames'] for r in results):.0f} "
+          f"token数={results[0]['tokens']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM 流式输出 TTFB / 吞吐对比")
+    parser.add_argument("--tokens", type=int, default=2000, help="每个流的 token 数")
+    parser.add_argument("--interval", type=float, default=0.0005, help="模拟上游两个 token 之间的间隔（秒）")
+    parser.add_argument("--streams", type=int, default=20, help="并发流数量")
+    parser.add_argument("--upstream-port", type=int, default=18101, help="模拟上游端口")
+    parser.add_argument("--app-port", type=int, default=18102, help="应用端口")
+    args = parser.parse_args()
+
+    # 使用临时数据库，避免污染 faststudy.db（必须在导入应用之前设置）
+    workdir = tempfile.mkdtemp(prefix="faststudy_bench_")
+    os.environ["DATABASE_FILE"] = os.path.join(workdir, "bench.db")
+    os.environ["DB_PROFILE"] = "production"
+    os.environ["LLM_API_ENDPOINT"] = f"http://127.0.0.1:{args.upstream_port}/v1/chat/completions"
+    # 每个流都要真实访问上游：关闭响应缓存和请求合并
+    os.environ["LLM_RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["LLM_SINGLE_FLIGHT"] = "false"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from main import app
+
+    add_legacy_route(app)
+    serve(build_stub_upstream(args.tokens, args.interval), args.upstream_port)
+    serve(app, args.app_port)
+
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    legacy = asyncio.run(run_round(base_url, "/bench/legacy-stream", args.streams))
+    report("旧实现（逐 token + sleep 10ms）", legacy)
+    current = asyncio.run(run_round(base_url, "/api/v1/langchain/simple-llm-stream", args.streams))
+    report("新实现（首 token 立即发送 + 合并成帧）", current)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分页性能对比脚本
+在临时数据库中生成大量物品，分别用偏移分页和游标分页请求第 1 页和第 N 页，
+对比深分页时两种模式的耗时差异。
+
+运行方式：poetry run python benchmarks/bench_pagination.py --rows 200000 --deep-page 10000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="偏移分页与游标分页性能对比")
+    parser.add_argument("--rows", type=int, default=200000, help="生成的物品数量")
+    parser.add_argument("--page-size", type=int, default=10, help="每页记录数")
+    parser.add_argument("--deep-page", type=int, default=10000, help="深分页页码")
+    parser.add_argument("--repeat", type=int, default=20, help="每种情况的重复次数")
+    args = parser.parse_args()
+
+    if args.deep_page * args.page_size > args.rows:
+        parser.error("--rows 必须不小于 deep-page * page-size")
+
+    # 使用临时数据库，避免污染 faststudy.db（必须在导入应用之前设置）
+    workdir = tempfile.mkdtemp(prefix="faststudy_bench_")
+    os.environ["DATABASE_FILE"] = os.path.join(workdir, "bench.db")
+    os.environ["DB_PROFILE"] = "production"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from main import app
+    from models.database import engine, Item
+    from models.pagination import encode_cursor
+
+    print(f"生成 {args.rows} 条物品数据: {os.environ['DATABASE_FILE']}")
+    with engine.begin() as conn:
+        batch = []
+        for i in range(args.rows):
+            batch.append({"name": f"物品{i}", "description": f"压测物品 {i}", "price": 1.0, "owner_id": 1})
+            if len(batch) == 10000:
+                conn.execute(insert(Item), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Item), batch)
+
+    client = TestClient(app)
+
+    # 深分页的游标即为上一页最后一条记录的排序键
+    class _Row:
+        id = (args.deep_page - 1) * args.page_size
+
+    cases = {
+        "偏移分页 第1页": {"page": 1},
+        f"偏移分页 第{args.deep_page}页": {"page": args.deep_page},
+        "游标分页 第1页": {},
+        f"游标分页 第{args.deep_page}页": {"cursor": encode_cursor("id", _Row)},
+    }
+
+    for label, params in cases.items():
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = client.get("/api/v1/items", params={"page_size": args.page_size, **params})
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+        first_id = response.json()["data"][0]["id"]
+        print(f"{label}: 首条ID={first_id} 中位数={statistics.median(samples) * 1000:.2f}ms "
+              f"最大={max(samples) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
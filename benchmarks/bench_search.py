@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+物品搜索性能对比脚本
+在临时数据库中生成大量物品，分别用 FTS5 全文索引和 LIKE 全表扫描执行搜索，
+对比两种方式的耗时。
+
+运行方式：poetry run python benchmarks/bench_search.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+WORDS = ["测试", "物品", "手机", "电脑", "耳机", "键盘", "鼠标", "显示器", "keyboard", "laptop", "phone", "cable"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FTS5 与 LIKE 搜索性能对比")
+    parser.add_argument("--rows", type=int, default=1000000, help="生成的物品数量")
+    parser.add_argument("--repeat", type=int, default=20, help="每个关键词的重复次数")
+    args = parser.parse_args()
+
+    # 使用临时数据库，避免污染 faststudy.db（必须在导入应用之前设置）
+    workdir = tempfile.mkdtemp(prefix="faststudy_bench_")
+    os.environ["DATABASE_FILE"] = os.path.join(workdir, "bench.db")
+    os.environ["DB_PROFILE"] = "production"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from main import app
+    from models import search
+    from models.database import engine, Item
+
+    print(f"生成 {args.rows} 条物品数据: {os.environ['DATABASE_FILE']}")
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        batch = []
+        for i in range(args.rows):
+            name = f"{rng.choice(WORDS)}{rng.choice(WORDS)}{i}"
+            description = " ".join(rng.choice(WORDS) for _ in range(6))
+            batch.append({"name": name, "description": description, "price": 1.0, "owner_id": 1})
+            if len(batch) == 10000:
+                conn.execute(insert(Item), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Item), batch)
+
+    client = TestClient(app)
+    keywords = ["显示器键盘", "laptop", "12345"]
+
+    for fts_enabled in (True, False):
+        search.FTS_ENABLED = fts_enabled
+        label = "FTS5" if fts_enabled else "LIKE"
+        for keyword in keywords:
+            samples = []
+            for _ in range(args.repeat):
+                # count_mode=none 只衡量搜索本身，不包含总数计算
+                start = time.perf_counter()
+                response = client.get("/api/v1/items", params={"search": keyword, "count_mode": "none"})
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+            print(f"{label} 搜索 {keyword!r}: 返回 {len(response.json()['data'])} 条 "
+                  f"中位数={statistics.median(samples) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
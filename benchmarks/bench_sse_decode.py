@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+上游 SSE 流解析开销对比脚本
+在单个线程（单核）上解析同一份录制的 SSE 字节流，对比：
+- 旧实现：按行迭代（先把字节块解码成字符串再拆行），每行 json.loads 后逐层 .get 取内容
+- 新实现：SSEDecoder 直接在原始字节块上切分事件行，常见片段按字节定位内容，其余完整解析（可选 orjson）
+报告每秒解析的事件数（chunks/s/core）。
+
+录制的流可以用 --input 指定（上游原始响应体，如 curl -N 保存的文件）；
+未指定时按 OpenAI 兼容接口的格式生成，分别测试内容原样输出（UTF-8）和转义为 \\uXXXX（ASCII）两种情况。
+
+运行方式：poetry run python benchmarks/bench_sse_decode.py --events 20000 --rounds 5
+"""
+
+import argparse
+import codecs
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Iterator, List
+
+TOKENS = ["你好", "，", "这是", "一个", "流式", "输出", "的", "示例", "。", " Hello", " world", "!",
+          " The", " quick", " brown", " fox", "\n", "**", "代码", "`", "print", "(", ")"]
+
+
+def record_stream(events: int, ensure_ascii: bool, seed: int = 0) -> bytes:
+    """按 OpenAI 兼容接口的格式生成一份 SSE 响应体"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(events):
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "Qwen3-235B-MOE",
+            "choices": [{"index": 0, "delta": {"content": rng.choice(TOKENS)}, "finish_reason": None}]
+        }
+        lines.append("data: " + json.dumps(chunk, ensure_ascii=ensure_ascii) + "\n\n")
+    lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode("utf-8")
+
+
+def split_network_chunks(body: bytes, seed: int = 0) -> List[bytes]:
+    """把响应体切成大小不一的网络读块（模拟 TCP 分段，块边界可能落在一行中间）"""
+    rng = random.Random(seed)
+    chunks = []
+    position = 0
+    while position < len(body):
+        size = rng.randint(64, 4096)
+        chunks.append(body[position:position + size])
+        position += size
+    return chunks
+
+
+def legacy_decode(chunks: List[bytes]) -> Iterator[str]:
+    """旧实现：按行迭代 + 每行 json.loads（与 httpx 的 iter_lines 一样先增量解码成字符串）"""
+    utf8 = codecs.getincrementaldecoder("utf-8")("replace")
+    pending = ""
+    for chunk in chunks:
+        text = pending + utf8.decode(chunk)
+        lines = text.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line = line.rstrip("\r")
+            if not line or line.startswith(":"):
+                continue
+            if line.startswith("data:"):
+                line = line[5:].lstrip()
+            if line == "[DONE]":
+                return
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            choices = result.get("choices") or [{}]
+            content = (choices[0].get("delta") or {}).get("content") or ""
+            if content:
+                yield content
+
+
+def decoder_decode(chunks: List[bytes]) -> Iterator[str]:
+    """新实现：SSEDecoder"""
+    from inference.client import SSEDecoder
+
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+        if decoder.done:
+            return
+    yield from decoder.flush()
+
+
+def measure(decode: Callable[[List[bytes]], Iterator[str]], chunks: List[bytes], rounds: int) -> tuple:
+    """重复解析 rounds 次，返回（最快一次的耗时，解析出的内容）"""
+    best = float("inf")
+    contents: List[str] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        contents = list(decode(chunks))
+        best = min(best, time.perf_counter() - start)
+    return best, contents
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上游 SSE 流解析开销对比")
+    parser.add_argument("--events", type=int, default=20000, help="生成的事件数（未指定 --input 时）")
+    parser.add_argument("--rounds", type=int, default=5, help="每项重复次数，取最快一次")
+    parser.add_argument("--input", help="录制的 SSE 响应体文件")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import inference.client as client
+
+    if args.input:
+        with open(args.input, "rb") as f:
+            streams = {os.path.basename(args.input): f.read()}
+    else:
+        streams = {
+            "UTF-8": record_stream(args.events, ensure_ascii=False),
+            "ASCII 转义": record_stream(args.events, ensure_ascii=True)
+        }
+
+    for name, body in streams.items():
+        chunks = split_network_chunks(body)
+        legacy_time, expected = measure(legacy_decode, chunks, args.rounds)
+        events = body.count(b"\ndata:") + body.startswith(b"data:")
+        print(f"\n[{name}] {len(body) / 1024:.0f} KB，{events} 个事件，{len(chunks)} 个读块")
+        print(f"  旧实现（按行 + json.loads）:        {events / legacy_time:>12,.0f} chunks/s/core")
+
+        variants = [("SSEDecoder", client._json_loads, client.orjson)]
+        if client.orjson is not None:
+            variants.insert(0, ("SSEDecoder（不使用 orjson）", json.loads, None))
+        for label, loads, orjson in variants:
+            saved = client._json_loads, client.orjson
+            client._json_loads, client.orjson = loads, orjson
+            try:
+                elapsed, contents = measure(decoder_decode, chunks, args.rounds)
+            finally:
+                client._json_loads, client.orjson = saved
+            assert contents == expected, "解析结果与旧实现不一致"
+            print(f"  {label + ':':<34}{events / elapsed:>12,.0f} chunks/s/core"
+                  f"  ({legacy_time / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+上游自适应并发限制压测脚本
+在本地启动容量有限的模拟上游（超出容量的请求排队，排队过长返回 503）和应用服务，
+同时发送一批交互式流式请求和非流式请求，对比开启/关闭并发限制时：
+- 成功数、应用返回 429 的次数、上游返回 503 的次数
+- 上游同时处理的峰值请求数与排队峰值
+- 流式请求的首字节时间（P50 / P95）和非流式请求的耗时（并发限制下流式请求优先出队）
+- 并发上限的变化与排队统计（GET /metrics/llm 的 limiter 字段）
+
+运行方式：poetry run python benchmarks/stress_limiter.py --streams 150 --completions 150
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from stub_upstream import build_stub_upstream, reset_calls, serve
+
+
+def percentile(values: List[float], q: float) -> float:
+    """计算分位数"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def fire(base_url: str, streams: int, completions: int) -> Dict[str, list]:
+    """同时发送流式和非流式请求（内容各不相同，不会被请求合并），返回各请求的结果"""
+    limits = httpx.Limits(max_connections=streams + completions + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        headers = {"Authorization": "Bearer stress"}
+
+        async def stream(i: int) -> Tuple[int, Optional[float]]:
+            start = time.perf_counter()
+            first = None
+            async with client.stream("POST", "/api/v1/langchain/translate-stream",
+                                     json={"text": f"流式请求 {i}"}, headers=headers) as response:
+                async for chunk in response.aiter_text():
+                    if chunk and first is None:
+                        first = time.perf_counter() - start
+            return response.status_code, first
+
+        async def complete(i: int) -> Tuple[int, float]:
+            start = time.perf_counter()
+            response = await client.post("/api/v1/langchain/translate", json={"text": f"非流式请求 {i}"}, headers=headers)
+            return response.status_code, time.perf_counter() - start
+
+        results = await asyncio.gather(
+            *(complete(i) for i in range(completions)),
+            *(stream(i) for i in range(streams))
+        )
+        return {"completions": results[:completions], "streams": results[completions:]}
+
+
+def summarize(name: str, results: Dict[str, list], upstream, metrics: dict) -> None:
+    """打印一轮压测的结果"""
+    load = dict(upstream.state.load)
+    calls = reset_calls(upstream)
+    print(f"\n[{name}]")
+    for kind, label in (("streams", "流式（首字节）"), ("completions", "非流式（总耗时）")):
+        items = results[kind]
+        ok = [latency for status, latency in items if status == 200 and latency is not None]
+        rejected = sum(1 for status, _ in items if status == 429)
+        failed = len(items) - len(ok) - rejected
+        print(f"  {label:<12} 成功={len(ok):<4} 429={rejected:<4} 其他失败={failed:<4} "
+              f"P50={percentile(ok, 0.5):.2f}s P95={percentile(ok, 0.95):.2f}s")
+    print(f"  上游: 调用={calls['stream'] + calls['complete']} 返回503={calls['rejected']} "
+          f"同时处理峰值={load['peak_active']} 排队峰值={load['peak_pending']}")
+    limiter = metrics["limiter"]
+    print(f"  并发限制: 上限={limiter['limit']} 放宽={limiter['increases']} 收紧={limiter['decreases']} "
+          f"排队={limiter['queued']} 最大排队={limiter['max_queue_depth']} "
+          f"拒绝(队列满/超时)={limiter['rejected_queue_full']}/{limiter['rejected_timeout']} "
+          f"排队等待 P95={limiter['wait_ms']['p95']}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="上游自适应并发限制压测")
+    parser.add_argument("--streams", type=int, default=150, help="同时发送的流式请求数")
+    parser.add_argument("--completions", type=int, default=150, help="同时发送的非流式请求数")
+    parser.add_argument("--tokens", type=int, default=50, help="模拟上游每次回复的 token 数")
+    parser.add_argument("--interval", type=float, default=0.01, help="模拟上游两个 token 之间的间隔（秒）")
+    parser.add_argument("--capacity", type=int, default=32, help="模拟上游同时生成的请求数")
+    parser.add_argument("--max-pending", type=int, default=64, help="模拟上游排队上限，超出返回 503")
+    parser.add_argument("--upstream-port", type=int, default=18211, help="模拟上游端口")
+    parser.add_argument("--app-port", type=int, default=18212, help="应用端口")
+    args = parser.parse_args()
+
+    # 使用临时数据库并关闭响应缓存与请求合并（必须在导入应用之前设置）
+    workdir = tempfile.mkdtemp(prefix="faststudy_stress_")
+    os.environ["DATABASE_FILE"] = os.path.join(workdir, "stress.db")
+    os.environ["DB_PROFILE"] = "production"
+    os.environ["LLM_RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["LLM_SINGLE_FLIGHT"] = "false"
+    os.environ["LLM_API_ENDPOINT"] = f"http://127.0.0.1:{args.upstream_port}/v1/chat/completions"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from config import settings
+    from inference.client import get_inference_client
+    from inference.limiter import AdaptiveLimiter
+    from main import app
+
+    upstream = build_stub_upstream(args.tokens, args.interval, args.capacity, args.max_pending)
+    serve(upstream, args.upstream_port)
+    serve(app, args.app_port)
+    base_url = f"http://127.0.0.1:{args.app_port}"
+
+    for enabled in (False, True):
+        settings.LLM_LIMIT_ENABLED = enabled
+        client = get_inference_client()
+        client.limiter = AdaptiveLimiter()
+        reset_calls(upstream)
+        # 先发一轮少量请求，得到空载延迟
+        asyncio.run(fire(base_url, 4, 0))
+        reset_calls(upstream)
+        start = time.perf_counter()
+        results = asyncio.run(fire(base_url, args.streams, args.completions))
+        elapsed = time.perf_counter() - start
+        metrics = httpx.get(f"{base_url}/metrics/llm").json()
+        summarize(f"并发限制{'开' if enabled else '关'}，耗时 {elapsed:.2f}s", results, upstream, metrics)
+
+
+if __name__ == "__main__":
+    main()
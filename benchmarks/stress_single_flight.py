@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+请求合并（single-flight）压测脚本
+在本地启动模拟上游和应用服务，同一时刻发送 N 个相同的请求，检查：
+- 所有响应成功且内容一致
+- 开启请求合并时上游只收到 1 次调用，关闭时收到 N 次
+- 不同认证令牌的请求不会被合并
+
+运行方式：poetry run python benchmarks/stress_single_flight.py --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import httpx
+
+from stub_upstream import build_stub_upstream, reset_calls, serve
+
+SCENARIOS = [
+    ("translate", "/api/v1/langchain/translate", {"text": "你好，世界"}),
+    ("translate-stream", "/api/v1/langchain/translate-stream", {"text": "你好，世界"}),
+    ("validate", "/api/v1/model/validate", {"prompt": "介绍一下你自己。"}),
+    ("validate-stream", "/api/v1/model/validate-stream", {"prompt": "介绍一下你自己。"}),
+]
+
+
+async def fire(base_url: str, path: str, body: dict, concurrency: int, shared_token: bool) -> Tuple[List[str], float]:
+    """同时发送 concurrency 个请求，返回响应内容列表和总耗时"""
+    limits = httpx.Limits(max_connections=concurrency + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def one(i: int) -> str:
+            token = "stress" if shared_token else f"stress-{i}"
+            response = await client.post(path, json=body, headers={"Authorization": f"Bearer {token}"})
+            response.raise_for_status()
+            return response.text
+
+        start = time.perf_counter()
+        texts = await asyncio.gather(*(one(i) for i in range(concurrency)))
+        return texts, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="请求合并压测")
+    parser.add_argument("--concurrency", type=int, default=100, help="同时发送的相同请求数")
+    parser.add_argument("--tokens", type=int, default=200, help="模拟上游每次回复的 token 数")
+    parser.add_argument("--interval", type=float, default=0.002, help="模拟上游两个 token 之间的间隔（秒）")
+    parser.add_argument("--upstream-port", type=int, default=18201, help="模拟上游端口")
+    parser.add_argument("--app-port", type=int, default=18202, help="应用端口")
+    args = parser.parse_args()
+
+    # 使用临时数据库并关闭响应缓存，只验证请求合并（必须在导入应用之前设置）
+    workdir = tempfile.mkdtemp(prefix="faststudy_stress_")
+    os.environ["DATABASE_FILE"] = os.path.join(workdir, "stress.db")
+    os.environ["DB_PROFILE"] = "production"
+    os.environ["LLM_RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["LLM_API_ENDPOINT"] = f"http://127.0.0.1:{args.upstream_port}/v1/chat/completions"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from config import settings
+    from main import app
+
+    upstream = build_stub_upstream(args.tokens, args.interval)
+    serve(upstream, args.upstream_port)
+    serve(app, args.app_port)
+    base_url = f"http://127.0.0.1:{args.app_port}"
+
+    failures = 0
+    for single_flight, shared_token in ((True, True), (False, True), (True, False)):
+        settings.LLM_SINGLE_FLIGHT = single_flight
+        expected = 1 if single_flight and shared_token else args.concurrency
+        for name, path, body in SCENARIOS:
+            reset_calls(upstream)
+            texts, elapsed = asyncio.run(fire(base_url, path, body, args.concurrency, shared_token))
+            calls = sum(reset_calls(upstream).values())
+            identical = len(set(texts)) == 1 and f"tok{args.tokens - 1}" in texts[0]
+            ok = identical and calls == expected
+            failures += not ok
+            print(f"[{'PASS' if ok else 'FAIL'}] 合并={'开' if single_flight else '关'} "
+                  f"令牌={'相同' if shared_token else '不同'} {name}: 请求数={args.concurrency} "
+                  f"上游调用={calls}（期望 {expected}） 内容一致={identical} 耗时={elapsed:.2f}s")
+            if not identical:
+                odd = next(text for text in texts if f"tok{args.tokens - 1}" not in text or text != texts[0])
+                print(f"       异常响应示例: {odd[:200]!r}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+模拟上游 LLM 服务（OpenAI 兼容 chat/completions 接口，支持 SSE 流式），供对比和压测脚本使用
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+
+def build_stub_upstream(tokens: int, interval: float, capacity: Optional[int] = None, max_pending: Optional[int] = None):
+    """
+    构造模拟上游：流式请求按固定间隔输出 tokens 个 SSE 片段，非流式请求等待同样的总时长后返回
+
+    Args:
+        tokens: 每次回复的 token 数
+        interval: 两个 token 之间的间隔（秒）
+        capacity: 同时生成的请求数上限，超出的请求排队（首字节延迟随之升高）；None 表示不限
+        max_pending: 排队请求数上限，超出时返回 503；None 表示不限
+
+    Returns:
+        FastAPI: 模拟上游应用，app.state.calls 记录收到的请求数，app.state.load 记录并发情况
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    stub = FastAPI()
+    stub.state.calls = {"stream": 0, "complete": 0, "rejected": 0}
+    stub.state.load = {"active": 0, "pending": 0, "peak_active": 0, "peak_pending": 0}
+    slots = asyncio.Semaphore(capacity) if capacity else None
+
+    async def admit() -> bool:
+        """模拟推理服务的调度：等待空闲的生成槽位，排队过长时拒绝"""
+        load = stub.state.load
+        if slots is None:
+            return True
+        if max_pending is not None and load["pending"] >= max_pending:
+            stub.state.calls["rejected"] += 1
+            return False
+        load["pending"] += 1
+        load["peak_pending"] = max(load["peak_pending"], load["pending"])
+        try:
+            await slots.acquire()
+        finally:
+            load["pending"] -= 1
+        return True
+
+    def enter() -> None:
+        load = stub.state.load
+        load["active"] += 1
+        load["peak_active"] = max(load["peak_active"], load["active"])
+
+    def leave() -> None:
+        stub.state.load["active"] -= 1
+        if slots is not None:
+            slots.release()
+
+    @stub.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        if not await admit():
+            return JSONResponse({"error": {"message": "overloaded"}}, status_code=503)
+        enter()
+        if body.get("stream"):
+            stub.state.calls["stream"] += 1
+
+            async def events():
+                try:
+                    for i in range(tokens):
+                        if interval:
+                            await asyncio.sleep(interval)
+                        yield "data: " + json.dumps({"choices": [{"delta": {"content": f"tok{i} "}}]}) + "\n\n"
+                    yield "data: [DONE]\n\n"
+                finally:
+                    leave()
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        stub.state.calls["complete"] += 1
+        try:
+            await asyncio.sleep(interval * tokens)
+        finally:
+            leave()
+        content = "".join(f"tok{i} " for i in range(tokens))
+        return JSONResponse({"choices": [{"message": {"content": content}, "finish_reason": "stop"}]})
+
+    return stub
+
+
+def serve(app, port: int) -> None:
+    """在后台线程中启动 uvicorn"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def reset_calls(app) -> Dict[str, int]:
+    """返回并清零模拟上游的请求计数"""
+    calls = dict(app.state.calls)
+    for key in app.state.calls:
+        app.state.calls[key] = 0
+    for key in ("peak_active", "peak_pending"):
+        app.state.load[key] = 0
+    return calls
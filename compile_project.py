@@ -30,7 +30,7 @@ def compile_project(source_dir: str, output_dir: str) -> None:
     # 定义要排除的目录和文件列表
     excluded_dirs = [
         '.git', '.venv', '__pycache__', '.pytest_cache', 
-        'node_modules', 'reports', 'tests', 'doc', 
+        'node_modules', 'reports', 'tests', 'doc', 'benchmarks', 
         '.idea', '.trae',  # 添加.idea和.trae目录到排除列表
         os.path.basename(output_dir)  # 避免递归创建compiled目录
     ]
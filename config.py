@@ -1,4 +1,5 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -8,9 +9,106 @@ class Settings(BaseSettings):
     PORT: int = 8000
     DEBUG: bool = True
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    # 数据库配置
+    DATABASE_FILE: str = "faststudy.db"
+    DB_PROFILE: str = "development"         # 引擎配置档：development / production
+    DB_ECHO: Optional[bool] = None          # 是否打印SQL，未设置时仅 development 档开启
+    DB_POOL_SIZE: int = 10                  # 连接池常驻连接数（多线程读）
+    DB_MAX_OVERFLOW: int = 20               # 连接池允许的溢出连接数
+    SQLITE_JOURNAL_MODE: str = "WAL"        # WAL 模式下读写互不阻塞
+    SQLITE_SYNCHRONOUS: str = "NORMAL"      # WAL 模式下 NORMAL 即可保证一致性
+    SQLITE_MMAP_SIZE: int = 268435456       # 内存映射大小（字节），256MB
+    SQLITE_CACHE_SIZE: int = -65536         # 页缓存大小，负数表示KB，即64MB
+    SQLITE_BUSY_TIMEOUT: int = 5000         # 锁等待超时（毫秒）
+    
+    # 列表总数缓存配置
+    COUNT_CACHE_TTL: int = 5                # 精确总数缓存有效期（秒），兜底多进程间的写入
+    COUNT_ESTIMATE_TTL: int = 300           # 估算总数缓存有效期（秒）
+    
+    # 当前用户解析缓存有效期（秒），兜底多进程间的用户状态变化
+    IDENTITY_CACHE_TTL: int = 60
+
+    # 实体读缓存配置（GET /items/{id}、GET /users/{id}）
+    ENTITY_CACHE_SIZE: int = 10000          # 进程内 LRU 最大条目数
+    ENTITY_CACHE_TTL: int = 30              # 条目有效期（秒），兜底多进程间的写入
+    ENTITY_CACHE_SHARED_BACKEND: str = "none"   # 二级共享缓存：none 或 local（本地替身）
+
+    # 批量接口配置
+    BULK_MAX_ROWS: int = 100000             # 单次请求最多行数
+    BULK_CHUNK_SIZE: int = 500              # 每批 executemany 的行数
+
+    # LLM 上游推理接口配置（OpenAI 兼容的 chat/completions 接口）
+    LLM_API_ENDPOINT: str = "http://10.62.79.254:31111/api/inference/v1/chat/completions"
+    LLM_MODEL: str = "Qwen3-235B-MOE"       # 请求体中的模型名称
+    LLM_TEMPERATURE: float = 0.7            # 默认温度
+    LLM_MAX_TOKENS: int = 32768             # 默认最大生成 token 数
+    LLM_MAX_RETRIES: int = 2                # 建连失败或 429/502/503/504 时的重试次数
+    LLM_RETRY_BACKOFF: float = 0.5          # 首次重试等待（秒），之后按 2 倍递增
+    LLM_SINGLE_FLIGHT: bool = True          # 合并同一时刻的相同上游请求（流式请求共享同一个上游流）
+
+    # LLM 响应缓存配置（相同输入直接返回缓存的回复，流式接口按片段回放）
+    LLM_RESPONSE_CACHE_ENABLED: bool = True         # 是否启用
+    LLM_RESPONSE_CACHE_FILE: str = "llm_cache.db"   # 持久化文件（SQLite），重启后仍然有效
+    LLM_RESPONSE_CACHE_SIZE: int = 10000            # 最大条目数，超出时淘汰最旧的条目
+    LLM_RESPONSE_CACHE_TTL: int = 86400             # 条目有效期（秒）
+    LLM_RESPONSE_CACHE_SCOPE: str = "token"         # token：按认证令牌隔离；global：所有调用方共享
+    LLM_RESPONSE_CACHE_SIMILARITY: float = 0.0      # 相似度命中阈值（0~1），0 表示只做精确匹配
+
+    # 决策工作流本地意图识别（本地能确定输入类型时跳过 LLM 分类调用）
+    LLM_INTENT_FASTPATH: bool = True                # 是否启用本地关键词/正则规则
+    LLM_INTENT_MODEL: bool = False                  # 是否启用本地朴素贝叶斯模型（以规则和 LLM 的分类结果在线学习）
+    LLM_INTENT_MODEL_MIN_SAMPLES: int = 50          # 模型参与判断前至少需要学习的样本数
+    LLM_INTENT_MODEL_MIN_CONFIDENCE: float = 0.95   # 模型结果的最低置信度，低于该值时回退到 LLM 分类
+    LLM_DECISION_SPECULATE: bool = False            # 回退到 LLM 分类时，是否同时推测执行最可能的分支（猜错时取消）
+    LLM_DECISION_SPECULATE_MAX_IN_FLIGHT: int = 32  # 同时进行的推测数上限（每次推测可能多消耗一次上游调用）
+    LLM_DECISION_SPECULATE_MIN_SUCCESS: float = 0.5 # 近期推测命中率下限，低于该值时暂停推测
+
+    # 对话工作流上下文管理（按本地估算的 token 数裁剪历史，请求大小不随对话长度增长）
+    LLM_CONTEXT_MAX_TOKENS: int = 8192              # 每次请求发送的对话历史 token 上限（本地估算）
+    LLM_CONTEXT_MAX_MESSAGES: int = 50              # 滑动窗口保留的最近消息数上限（不含开头的系统提示）
+    LLM_CONTEXT_SUMMARY: bool = False               # 是否将窗口外的历史折叠为滚动摘要（额外的上游调用，摘要按对话缓存）
+    LLM_CONTEXT_SUMMARY_TOKENS: int = 512           # 摘要的最大 token 数
+    LLM_CONTEXT_SUMMARY_CACHE_SIZE: int = 1000      # 摘要缓存的最大条目数
+    LLM_CONVERSATION_MAX_MESSAGES: int = 1000       # 对话接口单次请求最多消息数
+
+    # 对话会话配置（传入 session_id 时服务端保存对话历史，客户端每轮只发送新的消息）
+    LLM_SESSION_FILE: str = "sessions.db"           # LangGraph 检查点存储（SQLite），与业务数据库分开
+    LLM_SESSION_TTL: int = 604800                   # 会话有效期（秒），自最后一次对话起算，过期后删除
+    LLM_SESSION_MAX_MESSAGES: int = 1000            # 会话保存的最多消息数（不含开头的系统提示），超出时删除最早的消息
+
+    # 上游自适应并发限制（按首字节延迟和限流/超时信号调整并发上限，超出时按优先级排队，队列满或排队超时返回 429）
+    LLM_LIMIT_ENABLED: bool = True                  # 是否启用
+    LLM_LIMIT_INITIAL: int = 32                     # 初始并发上限
+    LLM_LIMIT_MIN: int = 4                          # 并发上限的下限
+    LLM_LIMIT_MAX: int = 500                        # 并发上限的上限（不超过连接池大小）
+    LLM_LIMIT_QUEUE_SIZE: int = 256                 # 排队请求数上限，已满时低优先级的请求先被拒绝
+    LLM_LIMIT_QUEUE_TIMEOUT: float = 10.0           # 最长排队时间（秒），超时返回 429
+    LLM_LIMIT_LATENCY_TOLERANCE: float = 2.0        # 首字节延迟超过空载水平的倍数时收紧并发上限
+
+    # 批量接口配置（各项输入并发执行，按完成顺序以 NDJSON 返回结果）
+    LLM_BATCH_MAX_ITEMS: int = 1000                 # 单次批量请求最多输入数
+    LLM_BATCH_MAX_CONCURRENCY: int = 8              # 单个批量任务同时执行的项数（请求未指定时的默认值，也是可指定的上限）
+
+    # LLM 上游 HTTP 连接池配置（进程内共享，保持长连接）
+    LLM_HTTP_TIMEOUT: float = 30.0          # 读超时（秒），流式响应按两次数据之间的间隔计算
+    LLM_HTTP_CONNECT_TIMEOUT: float = 10.0  # 建连超时（秒）
+    LLM_HTTP_MAX_CONNECTIONS: int = 500     # 最大连接数，即单进程最大并发上游请求数
+    LLM_HTTP_MAX_KEEPALIVE: int = 100       # 保活的空闲连接数
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0 # 空闲连接保活时长（秒）
+
+    # 流式输出分帧配置（首个 token 立即发送，之后按字符数或时间合并）
+    STREAM_FRAME_MAX_CHARS: int = 256       # 单帧最大字符数
+    STREAM_FRAME_MAX_DELAY: float = 0.02    # 缓冲最长时间（秒）
+    STREAM_DISCONNECT_POLL: float = 0.5     # 检测客户端断开的间隔（秒），断开后立即中止上游请求
+
+    @property
+    def db_echo(self) -> bool:
+        """实际生效的SQL打印开关"""
+        if self.DB_ECHO is not None:
+            return self.DB_ECHO
+        return self.DB_PROFILE != "production"
+    
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
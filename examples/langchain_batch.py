@@ -0,0 +1,231 @@
+"""
+批量链调用
+将一批输入交给共享的链并发执行（LangChain abatch_as_completed，并发数由 max_concurrency 限制），
+每一项完成后立即按完成顺序输出结果（带输入序号）；
+批量调用优先级最低：只在并发限制器有空闲名额时开始新的项，被限制器拒绝（队列已满、
+被优先级更高的请求挤出或排队超时）的项等待建议的时间后重试，而不是作为失败返回；
+批量任务在进程内登记，可通过任务ID取消，客户端断开时同样取消，未完成的上游调用随之中止
+"""
+
+import asyncio
+import hashlib
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+from config import settings
+from examples.langchain_example import auth_config
+from inference.client import get_inference_client
+from inference.limiter import PRIORITY_BATCH, LimiterRejected, request_priority
+from models.streaming import stream_error
+
+# 限制器没有空闲名额时，隔多久（秒）再检查一次
+_HEADROOM_POLL = 0.05
+
+
+def _fingerprint(auth_token: Optional[str]) -> str:
+    """认证令牌指纹（只保存指纹，用于校验取消请求）"""
+    return hashlib.blake2b((auth_token or "").encode("utf-8"), digest_size=8).hexdigest()
+
+
+class BatchJob:
+    """
+    一个批量任务：后台任务并发执行各项输入，结果按完成顺序放入事件队列
+    """
+
+    def __init__(self, chain: Runnable, inputs: List[Any], auth_token: Optional[str], max_concurrency: int):
+        """
+        初始化
+
+        Args:
+            chain: 执行每一项输入的链
+            inputs: 链的输入列表
+            auth_token: 认证令牌
+            max_concurrency: 同时执行的项数
+        """
+        self.id = uuid.uuid4().hex
+        self.owner = _fingerprint(auth_token)
+        self.total = len(inputs)
+        self.max_concurrency = max_concurrency
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.cancelled = False
+        self.started = time.monotonic()
+        self._chain = chain
+        self._inputs = inputs
+        self._config = auth_config(auth_token)
+        self._events: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+        # 正在执行的单项调用，取消任务时逐一取消
+        self._calls: Set[asyncio.Task] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """在后台开始执行"""
+        self.task = asyncio.create_task(self._run())
+
+    async def _wait_for_headroom(self) -> None:
+        """等待并发限制器有空闲名额；本任务没有正在执行的项时直接开始，保证任务能够推进"""
+        limiter = get_inference_client().limiter
+        while self._calls and limiter.headroom() <= 0:
+            await asyncio.sleep(_HEADROOM_POLL)
+
+    async def _invoke(self, value: Any, config: RunnableConfig) -> Any:
+        """
+        执行一项输入，被并发限制器拒绝时等待 retry_after 秒后重试
+
+        abatch_as_completed 在外层被取消时不会取消已开始的调用，
+        因此每一项都在由本任务登记的子任务中执行，取消任务时一并取消
+        """
+        while True:
+            await self._wait_for_headroom()
+            if self.cancelled:
+                raise asyncio.CancelledError()
+            call = asyncio.create_task(self._chain.ainvoke(value, config))
+            self._calls.add(call)
+            try:
+                return await call
+            except LimiterRejected as e:
+                retry_after = e.retry_after
+            finally:
+                self._calls.discard(call)
+            self.retries += 1
+            await asyncio.sleep(retry_after)
+
+    async def _run(self) -> None:
+        """按完成顺序把每一项的结果放入事件队列，结束（含取消）时放入汇总事件"""
+        config: RunnableConfig = {**self._config, "max_concurrency": self.max_concurrency}
+        try:
+            # 批量调用排在交互式和普通请求之后
+            with request_priority(PRIORITY_BATCH):
+                runner = RunnableLambda(self._invoke)
+                async for index, output in runner.abatch_as_completed(self._inputs, config, return_exceptions=True):
+                    if isinstance(output, Exception):
+                        self.failed += 1
+                        self._events.put_nowait({"type": "error", "index": index, "error": stream_error(output)})
+                    else:
+                        self.completed += 1
+                        self._events.put_nowait({"type": "result", "index": index, "output": output})
+        except asyncio.CancelledError:
+            self.cancelled = True
+        finally:
+            for call in list(self._calls):
+                call.cancel()
+            self._events.put_nowait(self.summary())
+            self._events.put_nowait(None)
+
+    def cancel(self) -> None:
+        """取消任务：停止开始新的项，并中止正在执行的上游调用"""
+        if self.task is not None and not self.task.done():
+            self.cancelled = True
+            self.task.cancel()
+
+    def summary(self) -> Dict[str, Any]:
+        """汇总事件：完成状态、成功与失败的项数、被并发限制拒绝后重试的次数、总耗时"""
+        return {
+            "type": "done",
+            "status": "cancelled" if self.cancelled else "completed",
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "total_ms": round((time.monotonic() - self.started) * 1000, 1)
+        }
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        按完成顺序输出事件：首先是任务信息，然后是每一项的结果或错误，最后是汇总
+
+        事件流被提前关闭（如客户端断开）时取消任务
+
+        Yields:
+            dict: 事件
+        """
+        try:
+            yield {"type": "job", "job_id": self.id, "total": self.total, "max_concurrency": self.max_concurrency}
+            while True:
+                event = await self._events.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self.cancel()
+
+
+class BatchJobs:
+    """
+    进程内登记的批量任务（任务结束后移除）
+    """
+
+    def __init__(self):
+        """初始化"""
+        self._jobs: Dict[str, BatchJob] = {}
+        self._stats = {"jobs": 0, "cancelled": 0, "items_completed": 0, "items_failed": 0, "items_retried": 0}
+
+    def start(
+        self,
+        chain: Runnable,
+        inputs: List[Any],
+        auth_token: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> BatchJob:
+        """
+        开始一个批量任务
+
+        Args:
+            chain: 执行每一项输入的链（共享的链，令牌通过运行配置传入）
+            inputs: 链的输入列表
+            auth_token: 认证令牌
+            max_concurrency: 同时执行的项数，默认取 settings.LLM_BATCH_MAX_CONCURRENCY
+
+        Returns:
+            BatchJob: 已开始的任务
+        """
+        job = BatchJob(chain, inputs, auth_token, max_concurrency or settings.LLM_BATCH_MAX_CONCURRENCY)
+        self._jobs[job.id] = job
+        self._stats["jobs"] += 1
+        job.start()
+        job.task.add_done_callback(lambda _: self._finish(job))
+        return job
+
+    def _finish(self, job: BatchJob) -> None:
+        """任务结束：移除登记并累计统计"""
+        self._jobs.pop(job.id, None)
+        self._stats["cancelled"] += int(job.cancelled)
+        self._stats["items_completed"] += job.completed
+        self._stats["items_failed"] += job.failed
+        self._stats["items_retried"] += job.retries
+
+    def cancel(self, job_id: str, auth_token: Optional[str] = None) -> bool:
+        """
+        取消批量任务（只能取消同一认证令牌提交的任务）
+
+        Args:
+            job_id: 任务ID
+            auth_token: 认证令牌
+
+        Returns:
+            bool: 任务是否存在且仍在执行
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != _fingerprint(auth_token):
+            return False
+        job.cancel()
+        return True
+
+    async def cancel_all(self) -> None:
+        """取消所有任务并等待结束（应用退出时调用）"""
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*(job.task for job in jobs), return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        """已开始的任务数、正在执行的任务数、被取消的任务数与成功/失败/重试的项数"""
+        return {**self._stats, "running": len(self._jobs)}
+
+
+# 进程内共享的批量任务登记
+batch_jobs = BatchJobs()
@@ -8,68 +8,39 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage, AIMessageChunk
 from langchain_core.outputs import ChatGeneration, ChatResult, ChatGenerationChunk
-from langchain_core.runnables import Runnable
-from typing import Optional, List, Dict, Any, Iterator, Callable
-import requests
-import json
-
-# 配置常量
-API_ENDPOINT = "http://10.62.79.254:31111/api/inference/v1/chat/completions"
-DEFAULT_MODEL = "Qwen3-235B-MOE"
-DEFAULT_TEMPERATURE = 0.7
-DEFAULT_MAX_TOKENS = 32768
-DEFAULT_VALIDATION_PROMPT = "介绍一下你自己。"
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import ensure_config
+from typing import Optional, List, Dict, Any, Iterator, AsyncIterator
+from functools import lru_cache
 
+from config import settings
+from inference.client import LLMAPIError, get_inference_client, message_content
+from inference.limiter import LimiterRejected
 
-# 自定义异常类
-class LLMAPIError(Exception):
-    """
-    LLM API 异常类
-    """
-    def __init__(self, message: str, status_code: Optional[int] = None):
-        """
-        初始化异常
-        
-        Args:
-            message: 错误消息
-            status_code: HTTP 状态码
-        """
-        super().__init__(message)
-        self.status_code = status_code
+# 配置常量（上游地址、模型名称、超时和重试见 config.Settings 的 LLM_* 配置）
+DEFAULT_TEMPERATURE = settings.LLM_TEMPERATURE
+DEFAULT_VALIDATION_PROMPT = "介绍一下你自己。"
+SIMPLE_CHAIN_PROMPT = "你是一个 helpful 的助手。请用中文回答。"
+TRANSLATION_CHAIN_PROMPT = "你是一个专业的翻译助手。请将用户输入的文本翻译成英文。"
 
+# 运行配置中传递认证令牌的键（双下划线开头的键不会被复制到回调/追踪的 metadata 中）
+AUTH_TOKEN_KEY = "__auth_token"
 
-# 辅助函数
-def _prepare_api_request(messages: List[Dict[str, str]], auth_token: str, temperature: float = DEFAULT_TEMPERATURE, 
-                        stream: bool = False, max_tokens: int = DEFAULT_MAX_TOKENS) -> Dict[str, Any]:
+
+def auth_config(auth_token: Optional[str]) -> RunnableConfig:
     """
-    准备API请求
+    构造携带认证令牌的运行配置，用于调用进程内共享的链和工作流
     
     Args:
-        messages: 消息列表
         auth_token: 认证令牌
-        temperature: 温度参数
-        stream: 是否使用流式响应
-        max_tokens: 最大令牌数
         
     Returns:
-        Dict[str, Any]: 包含headers和data的字典，其中headers为Dict[str, str]，data为Dict[str, Any]
+        RunnableConfig: 运行配置
     """
-    headers: Dict[str, str] = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {auth_token}"
-    }
-    
-    data: Dict[str, Any] = {
-        "model": DEFAULT_MODEL,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-        "stream": stream
-    }
-    
-    return {"headers": headers, "data": data}
+    return {"configurable": {AUTH_TOKEN_KEY: auth_token}}
 
 
+# 辅助函数
 def _convert_messages_to_api_format(messages: List[BaseMessage]) -> List[Dict[str, str]]:
     """
     将LangChain消息转换为API格式
@@ -93,44 +64,25 @@ def _convert_messages_to_api_format(messages: List[BaseMessage]) -> List[Dict[st
     return api_messages
 
 
-def _process_stream_response(response: requests.Response) -> Iterator[str]:
+def _build_chat_result(result: Dict[str, Any]) -> ChatResult:
     """
-    处理流式响应
+    将非流式响应转换为 ChatResult
     
     Args:
-        response: requests响应对象
+        result: 响应JSON
         
-    Yields:
-        str: 流式响应内容
-    """
-    for line in response.iter_lines():
-        if line:
-            # 移除 "data: " 前缀
-            line = line.decode("utf-8")
-            if line.startswith("data: "):
-                line = line[6:]
-            
-            # 检查是否是结束标记
-            if line == "[DONE]":
-                break
-            
-            try:
-                # 解析JSON
-                result = json.loads(line)
-                # 检查是否有错误
-                if "error" in result:
-                    error_msg = result["error"].get("message", "Unknown error")
-                    raise LLMAPIError(f"API returned error: {error_msg}")
-                
-                delta = result.get("choices", [{}])[0].get("delta", {})
-                content = delta.get("content", "")
-                
-                if content:
-                    yield content
-            except json.JSONDecodeError:
-                continue
-            except Exception as e:
-                yield f"错误: {str(e)}"
+    Returns:
+        ChatResult: 响应结果
+    """
+    choice = result.get("choices", [{}])[0]
+    content = choice.get("message", {}).get("content", "")
+    
+    # 创建 ChatResult
+    chat_generation = ChatGeneration(
+        message=AIMessage(content=content),
+        generation_info={"finish_reason": choice.get("finish_reason", "stop")}
+    )
+    return ChatResult(generations=[chat_generation])
 
 
 class CustomChatModel(BaseChatModel):
@@ -138,17 +90,22 @@ class CustomChatModel(BaseChatModel):
     自定义 ChatModel，用于调用外部 API
     """
     
-    def __init__(self, temperature: float = DEFAULT_TEMPERATURE, auth_token: Optional[str] = None):
+    def __init__(self, temperature: float = DEFAULT_TEMPERATURE, auth_token: Optional[str] = None,
+                 max_tokens: Optional[int] = None, use_cache: bool = False):
         """
         初始化自定义 ChatModel
         
         Args:
             temperature: 温度参数
             auth_token: 认证令牌
+            max_tokens: 最大生成 token 数，默认取 settings.LLM_MAX_TOKENS
+            use_cache: 是否使用响应缓存（多轮对话等回复不可复用的场景保持关闭）
         """
         super().__init__()
         self._temperature = temperature
         self._auth_token = auth_token
+        self._max_tokens = max_tokens
+        self._use_cache = use_cache
     
     @property
     def temperature(self) -> float:
@@ -190,6 +147,20 @@ class CustomChatModel(BaseChatModel):
         """
         self._auth_token = value
     
+    def _run_auth_token(self) -> Optional[str]:
+        """
+        本次调用使用的认证令牌
+        
+        实例上设置了令牌时直接使用；共享实例（未设置令牌）从当前运行配置中读取，
+        由链或工作流节点调用时 LangChain 会把运行配置放入上下文
+        
+        Returns:
+            Optional[str]: 认证令牌
+        """
+        if self.auth_token:
+            return self.auth_token
+        return (ensure_config().get("configurable") or {}).get(AUTH_TOKEN_KEY)
+    
     def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
         """
         生成响应
@@ -205,52 +176,14 @@ class CustomChatModel(BaseChatModel):
         Raises:
             LLMAPIError: 如果API请求失败
         """
-        # 转换消息格式
-        api_messages = _convert_messages_to_api_format(messages)
-        
-        # 准备API请求
-        request_data = _prepare_api_request(
-            api_messages, 
-            self.auth_token, 
+        result = get_inference_client().complete(
+            _convert_messages_to_api_format(messages),
+            self._run_auth_token(),
             temperature=self.temperature,
-            stream=False
+            max_tokens=self._max_tokens,
+            use_cache=self._use_cache
         )
-        
-        try:
-            # 发送请求
-            response = requests.post(
-                API_ENDPOINT,
-                headers=request_data["headers"],
-                data=json.dumps(request_data["data"]),
-                timeout=30  # 添加超时设置
-            )
-            
-            # 处理响应
-            if response.status_code == 200:
-                result = response.json()
-                # 检查是否有错误
-                if "error" in result:
-                    error_msg = result["error"].get("message", "Unknown error")
-                    raise LLMAPIError(f"API returned error: {error_msg}")
-                
-                content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-                
-                # 创建 ChatResult
-                chat_generation = ChatGeneration(
-                    message=AIMessage(content=content),
-                    generation_info={"finish_reason": result.get("choices", [{}])[0].get("finish_reason", "stop")}
-                )
-                
-                return ChatResult(generations=[chat_generation])
-            else:
-                raise LLMAPIError(
-                    f"API请求失败: {response.status_code} - {response.text}",
-                    status_code=response.status_code
-                )
-        except requests.RequestException as e:
-            raise LLMAPIError(f"网络请求失败: {str(e)}")
-        except json.JSONDecodeError as e:
-            raise LLMAPIError(f"响应解析失败: {str(e)}")
+        return _build_chat_result(result)
     
     def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
         """
@@ -267,44 +200,62 @@ class CustomChatModel(BaseChatModel):
         Raises:
             LLMAPIError: 如果API请求失败
         """
-        # 转换消息格式
-        api_messages = _convert_messages_to_api_format(messages)
+        for content in get_inference_client().stream(
+            _convert_messages_to_api_format(messages),
+            self._run_auth_token(),
+            temperature=self.temperature,
+            max_tokens=self._max_tokens,
+            use_cache=self._use_cache
+        ):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content), generation_info={})
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        """
+        异步生成响应（使用共享的异步连接池，不阻塞事件循环）
         
-        # 准备API请求
-        request_data = _prepare_api_request(
-            api_messages, 
-            self.auth_token, 
+        Args:
+            messages: 消息列表
+            stop: 停止词列表
+            **kwargs: 其他参数
+            
+        Returns:
+            ChatResult: 响应结果
+        
+        Raises:
+            LLMAPIError: 如果API请求失败
+        """
+        result = await get_inference_client().acomplete(
+            _convert_messages_to_api_format(messages),
+            self._run_auth_token(),
             temperature=self.temperature,
-            stream=True
+            max_tokens=self._max_tokens,
+            use_cache=self._use_cache
         )
+        return _build_chat_result(result)
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        """
+        异步流式生成响应（使用共享的异步连接池，不阻塞事件循环）
         
-        try:
-            # 发送请求
-            response = requests.post(
-                API_ENDPOINT,
-                headers=request_data["headers"],
-                data=json.dumps(request_data["data"]),
-                stream=True,
-                timeout=30  # 添加超时设置
-            )
+        Args:
+            messages: 消息列表
+            stop: 停止词列表
+            **kwargs: 其他参数
             
-            # 处理响应
-            if response.status_code == 200:
-                # 逐行处理流式响应
-                for content in _process_stream_response(response):
-                    # 创建 ChatGenerationChunk
-                    chunk = ChatGenerationChunk(
-                        message=AIMessageChunk(content=content),
-                        generation_info={}
-                    )
-                    yield chunk
-            else:
-                raise LLMAPIError(
-                    f"API请求失败: {response.status_code} - {response.text}",
-                    status_code=response.status_code
-                )
-        except requests.RequestException as e:
-            raise LLMAPIError(f"网络请求失败: {str(e)}")
+        Yields:
+            ChatGenerationChunk: 流式响应块
+        
+        Raises:
+            LLMAPIError: 如果API请求失败
+        """
+        async for content in get_inference_client().astream(
+            _convert_messages_to_api_format(messages),
+            self._run_auth_token(),
+            temperature=self.temperature,
+            max_tokens=self._max_tokens,
+            use_cache=self._use_cache
+        ):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content), generation_info={})
     
     @property
     def _llm_type(self) -> str:
@@ -325,11 +276,13 @@ class CustomChatModel(BaseChatModel):
             Dict[str, Any]: 识别参数
         """
         return {
-            "temperature": self.temperature
+            "temperature": self.temperature,
+            "max_tokens": self._max_tokens
         }
 
 
-def get_llm(model_name: str = "gpt-3.5-turbo", temperature: float = DEFAULT_TEMPERATURE, auth_token: Optional[str] = None) -> CustomChatModel:
+def get_llm(model_name: str = "gpt-3.5-turbo", temperature: float = DEFAULT_TEMPERATURE,
+            auth_token: Optional[str] = None, use_cache: bool = False) -> CustomChatModel:
     """
     获取 LLM 实例
     
@@ -337,13 +290,15 @@ def get_llm(model_name: str = "gpt-3.5-turbo", temperature: float = DEFAULT_TEMP
         model_name: 模型名称（仅用于兼容，实际使用自定义模型）
         temperature: 温度参数
         auth_token: 认证令牌
+        use_cache: 是否使用响应缓存
         
     Returns:
         CustomChatModel: LLM 实例
     """
     return CustomChatModel(
         temperature=temperature,
-        auth_token=auth_token
+        auth_token=auth_token,
+        use_cache=use_cache
     )
 
 
@@ -359,7 +314,7 @@ def simple_llm_call(prompt: str, model_name: str = "gpt-3.5-turbo", auth_token:
     Returns:
         str: LLM 响应
     """
-    llm = get_llm(model_name, auth_token=auth_token)
+    llm = get_llm(model_name, auth_token=auth_token, use_cache=True)
     response = llm.invoke(prompt)
     return response.content if hasattr(response, "content") else str(response)
 
@@ -376,12 +331,47 @@ def simple_llm_call_stream(prompt: str, model_name: str = "gpt-3.5-turbo", auth_
     Yields:
         str: LLM 响应的流式输出
     """
-    llm = get_llm(model_name, auth_token=auth_token)
+    llm = get_llm(model_name, auth_token=auth_token, use_cache=True)
     for chunk in llm.stream(prompt):
         yield chunk.content if hasattr(chunk, "content") else str(chunk)
 
 
-def create_chain(system_prompt: str, input_key: str, auth_token: Optional[str] = None) -> Runnable:
+async def simple_llm_call_async(prompt: str, model_name: str = "gpt-3.5-turbo", auth_token: Optional[str] = None) -> str:
+    """
+    简单的 LLM 调用（异步）
+    
+    Args:
+        prompt: 提示词
+        model_name: 模型名称
+        auth_token: 认证令牌
+        
+    Returns:
+        str: LLM 响应
+    """
+    llm = get_llm(model_name, auth_token=auth_token, use_cache=True)
+    response = await llm.ainvoke(prompt)
+    return response.content if hasattr(response, "content") else str(response)
+
+
+async def simple_llm_call_astream(prompt: str, model_name: str = "gpt-3.5-turbo", auth_token: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    简单的 LLM 调用（异步流式输出）
+    
+    Args:
+        prompt: 提示词
+        model_name: 模型名称
+        auth_token: 认证令牌
+        
+    Yields:
+        str: LLM 响应的流式输出
+    """
+    llm = get_llm(model_name, auth_token=auth_token, use_cache=True)
+    async for chunk in llm.astream(prompt):
+        yield chunk.content if hasattr(chunk, "content") else str(chunk)
+
+
+def create_chain(system_prompt: str, input_key: str, auth_token: Optional[str] = None,
+                 use_cache: bool = False) -> Runnable:
     """
     创建通用链
     
@@ -389,6 +379,7 @@ def create_chain(system_prompt: str, input_key: str, auth_token: Optional[str] =
         system_prompt: 系统提示词
         input_key: 输入键名
         auth_token: 认证令牌
+        use_cache: 是否使用响应缓存
         
     Returns:
         Runnable: 链实例
@@ -400,7 +391,7 @@ def create_chain(system_prompt: str, input_key: str, auth_token: Optional[str] =
     ])
     
     # 获取 LLM
-    llm = get_llm(auth_token=auth_token)
+    llm = get_llm(auth_token=auth_token, use_cache=use_cache)
     
     # 定义输出解析器
     output_parser = StrOutputParser()
@@ -411,20 +402,41 @@ def create_chain(system_prompt: str, input_key: str, auth_token: Optional[str] =
     return chain
 
 
+@lru_cache(maxsize=64)
+def get_chain(system_prompt: str, input_key: str, use_cache: bool = False) -> Runnable:
+    """
+    获取进程内共享的链（同一提示词只构建一次）
+    
+    链中的 LLM 不绑定认证令牌，调用时通过 auth_config 传入
+    
+    Args:
+        system_prompt: 系统提示词
+        input_key: 输入键名
+        use_cache: 是否使用响应缓存
+        
+    Returns:
+        Runnable: 链实例
+    """
+    return create_chain(system_prompt, input_key, use_cache=use_cache)
+
+
 def create_simple_chain(auth_token: Optional[str] = None):
     """
     创建简单的链
     
     Args:
-        auth_token: 认证令牌
+        auth_token: 认证令牌（不传时返回共享的链，令牌在调用时通过 auth_config 传入）
         
     Returns:
         Runnable: 链实例
     """
+    if auth_token is None:
+        return get_chain(SIMPLE_CHAIN_PROMPT, "input", use_cache=True)
     return create_chain(
-        system_prompt="你是一个 helpful 的助手。请用中文回答。",
+        system_prompt=SIMPLE_CHAIN_PROMPT,
         input_key="input",
-        auth_token=auth_token
+        auth_token=auth_token,
+        use_cache=True
     )
 
 
@@ -439,8 +451,8 @@ def run_simple_chain(input_text: str, auth_token: Optional[str] = None) -> str:
     Returns:
         str: 链的输出
     """
-    chain = create_simple_chain(auth_token=auth_token)
-    return chain.invoke({"input": input_text})
+    chain = create_simple_chain()
+    return chain.invoke({"input": input_text}, config=auth_config(auth_token))
 
 
 def run_simple_chain_stream(input_text: str, auth_token: Optional[str] = None) -> Iterator[str]:
@@ -454,8 +466,39 @@ def run_simple_chain_stream(input_text: str, auth_token: Optional[str] = None) -
     Yields:
         str: 链的输出的流式输出
     """
-    chain = create_simple_chain(auth_token=auth_token)
-    for chunk in chain.stream({"input": input_text}):
+    chain = create_simple_chain()
+    for chunk in chain.stream({"input": input_text}, config=auth_config(auth_token)):
+        yield chunk
+
+
+async def run_simple_chain_async(input_text: str, auth_token: Optional[str] = None) -> str:
+    """
+    运行简单的链（异步）
+    
+    Args:
+        input_text: 输入文本
+        auth_token: 认证令牌
+        
+    Returns:
+        str: 链的输出
+    """
+    chain = create_simple_chain()
+    return await chain.ainvoke({"input": input_text}, config=auth_config(auth_token))
+
+
+async def run_simple_chain_astream(input_text: str, auth_token: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    运行简单的链（异步流式输出）
+    
+    Args:
+        input_text: 输入文本
+        auth_token: 认证令牌
+        
+    Yields:
+        str: 链的输出的流式输出
+    """
+    chain = create_simple_chain()
+    async for chunk in chain.astream({"input": input_text}, config=auth_config(auth_token)):
         yield chunk
 
 
@@ -464,15 +507,18 @@ def create_translation_chain(auth_token: Optional[str] = None):
     创建翻译链
     
     Args:
-        auth_token: 认证令牌
+        auth_token: 认证令牌（不传时返回共享的链，令牌在调用时通过 auth_config 传入）
         
     Returns:
         Runnable: 翻译链实例
     """
+    if auth_token is None:
+        return get_chain(TRANSLATION_CHAIN_PROMPT, "text", use_cache=True)
     return create_chain(
-        system_prompt="你是一个专业的翻译助手。请将用户输入的文本翻译成英文。",
+        system_prompt=TRANSLATION_CHAIN_PROMPT,
         input_key="text",
-        auth_token=auth_token
+        auth_token=auth_token,
+        use_cache=True
     )
 
 
@@ -487,8 +533,8 @@ def translate_text(text: str, auth_token: Optional[str] = None) -> str:
     Returns:
         str: 翻译后的文本
     """
-    translation_chain = create_translation_chain(auth_token=auth_token)
-    return translation_chain.invoke({"text": text})
+    translation_chain = create_translation_chain()
+    return translation_chain.invoke({"text": text}, config=auth_config(auth_token))
 
 
 def translate_text_stream(text: str, auth_token: Optional[str] = None) -> Iterator[str]:
@@ -502,14 +548,68 @@ def translate_text_stream(text: str, auth_token: Optional[str] = None) -> Iterat
     Yields:
         str: 翻译后的文本的流式输出
     """
-    translation_chain = create_translation_chain(auth_token=auth_token)
-    for chunk in translation_chain.stream({"text": text}):
+    translation_chain = create_translation_chain()
+    for chunk in translation_chain.stream({"text": text}, config=auth_config(auth_token)):
+        yield chunk
+
+
+async def translate_text_async(text: str, auth_token: Optional[str] = None) -> str:
+    """
+    翻译文本（异步）
+    
+    Args:
+        text: 要翻译的文本
+        auth_token: 认证令牌
+        
+    Returns:
+        str: 翻译后的文本
+    """
+    translation_chain = create_translation_chain()
+    return await translation_chain.ainvoke({"text": text}, config=auth_config(auth_token))
+
+
+async def translate_text_astream(text: str, auth_token: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    翻译文本（异步流式输出）
+    
+    Args:
+        text: 要翻译的文本
+        auth_token: 认证令牌
+        
+    Yields:
+        str: 翻译后的文本的流式输出
+    """
+    translation_chain = create_translation_chain()
+    async for chunk in translation_chain.astream({"text": text}, config=auth_config(auth_token)):
         yield chunk
 
 
+def _validation_failure(error: Exception) -> dict:
+    """
+    将验证过程中的异常转换为失败结果
+    
+    Args:
+        error: 异常
+        
+    Returns:
+        dict: 失败结果
+    """
+    if isinstance(error, LLMAPIError) and error.status_code is not None:
+        return {
+            "success": False,
+            "error": f"API请求失败: {error.status_code}",
+            "content": error.body or ""
+        }
+    return {
+        "success": False,
+        "error": f"请求过程中发生错误: {str(error)}",
+        "content": str(error)
+    }
+
+
 def validate_model(auth_token: str, prompt: str = DEFAULT_VALIDATION_PROMPT) -> dict:
     """
-    验证模型是否可用
+    验证模型是否可用（总是请求上游，不使用响应缓存）
     
     Args:
         auth_token: 认证令牌 (API key)
@@ -519,37 +619,10 @@ def validate_model(auth_token: str, prompt: str = DEFAULT_VALIDATION_PROMPT) ->
         dict: 包含响应结果和状态信息
     """
     try:
-        # 准备API请求
-        messages = [{"role": "user", "content": prompt}]
-        request_data = _prepare_api_request(messages, auth_token, stream=False)
-        
-        # 发送请求
-        response = requests.post(
-            API_ENDPOINT,
-            headers=request_data["headers"],
-            data=json.dumps(request_data["data"])
-        )
-        
-        # 检查响应状态
-        if response.status_code == 200:
-            result = response.json()
-            return {
-                "success": True,
-                "content": result.get("choices", [{}])[0].get("message", {}).get("content", ""),
-                "response": result
-            }
-        else:
-            return {
-                "success": False,
-                "error": f"API请求失败: {response.status_code}",
-                "content": response.text
-            }
+        result = get_inference_client().complete([{"role": "user", "content": prompt}], auth_token, use_cache=False)
+        return {"success": True, "content": message_content(result), "response": result}
     except Exception as e:
-        return {
-            "success": False,
-            "error": f"请求过程中发生错误: {str(e)}",
-            "content": str(e)
-        }
+        return _validation_failure(e)
 
 
 def validate_model_stream(auth_token: str, prompt: str = DEFAULT_VALIDATION_PROMPT) -> Iterator[str]:
@@ -564,26 +637,63 @@ def validate_model_stream(auth_token: str, prompt: str = DEFAULT_VALIDATION_PROM
         str: 模型响应的流式输出
     """
     try:
-        # 准备API请求
-        messages = [{"role": "user", "content": prompt}]
-        request_data = _prepare_api_request(messages, auth_token, stream=True)
-        
-        # 发送请求
-        response = requests.post(
-            API_ENDPOINT,
-            headers=request_data["headers"],
-            data=json.dumps(request_data["data"]),
-            stream=True
-        )
+        yield from get_inference_client().stream([{"role": "user", "content": prompt}], auth_token, use_cache=False)
+    except LLMAPIError as e:
+        yield f"错误: {str(e)}"
+    except Exception as e:
+        yield f"错误: 请求过程中发生错误: {str(e)}"
+
+
+async def validate_model_async(auth_token: str, prompt: str = DEFAULT_VALIDATION_PROMPT) -> dict:
+    """
+    验证模型是否可用（异步）
+    
+    Args:
+        auth_token: 认证令牌 (API key)
+        prompt: 测试提示词
         
-        # 处理响应
-        if response.status_code == 200:
-            # 使用辅助函数处理流式响应
-            for content in _process_stream_response(response):
-                yield content
-        else:
-            yield f"错误: API请求失败: {response.status_code} - {response.text}"
+    Returns:
+        dict: 包含响应结果和状态信息
+    """
+    try:
+        result = await get_inference_client().acomplete([{"role": "user", "content": prompt}], auth_token, use_cache=False)
+        return {"success": True, "content": message_content(result), "response": result}
+    except LimiterRejected:
+        # 上游繁忙由路由返回 429
+        raise
+    except Exception as e:
+        return _validation_failure(e)
+
+
+async def validate_model_astream(
+    auth_token: str,
+    prompt: str = DEFAULT_VALIDATION_PROMPT,
+    inline_errors: bool = True
+) -> AsyncIterator[str]:
+    """
+    验证模型是否可用（异步流式输出）
+    
+    Args:
+        auth_token: 认证令牌 (API key)
+        prompt: 测试提示词
+        inline_errors: 出错时是否以“错误: ...”文本输出；为 False 时直接抛出异常
+        
+    Yields:
+        str: 模型响应的流式输出
+    """
+    try:
+        async for content in get_inference_client().astream([{"role": "user", "content": prompt}], auth_token, use_cache=False):
+            yield content
+    except LimiterRejected:
+        # 上游繁忙由路由返回 429
+        raise
+    except LLMAPIError as e:
+        if not inline_errors:
+            raise
+        yield f"错误: {str(e)}"
     except Exception as e:
+        if not inline_errors:
+            raise
         yield f"错误: 请求过程中发生错误: {str(e)}"
 
 
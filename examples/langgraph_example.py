@@ -5,284 +5,56 @@ LangGraph v1.0 示例代码
 
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage, AIMessageChunk
-from langchain_core.outputs import ChatGeneration, ChatResult, ChatGenerationChunk
-from typing import Annotated, List, Dict, Any, Optional, Iterator
+from langchain_core.messages import AIMessage, HumanMessage, convert_to_messages
+from langchain_core.runnables import RunnableLambda
+from typing import Annotated, Dict, Any, Optional, Iterator, AsyncIterator, Callable
 from typing_extensions import TypedDict
-import requests
-import json
+from functools import lru_cache
+import asyncio
 
-# 配置常量
-API_ENDPOINT = "http://10.62.79.254:31111/api/inference/v1/chat/completions"
-DEFAULT_MODEL = "Qwen3-235B-MOE"
-DEFAULT_TEMPERATURE = 0.7
-DEFAULT_MAX_TOKENS = 32768
-DEFAULT_VALIDATION_PROMPT = "介绍一下你自己。"
+from config import settings
 
+# 复用 LangChain 示例中的 ChatModel 和模型验证，上游访问统一走 inference.client
+from examples.langchain_example import CustomChatModel, _convert_messages_to_api_format, auth_config, validate_model
+from inference.client import bypass_response_cache
+from inference.context import (MESSAGE_OVERHEAD, SUMMARY_PREFIX, SummaryCache, estimate_tokens,
+                               split_context, summary_cache, truncate_text)
+from inference.intent import IntentClassifier, intent_classifier
+from inference.speculation import Speculation, decision_speculation
 
-# 辅助函数
-def _prepare_api_request(messages: List[Dict[str, str]], auth_token: str, temperature: float = DEFAULT_TEMPERATURE, 
-                        stream: bool = False, max_tokens: int = DEFAULT_MAX_TOKENS) -> Dict[str, Any]:
-    """
-    准备API请求
-    
-    Args:
-        messages: 消息列表
-        auth_token: 认证令牌
-        temperature: 温度参数
-        stream: 是否使用流式响应
-        max_tokens: 最大令牌数
-        
-    Returns:
-        Dict[str, Any]: 包含headers和data的字典
-    """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {auth_token}"
-    }
-    
-    data = {
-        "model": DEFAULT_MODEL,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-        "stream": stream
-    }
-    
-    return {"headers": headers, "data": data}
 
+# 定义状态结构
+class State(TypedDict):
+    """工作流状态定义"""
+    messages: Annotated[list, add_messages]
 
-def _convert_messages_to_api_format(messages: List[BaseMessage]) -> List[Dict[str, str]]:
-    """
-    将LangChain消息转换为API格式
-    
-    Args:
-        messages: LangChain消息列表
-        
-    Returns:
-        List[Dict[str, str]]: API格式的消息列表
-    """
-    api_messages = []
-    for msg in messages:
-        if isinstance(msg, HumanMessage):
-            api_messages.append({"role": "user", "content": msg.content})
-        elif isinstance(msg, SystemMessage):
-            api_messages.append({"role": "system", "content": msg.content})
-        elif isinstance(msg, AIMessage):
-            api_messages.append({"role": "assistant", "content": msg.content})
-        elif isinstance(msg, AIMessageChunk):
-            api_messages.append({"role": "assistant", "content": msg.content})
-    return api_messages
 
+class DecisionState(State, total=False):
+    """决策工作流状态定义"""
+    answered: bool  # 分类节点推测执行的分支已被采用，回复已在消息列表末尾
 
-def _process_stream_response(response: requests.Response) -> Iterator[str]:
-    """
-    处理流式响应
-    
-    Args:
-        response: requests响应对象
-        
-    Yields:
-        str: 流式响应内容
-    """
-    for line in response.iter_lines():
-        if line:
-            # 移除 "data: " 前缀
-            line = line.decode("utf-8")
-            if line.startswith("data: "):
-                line = line[6:]
-            
-            # 检查是否是结束标记
-            if line == "[DONE]":
-                break
-            
-            try:
-                # 解析JSON
-                result = json.loads(line)
-                delta = result.get("choices", [{}])[0].get("delta", {})
-                content = delta.get("content", "")
-                
-                if content:
-                    yield content
-            except json.JSONDecodeError:
-                continue
 
-
-# 定义自定义ChatModel类
-class CustomChatModel(BaseChatModel):
-    """
-    自定义 ChatModel，用于调用外部 API
+def llm_node(llm: CustomChatModel, build_messages: Callable[[State], list]) -> RunnableLambda:
     """
+    构造调用 LLM 的工作流节点，同时提供同步和异步实现
     
-    def __init__(self, temperature: float = DEFAULT_TEMPERATURE, auth_token: Optional[str] = None):
-        """
-        初始化自定义 ChatModel
-        
-        Args:
-            temperature: 温度参数
-            auth_token: 认证令牌
-        """
-        super().__init__()
-        self._temperature = temperature
-        self._auth_token = auth_token
-    
-    @property
-    def temperature(self) -> float:
-        """
-        温度参数
-        
-        Returns:
-            float: 温度参数
-        """
-        return self._temperature
+    graph.invoke 走同步调用；graph.ainvoke 直接在事件循环中异步调用，不占用线程池。
+    节点在运行配置的上下文中调用 LLM，共享的 LLM 从运行配置中读取认证令牌
     
-    @temperature.setter
-    def temperature(self, value: float) -> None:
-        """
-        设置温度参数
-        
-        Args:
-            value: 温度参数
-        """
-        self._temperature = value
-    
-    @property
-    def auth_token(self) -> Optional[str]:
-        """
-        认证令牌
-        
-        Returns:
-            Optional[str]: 认证令牌
-        """
-        return self._auth_token
-    
-    @auth_token.setter
-    def auth_token(self, value: Optional[str]) -> None:
-        """
-        设置认证令牌
-        
-        Args:
-            value: 认证令牌
-        """
-        self._auth_token = value
-    
-    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
-        """
-        生成响应
-        
-        Args:
-            messages: 消息列表
-            stop: 停止词列表
-            **kwargs: 其他参数
-            
-        Returns:
-            ChatResult: 响应结果
-        """
-        # 转换消息格式
-        api_messages = _convert_messages_to_api_format(messages)
-        
-        # 准备API请求
-        request_data = _prepare_api_request(
-            api_messages, 
-            self.auth_token, 
-            temperature=self.temperature,
-            stream=False
-        )
-        
-        # 发送请求
-        response = requests.post(
-            API_ENDPOINT,
-            headers=request_data["headers"],
-            data=json.dumps(request_data["data"])
-        )
-        
-        # 处理响应
-        if response.status_code == 200:
-            result = response.json()
-            content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-            
-            # 创建 ChatResult
-            chat_generation = ChatGeneration(
-                message=AIMessage(content=content),
-                generation_info={"finish_reason": result.get("choices", [{}])[0].get("finish_reason", "stop")}
-            )
-            
-            return ChatResult(generations=[chat_generation])
-        else:
-            raise Exception(f"API请求失败: {response.status_code} - {response.text}")
-    
-    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
-        """
-        流式生成响应
-        
-        Args:
-            messages: 消息列表
-            stop: 停止词列表
-            **kwargs: 其他参数
-            
-        Yields:
-            ChatGenerationChunk: 流式响应块
-        """
-        # 转换消息格式
-        api_messages = _convert_messages_to_api_format(messages)
-        
-        # 准备API请求
-        request_data = _prepare_api_request(
-            api_messages, 
-            self.auth_token, 
-            temperature=self.temperature,
-            stream=True
-        )
-        
-        # 发送请求
-        response = requests.post(
-            API_ENDPOINT,
-            headers=request_data["headers"],
-            data=json.dumps(request_data["data"]),
-            stream=True
-        )
+    Args:
+        llm: ChatModel 实例
+        build_messages: 根据当前状态构造提示消息的函数
         
-        # 处理响应
-        if response.status_code == 200:
-            # 逐行处理流式响应
-            for content in _process_stream_response(response):
-                # 创建 ChatGenerationChunk
-                chunk = ChatGenerationChunk(
-                    message=AIMessageChunk(content=content),
-                    generation_info={}
-                )
-                yield chunk
-        else:
-            raise Exception(f"API请求失败: {response.status_code} - {response.text}")
+    Returns:
+        RunnableLambda: 工作流节点
+    """
+    def invoke(state: State):
+        return {"messages": [llm.invoke(build_messages(state))]}
     
-    @property
-    def _llm_type(self) -> str:
-        """
-        LLM 类型
-        
-        Returns:
-            str: LLM 类型
-        """
-        return "custom_chat_model"
+    async def ainvoke(state: State):
+        return {"messages": [await llm.ainvoke(build_messages(state))]}
     
-    @property
-    def _identifying_params(self) -> Dict[str, Any]:
-        """
-        识别参数
-        
-        Returns:
-            Dict[str, Any]: 识别参数
-        """
-        return {
-            "temperature": self.temperature
-        }
-
-
-# 定义状态结构
-class State(TypedDict):
-    """工作流状态定义"""
-    messages: Annotated[list, add_messages]
+    return RunnableLambda(invoke, afunc=ainvoke)
 
 
 # 定义工作流节点
@@ -295,9 +67,9 @@ class SimpleWorkflow:
         
         Args:
             model_name: 模型名称（仅用于兼容）
-            auth_token: 认证令牌
+            auth_token: 认证令牌（可选，也可以在运行时通过 auth_token 参数传入）
         """
-        self.llm = CustomChatModel(temperature=0.7, auth_token=auth_token)
+        self.llm = CustomChatModel(auth_token=auth_token)
         self.graph = self._build_graph()
         self.app = self.graph.compile()
     
@@ -312,8 +84,8 @@ class SimpleWorkflow:
         graph = StateGraph(State)
         
         # 添加节点
-        graph.add_node("generate", self._generate_response)
-        graph.add_node("summarize", self._summarize_conversation)
+        graph.add_node("generate", llm_node(self.llm, self._generate_messages))
+        graph.add_node("summarize", llm_node(self.llm, self._summarize_messages))
         
         # 设置入口点
         graph.set_entry_point("generate")
@@ -324,53 +96,46 @@ class SimpleWorkflow:
         
         return graph
     
-    def _generate_response(self, state: State):
+    def _generate_messages(self, state: State) -> list:
         """
-        生成响应节点
+        生成响应节点的提示消息
         
         Args:
             state: 当前状态
             
         Returns:
-            dict: 更新后的状态
+            list: 提示消息
         """
         # 获取最新的用户消息
         user_message = state["messages"][-1]
         
-        # 生成响应
-        response = self.llm.invoke([
+        return [
             ("system", "你是一个 helpful 的助手。请用中文回答。"),
             user_message
-        ])
-        
-        # 返回更新后的状态
-        return {"messages": [response]}
+        ]
     
-    def _summarize_conversation(self, state: State):
+    def _summarize_messages(self, state: State) -> list:
         """
-        总结对话节点
+        总结对话节点的提示消息
         
         Args:
             state: 当前状态
             
         Returns:
-            dict: 更新后的状态
+            list: 提示消息
         """
-        # 生成对话总结
-        summary = self.llm.invoke([
+        return [
             ("system", "请总结以下对话，保持简洁明了。"),
             ("user", "\n".join([msg.content for msg in state["messages"]]))
-        ])
-        
-        # 返回更新后的状态
-        return {"messages": [summary]}
+        ]
     
-    def run(self, user_input: str):
+    def run(self, user_input: str, auth_token: Optional[str] = None):
         """
         运行工作流
         
         Args:
             user_input: 用户输入
+            auth_token: 认证令牌
             
         Returns:
             dict: 工作流执行结果
@@ -378,16 +143,32 @@ class SimpleWorkflow:
         # 运行工作流
         result = self.app.invoke({
             "messages": [("user", user_input)]
-        })
+        }, config=auth_config(auth_token))
         
         return result
     
-    def stream(self, user_input: str) -> Iterator[Dict[str, Any]]:
+    async def arun(self, user_input: str, auth_token: Optional[str] = None):
+        """
+        异步运行工作流（不阻塞事件循环）
+        
+        Args:
+            user_input: 用户输入
+            auth_token: 认证令牌
+            
+        Returns:
+            dict: 工作流执行结果
+        """
+        return await self.app.ainvoke({
+            "messages": [("user", user_input)]
+        }, config=auth_config(auth_token))
+    
+    def stream(self, user_input: str, auth_token: Optional[str] = None) -> Iterator[Dict[str, Any]]:
         """
         流式运行工作流
         
         Args:
             user_input: 用户输入
+            auth_token: 认证令牌
             
         Yields:
             Iterator[Dict[str, Any]]: 工作流执行结果的流式输出
@@ -395,7 +176,7 @@ class SimpleWorkflow:
         # 流式运行工作流
         for chunk in self.app.stream({
             "messages": [("user", user_input)]
-        }):
+        }, config=auth_config(auth_token)):
             yield chunk
 
 
@@ -403,15 +184,30 @@ class SimpleWorkflow:
 class DecisionWorkflow:
     """包含决策节点的LangGraph工作流示例"""
     
-    def __init__(self, model_name: str = "gpt-3.5-turbo", auth_token: Optional[str] = None):
+    def __init__(self, model_name: str = "gpt-3.5-turbo", auth_token: Optional[str] = None,
+                 intent: Optional[IntentClassifier] = None, speculation: Optional[Speculation] = None):
         """
         初始化决策工作流
         
         Args:
             model_name: 模型名称（仅用于兼容）
-            auth_token: 认证令牌
-        """
-        self.llm = CustomChatModel(temperature=0.7, auth_token=auth_token)
+            auth_token: 认证令牌（可选，也可以在运行时通过 auth_token 参数传入）
+            intent: 本地意图识别，默认使用进程内共享的实例
+            speculation: 推测执行控制（是否启用由 settings.LLM_DECISION_SPECULATE 控制），默认使用进程内共享的实例
+        """
+        # 单轮决策的回复可复用，使用响应缓存（推测执行的分支除外）
+        self.llm = CustomChatModel(auth_token=auth_token, use_cache=True)
+        self.intent = intent or intent_classifier
+        self.speculation = speculation or decision_speculation
+        
+        # 分类和各分支的链，图中的节点和直接流式输出回复时共用
+        self.classifier = RunnableLambda(self._classify_messages) | self.llm
+        self.responders = {
+            "question": RunnableLambda(self._answer_messages) | self.llm,
+            "translate": RunnableLambda(self._translate_messages) | self.llm,
+            "summarize": RunnableLambda(self._summarize_messages) | self.llm
+        }
+        
         self.graph = self._build_graph()
         self.app = self.graph.compile()
     
@@ -423,16 +219,24 @@ class DecisionWorkflow:
             StateGraph: 构建好的工作流图
         """
         # 创建状态图
-        graph = StateGraph(State)
+        graph = StateGraph(DecisionState)
         
-        # 添加节点
-        graph.add_node("classify", self._classify_input)
-        graph.add_node("answer_question", self._answer_question)
-        graph.add_node("translate", self._translate_text)
-        graph.add_node("summarize", self._summarize_text)
+        # 添加节点（分类节点异步运行时可推测执行最可能的分支）
+        graph.add_node("classify", RunnableLambda(self._classify_node, afunc=self._aclassify_node))
+        graph.add_node("answer_question", llm_node(self.llm, self._answer_messages))
+        graph.add_node("translate", llm_node(self.llm, self._translate_messages))
+        graph.add_node("summarize", llm_node(self.llm, self._summarize_messages))
         
-        # 设置入口点
-        graph.set_entry_point("classify")
+        # 设置入口点：本地能确定输入类型时直接进入对应节点，否则先由 LLM 分类
+        graph.set_conditional_entry_point(
+            self._route_input,
+            {
+                "classify": "classify",
+                "question": "answer_question",
+                "translate": "translate",
+                "summarize": "summarize"
+            }
+        )
         
         # 添加条件边
         graph.add_conditional_edges(
@@ -441,7 +245,8 @@ class DecisionWorkflow:
             {
                 "question": "answer_question",
                 "translate": "translate",
-                "summarize": "summarize"
+                "summarize": "summarize",
+                END: END
             }
         )
         
@@ -452,33 +257,88 @@ class DecisionWorkflow:
         
         return graph
     
-    def _classify_input(self, state: State):
+    def _classify_messages(self, state: State) -> list:
         """
-        分类输入节点
+        分类输入节点的提示消息（节点输出的消息内容即分类结果）
         
         Args:
             state: 当前状态
             
         Returns:
-            dict: 更新后的状态，包含分类结果
+            list: 提示消息
         """
         # 获取用户输入
         user_message = state["messages"][-1].content
         
-        # 分类输入类型
-        classification = self.llm.invoke([
+        return [
             ("system", "请将用户输入分类为以下类型之一：question（问题）、translate（翻译请求）、summarize（总结请求）。只返回类型名称，不要返回其他内容。"),
             ("user", user_message)
-        ])
+        ]
+    
+    def _route_input(self, state: State) -> str:
+        """
+        入口路由：先用本地规则/模型判断输入类型
         
-        # 返回分类结果
-        return {
-            "messages": [classification]
-        }
+        Args:
+            state: 当前状态
+            
+        Returns:
+            str: 输入类型，本地无法确定时返回 classify
+        """
+        return self.intent.classify_local(state["messages"][-1].content) or "classify"
+    
+    def _classification(self, state: State, result: AIMessage) -> AIMessage:
+        """记录 LLM 分类结果，返回内容为规范化类型的分类消息"""
+        return AIMessage(content=self.intent.record_llm(state["messages"][0].content, result.content))
     
-    def _route_based_on_classification(self, state: State):
+    def _classify_node(self, state: State):
         """
-        根据分类结果路由到不同节点
+        分类节点（同步）
+        
+        Args:
+            state: 当前状态
+            
+        Returns:
+            dict: 更新后的状态
+        """
+        return {"messages": [self._classification(state, self.classifier.invoke(state))]}
+    
+    async def _aclassify_node(self, state: State):
+        """
+        分类节点（异步）
+        
+        启用推测执行时，在等待 LLM 分类的同时执行最可能的分支：
+        猜中时直接采用其回复并结束，猜错时取消
+        
+        Args:
+            state: 当前状态
+            
+        Returns:
+            dict: 更新后的状态
+        """
+        guess = self.intent.guess(state["messages"][0].content) if settings.LLM_DECISION_SPECULATE else None
+        task = None
+        if guess:
+            # 推测的分支可能被取消或不被采用，不读写响应缓存
+            with bypass_response_cache():
+                task = self.speculation.start(self.responders[guess].ainvoke(state))
+        if task is None:
+            return {"messages": [self._classification(state, await self.classifier.ainvoke(state))]}
+        
+        try:
+            classification = self._classification(state, await self.classifier.ainvoke(state))
+            hit = classification.content == guess
+            self.speculation.record(hit)
+            if hit:
+                return {"messages": [classification, await task], "answered": True}
+            return {"messages": [classification]}
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    def _route_based_on_classification(self, state: DecisionState):
+        """
+        根据分类结果路由到不同节点，推测执行的回复已被采用时直接结束
         
         Args:
             state: 当前状态
@@ -486,42 +346,39 @@ class DecisionWorkflow:
         Returns:
             str: 下一个节点名称
         """
-        # 获取分类结果
-        classification = state["messages"][-1].content.lower().strip()
+        if state.get("answered"):
+            return END
         
-        # 返回对应的节点名称
-        return classification
+        # 获取分类结果
+        return state["messages"][-1].content
     
-    def _answer_question(self, state: State):
+    def _answer_messages(self, state: State) -> list:
         """
-        回答问题节点
+        回答问题节点的提示消息
         
         Args:
             state: 当前状态
             
         Returns:
-            dict: 更新后的状态
+            list: 提示消息
         """
         # 获取用户问题
         user_question = state["messages"][0].content
         
-        # 回答问题
-        answer = self.llm.invoke([
+        return [
             ("system", "你是一个 helpful 的助手。请用中文回答用户的问题。"),
             ("user", user_question)
-        ])
-        
-        return {"messages": [answer]}
+        ]
     
-    def _translate_text(self, state: State):
+    def _translate_messages(self, state: State) -> list:
         """
-        翻译文本节点
+        翻译文本节点的提示消息
         
         Args:
             state: 当前状态
             
         Returns:
-            dict: 更新后的状态
+            list: 提示消息
         """
         # 获取用户输入的文本
         user_text = state["messages"][0].content
@@ -530,23 +387,20 @@ class DecisionWorkflow:
         import re
         text_to_translate = re.sub(r'^(翻译|translate)[:：]?\s*', '', user_text, flags=re.IGNORECASE)
         
-        # 翻译文本
-        translation = self.llm.invoke([
+        return [
             ("system", "请将用户输入的文本翻译成英文。"),
             ("user", text_to_translate)
-        ])
-        
-        return {"messages": [translation]}
+        ]
     
-    def _summarize_text(self, state: State):
+    def _summarize_messages(self, state: State) -> list:
         """
-        总结文本节点
+        总结文本节点的提示消息
         
         Args:
             state: 当前状态
             
         Returns:
-            dict: 更新后的状态
+            list: 提示消息
         """
         # 获取用户输入的文本
         user_text = state["messages"][0].content
@@ -555,20 +409,18 @@ class DecisionWorkflow:
         import re
         text_to_summarize = re.sub(r'^(总结|summarize)[:：]?\s*', '', user_text, flags=re.IGNORECASE)
         
-        # 总结文本
-        summary = self.llm.invoke([
+        return [
             ("system", "请总结用户输入的文本，保持简洁明了。"),
             ("user", text_to_summarize)
-        ])
-        
-        return {"messages": [summary]}
+        ]
     
-    def run(self, user_input: str):
+    def run(self, user_input: str, auth_token: Optional[str] = None):
         """
         运行决策工作流
         
         Args:
             user_input: 用户输入
+            auth_token: 认证令牌
             
         Returns:
             dict: 工作流执行结果
@@ -576,16 +428,32 @@ class DecisionWorkflow:
         # 运行工作流
         result = self.app.invoke({
             "messages": [("user", user_input)]
-        })
+        }, config=auth_config(auth_token))
         
         return result
     
-    def stream(self, user_input: str) -> Iterator[Dict[str, Any]]:
+    async def arun(self, user_input: str, auth_token: Optional[str] = None):
+        """
+        异步运行决策工作流（不阻塞事件循环）
+        
+        Args:
+            user_input: 用户输入
+            auth_token: 认证令牌
+            
+        Returns:
+            dict: 工作流执行结果
+        """
+        return await self.app.ainvoke({
+            "messages": [("user", user_input)]
+        }, config=auth_config(auth_token))
+    
+    def stream(self, user_input: str, auth_token: Optional[str] = None) -> Iterator[Dict[str, Any]]:
         """
         流式运行决策工作流
         
         Args:
             user_input: 用户输入
+            auth_token: 认证令牌
             
         Yields:
             Iterator[Dict[str, Any]]: 工作流执行结果的流式输出
@@ -593,23 +461,125 @@ class DecisionWorkflow:
         # 流式运行工作流
         for chunk in self.app.stream({
             "messages": [("user", user_input)]
-        }):
+        }, config=auth_config(auth_token)):
             yield chunk
+    
+    async def aclassify(self, user_input: str, auth_token: Optional[str] = None) -> str:
+        """
+        对用户输入分类，本地规则/模型能确定时不调用 LLM
+        
+        Args:
+            user_input: 用户输入
+            auth_token: 认证令牌
+            
+        Returns:
+            str: 分类结果（question / translate / summarize）
+        """
+        classification = self.intent.classify_local(user_input)
+        if classification is not None:
+            return classification
+        return await self._allm_classify(user_input, auth_token)
+    
+    async def _allm_classify(self, user_input: str, auth_token: Optional[str] = None) -> str:
+        """由 LLM 对用户输入分类"""
+        state = {"messages": [HumanMessage(content=user_input)]}
+        result = await self.classifier.ainvoke(state, config=auth_config(auth_token))
+        return self.intent.record_llm(user_input, result.content)
+    
+    async def astream_response(self, user_input: str, classification: str,
+                               auth_token: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        按分类结果流式生成回复文本，未知分类按问题处理
+        
+        Args:
+            user_input: 用户输入
+            classification: aclassify 返回的分类结果
+            auth_token: 认证令牌
+            
+        Yields:
+            str: 回复文本片段
+        """
+        responder = self.responders.get(classification, self.responders["question"])
+        state = {"messages": [HumanMessage(content=user_input)]}
+        async for chunk in responder.astream(state, config=auth_config(auth_token)):
+            if chunk.content:
+                yield chunk.content
+    
+    async def astream_decision(self, user_input: str, auth_token: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        分类并流式生成回复文本
+        
+        本地无法确定类型且启用了推测执行时，在等待 LLM 分类的同时开始流式生成最可能分支的回复并缓冲，
+        猜中时先补发缓冲的片段再继续输出，猜错时取消
+        
+        Args:
+            user_input: 用户输入
+            auth_token: 认证令牌
+            
+        Yields:
+            str: 回复文本片段
+        """
+        classification = self.intent.classify_local(user_input)
+        task = None
+        if classification is None and settings.LLM_DECISION_SPECULATE:
+            guess = self.intent.guess(user_input)
+            buffered: asyncio.Queue = asyncio.Queue()
+            
+            async def speculate():
+                try:
+                    async for chunk in self.astream_response(user_input, guess, auth_token):
+                        buffered.put_nowait(chunk)
+                finally:
+                    buffered.put_nowait(None)
+            
+            with bypass_response_cache():
+                task = self.speculation.start(speculate())
+        
+        try:
+            if classification is None:
+                classification = await self._allm_classify(user_input, auth_token)
+            if task is not None:
+                hit = classification == guess
+                self.speculation.record(hit)
+                if hit:
+                    while (chunk := await buffered.get()) is not None:
+                        yield chunk
+                    # 推测分支出错时抛出异常
+                    await task
+                    return
+                task.cancel()
+            
+            async for chunk in self.astream_response(user_input, classification, auth_token):
+                yield chunk
+        finally:
+            if task is not None and not task.done():
+                task.cancel()
 
 
 # 简单的对话工作流
 class ConversationWorkflow:
     """简单的对话工作流示例"""
     
-    def __init__(self, model_name: str = "gpt-3.5-turbo", auth_token: Optional[str] = None):
+    def __init__(self, model_name: str = "gpt-3.5-turbo", auth_token: Optional[str] = None,
+                 summaries: Optional[SummaryCache] = None):
         """
         初始化对话工作流
         
         Args:
             model_name: 模型名称（仅用于兼容）
-            auth_token: 认证令牌
+            auth_token: 认证令牌（可选，也可以在运行时通过 auth_token 参数传入）
+            summaries: 滚动摘要缓存，默认使用进程内共享的实例
         """
-        self.llm = CustomChatModel(temperature=0.7, auth_token=auth_token)
+        self.llm = CustomChatModel(auth_token=auth_token)
+        self.summaries = summaries or summary_cache
+        
+        # 对话链（先裁剪历史再调用 LLM），图中的节点和直接流式输出回复时共用
+        self.chat = RunnableLambda(self._chat_messages, afunc=self._achat_messages) | self.llm
+        # 折叠窗口外历史的摘要链
+        summary_llm = CustomChatModel(temperature=0, auth_token=auth_token,
+                                      max_tokens=settings.LLM_CONTEXT_SUMMARY_TOKENS)
+        self.summarizer = RunnableLambda(self._summary_messages) | summary_llm
+        
         self.graph = self._build_graph()
         self.app = self.graph.compile()
     
@@ -624,7 +594,7 @@ class ConversationWorkflow:
         graph = StateGraph(State)
         
         # 添加对话节点
-        graph.add_node("chat", self._chat)
+        graph.add_node("chat", self.chat | RunnableLambda(lambda message: {"messages": [message]}))
         
         # 设置入口点和循环
         graph.set_entry_point("chat")
@@ -632,20 +602,92 @@ class ConversationWorkflow:
         
         return graph
     
-    def _chat(self, state: State):
+    def _context(self, state: State):
         """
-        对话节点
+        按 token 预算划分对话历史，启用摘要时为摘要预留预算
         
         Args:
             state: 当前状态
             
         Returns:
-            dict: 更新后的状态
+            ContextWindow: 划分结果
+        """
+        messages = _convert_messages_to_api_format(convert_to_messages(state["messages"]))
+        reserve = 0
+        if settings.LLM_CONTEXT_SUMMARY:
+            reserve = settings.LLM_CONTEXT_SUMMARY_TOKENS + MESSAGE_OVERHEAD + estimate_tokens(SUMMARY_PREFIX)
+        return split_context(messages, reserve=reserve)
+    
+    def _summary_plan(self, window):
+        """需要折叠的历史：(已缓存的摘要, [(消息块, 缓存键), ...])"""
+        if not (settings.LLM_CONTEXT_SUMMARY and window.dropped):
+            return None, []
+        # 摘要请求本身也不超出 token 预算：指令 + 之前的摘要 + 消息块 + 生成的摘要
+        chunk_tokens = max(256, settings.LLM_CONTEXT_MAX_TOKENS - 2 * settings.LLM_CONTEXT_SUMMARY_TOKENS - 128)
+        return self.summaries.plan(window, chunk_tokens)
+    
+    @staticmethod
+    def _fold(result: AIMessage) -> str:
+        """摘要结果（上游未遵守 max_tokens 时本地截断）"""
+        return truncate_text(result.content, settings.LLM_CONTEXT_SUMMARY_TOKENS)
+    
+    @staticmethod
+    def _prompt(window, summary: Optional[str]) -> list:
+        """组装提示消息"""
+        return [(message["role"], message["content"]) for message in window.build(summary)]
+    
+    def _chat_messages(self, state: State) -> list:
+        """
+        对话节点的提示消息：固定保留系统提示，最近的消息放入滑动窗口，
+        更早的历史丢弃或折叠为滚动摘要，发往上游的 token 数不超过 settings.LLM_CONTEXT_MAX_TOKENS
+        
+        Args:
+            state: 当前状态
+            
+        Returns:
+            list: 提示消息
+        """
+        window = self._context(state)
+        summary, folds = self._summary_plan(window)
+        for chunk, key in folds:
+            summary = self._fold(self.summarizer.invoke({"summary": summary, "messages": chunk}))
+            self.summaries.store(key, summary)
+        return self._prompt(window, summary)
+    
+    async def _achat_messages(self, state: State) -> list:
         """
-        # 生成响应
-        response = self.llm.invoke(state["messages"])
+        对话节点的提示消息（异步折叠摘要）
         
-        return {"messages": [response]}
+        Args:
+            state: 当前状态
+            
+        Returns:
+            list: 提示消息
+        """
+        window = self._context(state)
+        summary, folds = self._summary_plan(window)
+        for chunk, key in folds:
+            summary = self._fold(await self.summarizer.ainvoke({"summary": summary, "messages": chunk}))
+            self.summaries.store(key, summary)
+        return self._prompt(window, summary)
+    
+    def _summary_messages(self, fold: Dict[str, Any]) -> list:
+        """
+        折叠摘要的提示消息
+        
+        Args:
+            fold: 之前的摘要（summary）和需要折叠的消息块（messages）
+            
+        Returns:
+            list: 提示消息
+        """
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in fold["messages"])
+        previous = f"之前的摘要：\n{fold['summary']}\n\n" if fold["summary"] else ""
+        return [
+            ("system", f"请将对话内容压缩为简洁的摘要，保留关键事实、用户的偏好和尚未解决的问题，"
+                       f"不超过 {settings.LLM_CONTEXT_SUMMARY_TOKENS} 个 token。"),
+            ("user", f"{previous}新的对话内容：\n{transcript}")
+        ]
     
     def _chat_stream(self, state: State):
         """
@@ -666,12 +708,13 @@ class ConversationWorkflow:
             # 返回更新后的状态
             yield {"messages": [AIMessage(content=full_content)]}
     
-    def run(self, messages: list):
+    def run(self, messages: list, auth_token: Optional[str] = None):
         """
         运行对话工作流
         
         Args:
             messages: 对话消息列表
+            auth_token: 认证令牌
             
         Returns:
             dict: 工作流执行结果
@@ -679,16 +722,32 @@ class ConversationWorkflow:
         # 运行工作流
         result = self.app.invoke({
             "messages": messages
-        })
+        }, config=auth_config(auth_token))
         
         return result
     
-    def stream(self, messages: list) -> Iterator[Dict[str, Any]]:
+    async def arun(self, messages: list, auth_token: Optional[str] = None):
+        """
+        异步运行对话工作流（不阻塞事件循环）
+        
+        Args:
+            messages: 对话消息列表
+            auth_token: 认证令牌
+            
+        Returns:
+            dict: 工作流执行结果
+        """
+        return await self.app.ainvoke({
+            "messages": messages
+        }, config=auth_config(auth_token))
+    
+    def stream(self, messages: list, auth_token: Optional[str] = None) -> Iterator[Dict[str, Any]]:
         """
         流式运行对话工作流
         
         Args:
             messages: 对话消息列表
+            auth_token: 认证令牌
             
         Yields:
             Iterator[Dict[str, Any]]: 工作流执行结果的流式输出
@@ -696,66 +755,39 @@ class ConversationWorkflow:
         # 流式运行工作流
         for chunk in self.app.stream({
             "messages": messages
-        }):
+        }, config=auth_config(auth_token)):
             yield chunk
+    
+    async def astream_reply(self, messages: list, auth_token: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        流式生成对话回复文本
+        
+        Args:
+            messages: 对话消息列表
+            auth_token: 认证令牌
+            
+        Yields:
+            str: 回复文本片段
+        """
+        async for chunk in self.chat.astream({"messages": messages}, config=auth_config(auth_token)):
+            if chunk.content:
+                yield chunk.content
 
 
-
-def validate_model(auth_token: str, prompt: str = DEFAULT_VALIDATION_PROMPT) -> dict:
+@lru_cache(maxsize=None)
+def get_workflow(workflow_cls: type):
     """
-    验证模型是否可用
+    获取进程内共享的工作流实例（图只构建、编译一次）
+    
+    共享实例不绑定认证令牌，调用 run/arun/stream 时通过 auth_token 参数传入
     
     Args:
-        auth_token: 认证令牌 (API key)
-        prompt: 测试提示词
+        workflow_cls: 工作流类（SimpleWorkflow / DecisionWorkflow / ConversationWorkflow）
         
     Returns:
-        dict: 包含响应结果和状态信息
+        工作流实例
     """
-    try:
-        # 准备请求头
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {auth_token}"
-        }
-        
-        # 准备请求体
-        data = {
-            "model": DEFAULT_MODEL,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": DEFAULT_TEMPERATURE,
-            "max_tokens": DEFAULT_MAX_TOKENS
-        }
-        
-        # 发送请求
-        response = requests.post(
-            API_ENDPOINT,
-            headers=headers,
-            data=json.dumps(data)
-        )
-        
-        # 检查响应状态
-        if response.status_code == 200:
-            result = response.json()
-            return {
-                "success": True,
-                "content": result.get("choices", [{}])[0].get("message", {}).get("content", ""),
-                "response": result
-            }
-        else:
-            return {
-                "success": False,
-                "error": f"API请求失败: {response.status_code}",
-                "content": response.text
-            }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": f"请求过程中发生错误: {str(e)}",
-            "content": str(e)
-        }
+    return workflow_cls()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,287 @@
+"""
+对话会话
+以 LangGraph 检查点（SQLite）在服务端保存对话历史：客户端每轮只发送新的消息，
+由 State 的 add_messages 合并进已保存的历史。
+会话自最后一次对话起超过有效期后删除；每轮对话后压缩检查点：
+只保留最新的检查点，并删除超出上限的最早消息
+"""
+
+import asyncio
+import hashlib
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+from langchain_core.messages import AIMessage, RemoveMessage, convert_to_messages
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from config import settings
+from examples.langchain_example import auth_config
+from examples.langgraph_example import ConversationWorkflow, get_workflow
+
+# 每隔多少秒清理一次过期会话
+_EVICT_INTERVAL = 60
+
+
+class ConversationSessions:
+    """
+    服务端保存的对话会话
+    会话按认证令牌隔离：不同令牌使用相同的 session_id 互不可见
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_messages: Optional[int] = None,
+        workflow: Optional[ConversationWorkflow] = None
+    ):
+        """
+        初始化
+
+        Args:
+            path: 检查点 SQLite 文件，默认取 settings.LLM_SESSION_FILE
+            ttl: 会话有效期（秒），默认取 settings.LLM_SESSION_TTL
+            max_messages: 会话保存的最多消息数（不含开头的系统提示），默认取 settings.LLM_SESSION_MAX_MESSAGES
+            workflow: 对话工作流，默认使用进程内共享的实例
+        """
+        self.path = path or settings.LLM_SESSION_FILE
+        self.ttl = ttl or settings.LLM_SESSION_TTL
+        self.max_messages = max_messages or settings.LLM_SESSION_MAX_MESSAGES
+        self.workflow = workflow or get_workflow(ConversationWorkflow)
+        self.app = None
+        self._saver: Optional[AsyncSqliteSaver] = None
+        self._opened: Optional[asyncio.Future] = None
+        # 同一会话的多轮对话串行执行
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._last_evict = 0.0
+        self._stats = {"turns": 0, "evicted": 0, "compacted_checkpoints": 0, "trimmed_messages": 0}
+
+    async def open(self) -> None:
+        """打开检查点存储（可重复调用，只打开一次）"""
+        if self._opened is None:
+            self._opened = asyncio.ensure_future(self._open())
+        await asyncio.shield(self._opened)
+
+    async def _open(self) -> None:
+        """建立连接、建表并编译带检查点的工作流"""
+        conn = await aiosqlite.connect(self.path)
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        async with saver.lock:
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_sessions ("
+                "thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversation_sessions_updated_at "
+                "ON conversation_sessions (updated_at)"
+            )
+            await conn.commit()
+        self._saver = saver
+        self.app = self.workflow.graph.compile(checkpointer=saver)
+
+    async def close(self) -> None:
+        """关闭检查点存储"""
+        if self._saver is not None:
+            await self._saver.conn.close()
+        self._saver = None
+        self._opened = None
+        self.app = None
+
+    @staticmethod
+    def _thread_id(auth_token: Optional[str], session_id: str) -> str:
+        """检查点线程ID：认证令牌指纹 + 会话ID"""
+        fingerprint = hashlib.blake2b((auth_token or "").encode("utf-8"), digest_size=8).hexdigest()
+        return f"{fingerprint}:{session_id}"
+
+    @staticmethod
+    def _config(thread_id: str, auth_token: Optional[str]) -> RunnableConfig:
+        """携带认证令牌和线程ID的运行配置"""
+        config = auth_config(auth_token)
+        config["configurable"]["thread_id"] = thread_id
+        return config
+
+    def _lock(self, thread_id: str) -> asyncio.Lock:
+        """会话锁"""
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[thread_id] = lock
+        return lock
+
+    async def arun(self, session_id: str, messages: list, auth_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        在会话中进行一轮对话
+
+        Args:
+            session_id: 会话ID
+            messages: 本轮新增的消息
+            auth_token: 认证令牌
+
+        Returns:
+            dict: 工作流执行结果（messages 为会话的完整历史）
+        """
+        await self.open()
+        thread_id = self._thread_id(auth_token, session_id)
+        config = self._config(thread_id, auth_token)
+        async with self._lock(thread_id):
+            result = await self.app.ainvoke({"messages": messages}, config=config)
+            await self._after_turn(thread_id, config, result["messages"])
+        return result
+
+    async def astream_reply(self, session_id: str, messages: list,
+                            auth_token: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        在会话中进行一轮对话（流式输出回复），回复完整生成后才写入会话
+
+        Args:
+            session_id: 会话ID
+            messages: 本轮新增的消息
+            auth_token: 认证令牌
+
+        Yields:
+            str: 回复文本片段
+        """
+        await self.open()
+        thread_id = self._thread_id(auth_token, session_id)
+        config = self._config(thread_id, auth_token)
+        async with self._lock(thread_id):
+            snapshot = await self.app.aget_state(config)
+            history = snapshot.values.get("messages", [])
+            new_messages = convert_to_messages(messages)
+
+            contents: List[str] = []
+            async for content in self.workflow.astream_reply(history + new_messages, auth_token=auth_token):
+                contents.append(content)
+                yield content
+
+            # 与图中的对话节点一样，通过 add_messages 追加本轮消息和回复
+            await self.app.aupdate_state(
+                config, {"messages": new_messages + [AIMessage(content="".join(contents))]}, as_node="chat"
+            )
+            snapshot = await self.app.aget_state(config)
+            await self._after_turn(thread_id, config, snapshot.values["messages"])
+
+    async def _after_turn(self, thread_id: str, config: RunnableConfig, messages: list) -> None:
+        """
+        一轮对话结束后：删除超出上限的最早消息，只保留最新的检查点，刷新会话的最后对话时间
+
+        Args:
+            thread_id: 检查点线程ID
+            config: 运行配置
+            messages: 会话的完整历史
+        """
+        pinned = 0
+        while pinned < len(messages) and messages[pinned].type == "system":
+            pinned += 1
+        excess = len(messages) - pinned - self.max_messages
+        if excess > 0:
+            removals = [RemoveMessage(id=message.id) for message in messages[pinned:pinned + excess]]
+            await self.app.aupdate_state(config, {"messages": removals}, as_node="chat")
+            self._stats["trimmed_messages"] += excess
+
+        latest = (await self.app.aget_state(config)).config["configurable"]["checkpoint_id"]
+        conn = self._saver.conn
+        async with self._saver.lock:
+            cursor = await conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, latest)
+            )
+            self._stats["compacted_checkpoints"] += cursor.rowcount
+            await conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, latest))
+            await conn.execute(
+                "INSERT OR REPLACE INTO conversation_sessions (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, time.time())
+            )
+            await conn.commit()
+        self._stats["turns"] += 1
+
+        if time.monotonic() - self._last_evict >= _EVICT_INTERVAL:
+            self._last_evict = time.monotonic()
+            await self.evict_expired()
+
+    async def evict_expired(self) -> int:
+        """
+        删除过期的会话
+
+        Returns:
+            int: 删除的会话数
+        """
+        await self.open()
+        conn = self._saver.conn
+        async with self._saver.lock:
+            cursor = await conn.execute(
+                "SELECT thread_id FROM conversation_sessions WHERE updated_at < ?", (time.time() - self.ttl,)
+            )
+            expired = [row[0] for row in await cursor.fetchall()]
+        for thread_id in expired:
+            async with self._lock(thread_id):
+                await self._delete_thread(thread_id)
+        self._stats["evicted"] += len(expired)
+        return len(expired)
+
+    async def _delete_thread(self, thread_id: str) -> None:
+        """删除一个会话的检查点和会话记录"""
+        await self._saver.adelete_thread(thread_id)
+        async with self._saver.lock:
+            await self._saver.conn.execute("DELETE FROM conversation_sessions WHERE thread_id = ?", (thread_id,))
+            await self._saver.conn.commit()
+
+    async def delete(self, session_id: str, auth_token: Optional[str] = None) -> bool:
+        """
+        删除会话
+
+        Args:
+            session_id: 会话ID
+            auth_token: 认证令牌
+
+        Returns:
+            bool: 会话是否存在
+        """
+        await self.open()
+        thread_id = self._thread_id(auth_token, session_id)
+        async with self._lock(thread_id):
+            async with self._saver.lock:
+                cursor = await self._saver.conn.execute(
+                    "SELECT 1 FROM conversation_sessions WHERE thread_id = ?", (thread_id,)
+                )
+                exists = await cursor.fetchone() is not None
+            await self._delete_thread(thread_id)
+        return exists
+
+    def stats(self) -> Dict[str, int]:
+        """对话轮数、过期删除的会话数、压缩掉的检查点数与删除的最早消息数"""
+        return dict(self._stats)
+
+
+# 进程内共享的会话存储
+_sessions: Optional[ConversationSessions] = None
+
+
+async def get_conversation_sessions() -> ConversationSessions:
+    """
+    获取共享的会话存储（首次调用时打开）
+
+    Returns:
+        ConversationSessions: 会话存储
+    """
+    global _sessions
+    if _sessions is None:
+        _sessions = ConversationSessions()
+    await _sessions.open()
+    return _sessions
+
+
+def conversation_session_stats() -> Optional[Dict[str, int]]:
+    """共享会话存储的统计，尚未使用时返回None"""
+    return _sessions.stats() if _sessions is not None else None
+
+
+async def aclose_conversation_sessions() -> None:
+    """关闭共享的会话存储（应用退出时调用）"""
+    global _sessions
+    if _sessions is not None:
+        await _sessions.close()
+        _sessions = None
@@ -0,0 +1 @@
+# 推理客户端模块初始化文件
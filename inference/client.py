@@ -0,0 +1,799 @@
+"""
+LLM 推理客户端
+统一管理上游 OpenAI 兼容接口的连接池、请求编码、SSE 流式解码、重试和超时，
+LangChain / LangGraph 示例与 LLM 路由都通过这里访问上游
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+try:
+    # 可选的 JSON 加速库，未安装时使用标准库
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+from config import settings
+from inference.limiter import AdaptiveLimiter, current_priority
+from inference.response_cache import CacheKey, ResponseCache, get_response_cache, replay_chunks
+from inference.singleflight import SingleFlight
+
+# 可以安全重试的上游状态码（限流、网关错误），此时请求尚未被模型处理
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+# 拿到响应头之前出现时可以重试的网络异常：建连失败，或复用的长连接已被对端关闭
+# （对端空闲超时关闭连接与本端复用连接同时发生时表现为 ReadError / WriteError）
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.RemoteProtocolError,
+    httpx.ReadError,
+    httpx.WriteError
+)
+
+# 流式响应结束标记
+STREAM_DONE = object()
+
+# 为 True 时代码块内发起的调用不读写响应缓存（如推测执行的分支）
+_bypass_cache: ContextVar[bool] = ContextVar("llm_bypass_response_cache", default=False)
+
+# SSE 解析用到的字节常量
+_DATA_PREFIX = b"data:"
+_DONE = b"[DONE]"
+_CONTENT_KEY = b'"content":'
+_ERROR_KEY = b'"error"'
+
+
+@contextmanager
+def bypass_response_cache() -> Iterator[None]:
+    """
+    在代码块内发起的上游调用（包括在其中创建的任务）不读写响应缓存
+    """
+    token = _bypass_cache.set(True)
+    try:
+        yield
+    finally:
+        _bypass_cache.reset(token)
+
+
+class LLMAPIError(Exception):
+    """
+    LLM API 异常类
+    """
+    def __init__(self, message: str, status_code: Optional[int] = None, body: Optional[str] = None):
+        """
+        初始化异常
+
+        Args:
+            message: 错误消息
+            status_code: HTTP 状态码
+            body: 上游返回的响应内容
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+def _decode_sse_data(data: bytes, start: int, end: int) -> Any:
+    """
+    解析 data[start:end] 这一行（不含换行符），不复制整行
+
+    常见的增量片段（"content":"..." 中没有转义字符、也没有 error 字段）直接按字节定位内容，
+    其余情况完整解析 JSON
+    """
+    if start == end or data[start] == 0x3A:  # 空行或以 ":" 开头的注释行
+        return None
+
+    # 移除 "data:" 前缀
+    if data.startswith(_DATA_PREFIX, start):
+        start += len(_DATA_PREFIX)
+        while start < end and data[start] in b" \t":
+            start += 1
+
+    # 检查是否是结束标记
+    if end - start == len(_DONE) and data.startswith(_DONE, start):
+        return STREAM_DONE
+
+    # 快速路径：定位 "content":"（冒号后可以有空格），内容中没有转义字符时直接截取
+    content_start = data.find(_CONTENT_KEY, start, end)
+    if content_start >= 0 and data.find(_ERROR_KEY, start, end) < 0:
+        content_start += len(_CONTENT_KEY)
+        while content_start < end and data[content_start] == 0x20:
+            content_start += 1
+        if content_start < end and data[content_start] == 0x22:  # 字符串值
+            content_start += 1
+            content_end = data.find(b'"', content_start, end)
+            if content_end >= 0 and data.find(b"\\", content_start, content_end) < 0:
+                return data[content_start:content_end].decode("utf-8", "replace")
+
+    try:
+        result = _json_loads(memoryview(data)[start:end] if orjson is not None else data[start:end])
+    except ValueError:
+        return None
+    if not isinstance(result, dict):
+        return None
+    _raise_for_error(result)
+
+    choices = result.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+def decode_sse_line(line: Any) -> Any:
+    """
+    解析流式响应的一行数据
+
+    Args:
+        line: 去掉换行符的一行（bytes 或 str）
+
+    Returns:
+        增量内容（可能为空字符串）；遇到结束标记时返回 STREAM_DONE；
+        空行、注释行和无法解析的行返回 None
+
+    Raises:
+        LLMAPIError: API返回错误
+    """
+    if isinstance(line, str):
+        line = line.encode("utf-8")
+    return _decode_sse_data(line, 0, len(line))
+
+
+class SSEDecoder:
+    """
+    增量 SSE 解码器
+    直接处理上游返回的原始字节块：按换行符切分事件行并就地解析，
+    跨块的半行留到下一块，不需要先把整块解码成字符串再逐行拆分
+    """
+
+    def __init__(self):
+        """初始化"""
+        self._pending = b""
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """
+        输入一块原始字节
+
+        Args:
+            chunk: 上游返回的字节块
+
+        Returns:
+            List[str]: 本块中解析出的非空增量内容（收到结束标记后的内容会被忽略）
+
+        Raises:
+            LLMAPIError: API返回错误
+        """
+        if self._pending:
+            chunk = self._pending + chunk
+        contents = []
+        start = 0
+        while not self.done:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            line_end = end - 1 if end > start and chunk[end - 1] == 0x0D else end
+            content = _decode_sse_data(chunk, start, line_end)
+            if content is STREAM_DONE:
+                self.done = True
+            elif content:
+                contents.append(content)
+            start = end + 1
+        self._pending = b"" if self.done else chunk[start:]
+        return contents
+
+    def flush(self) -> List[str]:
+        """
+        响应结束时解析最后一行（上游没有以换行符结尾时）
+
+        Returns:
+            List[str]: 解析出的非空增量内容
+        """
+        pending, self._pending = self._pending, b""
+        if self.done or not pending:
+            return []
+        content = _decode_sse_data(pending, 0, len(pending.rstrip(b"\r")))
+        if content is STREAM_DONE:
+            self.done = True
+            return []
+        return [content] if content else []
+
+
+def message_content(result: Dict[str, Any]) -> str:
+    """从非流式响应中取出回复文本"""
+    choices = result.get("choices") or [{}]
+    return (choices[0].get("message") or {}).get("content") or ""
+
+
+def _cached_result(content: str) -> Dict[str, Any]:
+    """用缓存的回复构造与上游一致的非流式响应"""
+    return {
+        "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "cached": True
+    }
+
+
+def _raise_for_error(result: Dict[str, Any]) -> None:
+    """响应体中带有 error 字段时抛出异常"""
+    if "error" in result:
+        error = result["error"]
+        error_msg = error.get("message", "Unknown error") if isinstance(error, dict) else str(error)
+        raise LLMAPIError(f"API returned error: {error_msg}")
+
+
+class InferenceClient:
+    """
+    上游推理接口客户端
+
+    同步调用使用 httpx.Client，异步调用使用与事件循环绑定的 httpx.AsyncClient，
+    两者共享同一套连接池、超时和重试配置。只在拿到响应头之前重试，
+    流式响应开始输出后不再重试，避免重复内容。
+    启用响应缓存时，相同输入直接返回缓存的回复，流式调用按片段回放；
+    异步调用中同一时刻的相同请求合并为一次上游调用
+    """
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        model: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None
+    ):
+        """
+        初始化客户端，未指定的参数取自 settings
+
+        Args:
+            endpoint: 上游 chat/completions 接口地址
+            model: 模型名称
+            max_retries: 最大重试次数
+            retry_backoff: 首次重试等待时间（秒）
+        """
+        self.endpoint = endpoint or settings.LLM_API_ENDPOINT
+        self.model = model or settings.LLM_MODEL
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = settings.LLM_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {
+            "requests": 0, "retries": 0, "errors": 0,
+            # 流式调用的完成/提前中止次数及收到的增量片段数（通常一个片段对应一个 token）
+            "completed_streams": 0, "completed_stream_tokens": 0,
+            "aborted_streams": 0, "aborted_stream_tokens": 0
+        }
+        self._single_flight = SingleFlight()
+        # 异步调用的自适应并发限制（同步调用不经过限制器）
+        self.limiter = AdaptiveLimiter()
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        """连接池大小配置"""
+        return httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY
+        )
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        """超时配置：读超时对流式响应按两次数据之间的间隔计算"""
+        return httpx.Timeout(settings.LLM_HTTP_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT)
+
+    @property
+    def client(self) -> httpx.Client:
+        """共享的同步HTTP客户端"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.Client(limits=self._limits(), timeout=self._timeout())
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """共享的异步HTTP客户端，事件循环变化时重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client.is_closed or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+            self._async_client_loop = loop
+        return self._async_client
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        """共享的响应缓存，未启用时为None"""
+        return get_response_cache()
+
+    def payload(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """
+        构造上游请求体
+
+        Args:
+            messages: API格式的消息列表
+            temperature: 温度参数，默认取 settings.LLM_TEMPERATURE
+            max_tokens: 最大令牌数，默认取 settings.LLM_MAX_TOKENS
+            stream: 是否使用流式响应
+
+        Returns:
+            Dict[str, Any]: 请求体
+        """
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": settings.LLM_TEMPERATURE if temperature is None else temperature,
+            "max_tokens": max_tokens or settings.LLM_MAX_TOKENS,
+            "stream": stream
+        }
+
+    @staticmethod
+    def encode(payload: Dict[str, Any], auth_token: Optional[str]) -> Dict[str, Any]:
+        """
+        编码上游请求
+
+        Args:
+            payload: 请求体
+            auth_token: 认证令牌
+
+        Returns:
+            Dict[str, Any]: httpx 请求参数（headers 和 content）
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {auth_token}"
+        }
+        return {"headers": headers, "content": json.dumps(payload, ensure_ascii=False).encode("utf-8")}
+
+    @staticmethod
+    def _fingerprint(auth_token: Optional[str]) -> str:
+        """认证令牌指纹"""
+        return hashlib.blake2b((auth_token or "").encode("utf-8"), digest_size=8).hexdigest()
+
+    @classmethod
+    def _scope(cls, auth_token: Optional[str]) -> str:
+        """响应缓存的隔离范围：按认证令牌指纹隔离，或所有调用方共享"""
+        if settings.LLM_RESPONSE_CACHE_SCOPE != "token":
+            return ""
+        return cls._fingerprint(auth_token)
+
+    def _cache_key(self, payload: Dict[str, Any], auth_token: Optional[str], use_cache: bool) -> Optional[CacheKey]:
+        """生成响应缓存键，不使用缓存时返回None"""
+        if not use_cache or _bypass_cache.get() or self.response_cache is None:
+            return None
+        return CacheKey(payload, self._scope(auth_token))
+
+    def _flight_key(self, payload: Dict[str, Any], auth_token: Optional[str]) -> Optional[str]:
+        """
+        生成请求合并键，未启用请求合并时返回None
+
+        进行中的调用使用发起者的认证令牌，因此无论缓存范围如何都按令牌指纹隔离
+        """
+        if not settings.LLM_SINGLE_FLIGHT:
+            return None
+        return CacheKey(payload, self._fingerprint(auth_token)).key
+
+    def _cached(self, cache_key: Optional[CacheKey]) -> Optional[str]:
+        """读取缓存的回复"""
+        if cache_key is None:
+            return None
+        return self.response_cache.get(cache_key)
+
+    def _remember(self, cache_key: Optional[CacheKey], content: str) -> None:
+        """缓存完整的回复"""
+        if cache_key is not None and content:
+            self.response_cache.set(cache_key, content)
+
+    async def _acached(self, cache_key: Optional[CacheKey]) -> Optional[str]:
+        """读取缓存的回复（异步，SQLite 查询和相似度匹配不阻塞事件循环）"""
+        if cache_key is None:
+            return None
+        return await self.response_cache.aget(cache_key)
+
+    def _aremember(self, cache_key: Optional[CacheKey], content: str) -> None:
+        """缓存完整的回复（异步调用方），SQLite 写入和清理在后台线程中执行，不推迟本次响应"""
+        if cache_key is not None and content:
+            self.response_cache.set_in_background(cache_key, content)
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+        """
+        计算下一次重试前的等待时间
+
+        Args:
+            attempt: 已重试次数
+            response: 上游响应（网络异常时为None）
+
+        Returns:
+            Optional[float]: 等待秒数；不应重试时返回None
+        """
+        if attempt >= self.max_retries:
+            return None
+        if response is not None and response.status_code not in RETRY_STATUS_CODES:
+            return None
+        delay = self.retry_backoff * (2 ** attempt)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), settings.LLM_HTTP_TIMEOUT))
+        self._stats["retries"] += 1
+        return delay
+
+    def _status_error(self, response: httpx.Response) -> LLMAPIError:
+        """非 200 响应转换为异常"""
+        self._stats["errors"] += 1
+        return LLMAPIError(
+            f"API请求失败: {response.status_code} - {response.text}",
+            status_code=response.status_code,
+            body=response.text
+        )
+
+    def _network_error(self, error: Exception) -> LLMAPIError:
+        """网络异常转换为 LLMAPIError"""
+        self._stats["errors"] += 1
+        return LLMAPIError(f"网络请求失败: {str(error) or type(error).__name__}")
+
+    def _send(self, request: Dict[str, Any], stream: bool) -> httpx.Response:
+        """发送请求并按配置重试，返回 200 响应"""
+        self._stats["requests"] += 1
+        attempt = 0
+        while True:
+            try:
+                response = self.client.send(
+                    self.client.build_request("POST", self.endpoint, **request), stream=stream
+                )
+            except RETRYABLE_ERRORS as e:
+                delay = self._retry_delay(attempt)
+                if delay is None:
+                    raise self._network_error(e) from e
+            except httpx.HTTPError as e:
+                raise self._network_error(e) from e
+            else:
+                if response.status_code == 200:
+                    return response
+                delay = self._retry_delay(attempt, response)
+                if delay is None:
+                    try:
+                        response.read()
+                    finally:
+                        response.close()
+                    raise self._status_error(response)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def _asend(self, request: Dict[str, Any], stream: bool) -> httpx.Response:
+        """发送请求并按配置重试，返回 200 响应（异步）"""
+        self._stats["requests"] += 1
+        client = self.async_client
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = await client.send(
+                    client.build_request("POST", self.endpoint, **request), stream=stream
+                )
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, httpx.TimeoutException):
+                    self.limiter.observe_overload()
+                delay = self._retry_delay(attempt)
+                if delay is None:
+                    raise self._network_error(e) from e
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.TimeoutException):
+                    self.limiter.observe_overload()
+                raise self._network_error(e) from e
+            else:
+                if response.status_code == 200:
+                    if stream:
+                        # 流式调用拿到响应头的时间即首字节延迟，反映上游排队和预填充的耗时
+                        self.limiter.observe_latency(time.monotonic() - start)
+                    return response
+                if response.status_code in RETRY_STATUS_CODES:
+                    self.limiter.observe_overload()
+                delay = self._retry_delay(attempt, response)
+                if delay is None:
+                    try:
+                        await response.aread()
+                    finally:
+                        await response.aclose()
+                    raise self._status_error(response)
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _decode_result(self, response: httpx.Response) -> Dict[str, Any]:
+        """解析非流式响应"""
+        try:
+            result = response.json()
+        except ValueError as e:
+            self._stats["errors"] += 1
+            raise LLMAPIError(f"响应解析失败: {str(e)}")
+        _raise_for_error(result)
+        return result
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        auth_token: Optional[str],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        use_cache: bool = False
+    ) -> Dict[str, Any]:
+        """
+        非流式调用
+
+        Args:
+            messages: API格式的消息列表
+            auth_token: 认证令牌
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+            use_cache: 是否使用响应缓存（默认不使用，由可复用回复的接口显式开启）
+
+        Returns:
+            Dict[str, Any]: 上游响应JSON
+
+        Raises:
+            LLMAPIError: 请求失败或上游返回错误
+        """
+        payload = self.payload(messages, temperature, max_tokens, stream=False)
+        cache_key = self._cache_key(payload, auth_token, use_cache)
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return _cached_result(cached)
+        response = self._send(self.encode(payload, auth_token), stream=False)
+        result = self._decode_result(response)
+        self._remember(cache_key, message_content(result))
+        return result
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        auth_token: Optional[str],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        use_cache: bool = False
+    ) -> Iterator[str]:
+        """
+        流式调用
+
+        Args:
+            messages: API格式的消息列表
+            auth_token: 认证令牌
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+            use_cache: 是否使用响应缓存（默认不使用，由可复用回复的接口显式开启）
+
+        Yields:
+            str: 增量文本
+
+        Raises:
+            LLMAPIError: 请求失败或上游返回错误
+        """
+        payload = self.payload(messages, temperature, max_tokens, stream=True)
+        cache_key = self._cache_key(payload, auth_token, use_cache)
+        cached = self._cached(cache_key)
+        if cached is not None:
+            yield from replay_chunks(cached)
+            return
+        response = self._send(self.encode(payload, auth_token), stream=True)
+        parts = []
+        decoder = SSEDecoder()
+        try:
+            for chunk in response.iter_bytes():
+                for content in decoder.feed(chunk):
+                    parts.append(content)
+                    yield content
+                if decoder.done:
+                    break
+            for content in decoder.flush():
+                parts.append(content)
+                yield content
+        except httpx.HTTPError as e:
+            raise self._network_error(e) from e
+        except GeneratorExit:
+            # 消费方提前停止（如客户端断开），下面关闭响应即中止上游生成
+            self._record_stream(len(parts), aborted=True)
+            raise
+        finally:
+            # 完整读取的响应连接归还连接池，中途关闭的连接直接断开
+            response.close()
+        # 只缓存收到结束标记的完整回复
+        if decoder.done:
+            self._record_stream(len(parts), aborted=False)
+            self._remember(cache_key, "".join(parts))
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        auth_token: Optional[str],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        use_cache: bool = False
+    ) -> Dict[str, Any]:
+        """
+        非流式调用（异步）
+
+        Args:
+            messages: API格式的消息列表
+            auth_token: 认证令牌
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+            use_cache: 是否使用响应缓存（默认不使用，由可复用回复的接口显式开启）
+
+        Returns:
+            Dict[str, Any]: 上游响应JSON
+
+        Raises:
+            LLMAPIError: 请求失败或上游返回错误
+        """
+        payload = self.payload(messages, temperature, max_tokens, stream=False)
+        cache_key = self._cache_key(payload, auth_token, use_cache)
+        cached = await self._acached(cache_key)
+        if cached is not None:
+            return _cached_result(cached)
+        flight_key = self._flight_key(payload, auth_token)
+        if flight_key is None:
+            return await self._acomplete_upstream(payload, auth_token, cache_key)
+        return await self._single_flight.do(
+            flight_key, lambda: self._acomplete_upstream(payload, auth_token, cache_key)
+        )
+
+    async def _acomplete_upstream(
+        self,
+        payload: Dict[str, Any],
+        auth_token: Optional[str],
+        cache_key: Optional[CacheKey]
+    ) -> Dict[str, Any]:
+        """向上游发起非流式调用并写入响应缓存"""
+        async with self.limiter.acquire(current_priority(stream=False)):
+            response = await self._asend(self.encode(payload, auth_token), stream=False)
+            result = self._decode_result(response)
+        self._aremember(cache_key, message_content(result))
+        return result
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        auth_token: Optional[str],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        use_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        流式调用（异步）
+
+        Args:
+            messages: API格式的消息列表
+            auth_token: 认证令牌
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+            use_cache: 是否使用响应缓存（默认不使用，由可复用回复的接口显式开启）
+
+        Yields:
+            str: 增量文本
+
+        Raises:
+            LLMAPIError: 请求失败或上游返回错误
+        """
+        payload = self.payload(messages, temperature, max_tokens, stream=True)
+        cache_key = self._cache_key(payload, auth_token, use_cache)
+        cached = await self._acached(cache_key)
+        if cached is not None:
+            for chunk in replay_chunks(cached):
+                yield chunk
+            return
+        flight_key = self._flight_key(payload, auth_token)
+        if flight_key is None:
+            chunks = self._astream_upstream(payload, auth_token, cache_key)
+        else:
+            chunks = self._single_flight.stream(
+                flight_key, lambda: self._astream_upstream(payload, auth_token, cache_key)
+            )
+        async for chunk in chunks:
+            yield chunk
+
+    async def _astream_upstream(
+        self,
+        payload: Dict[str, Any],
+        auth_token: Optional[str],
+        cache_key: Optional[CacheKey]
+    ) -> AsyncIterator[str]:
+        """向上游发起流式调用，完整收到回复后写入响应缓存"""
+        # 名额一直占用到上游响应关闭
+        async with self.limiter.acquire(current_priority(stream=True)):
+            response = await self._asend(self.encode(payload, auth_token), stream=True)
+            parts = []
+            decoder = SSEDecoder()
+            try:
+                async for chunk in response.aiter_bytes():
+                    for content in decoder.feed(chunk):
+                        parts.append(content)
+                        yield content
+                    if decoder.done:
+                        break
+                for content in decoder.flush():
+                    parts.append(content)
+                    yield content
+            except httpx.HTTPError as e:
+                raise self._network_error(e) from e
+            except (GeneratorExit, asyncio.CancelledError):
+                # 消费方提前停止或被取消（如客户端断开），下面关闭响应即中止上游生成
+                self._record_stream(len(parts), aborted=True)
+                raise
+            finally:
+                await response.aclose()
+        if decoder.done:
+            self._record_stream(len(parts), aborted=False)
+            self._aremember(cache_key, "".join(parts))
+
+    def _record_stream(self, tokens: int, aborted: bool) -> None:
+        """记录一次流式调用完成或被提前中止，以及此前收到的增量片段数"""
+        kind = "aborted" if aborted else "completed"
+        self._stats[f"{kind}_streams"] += 1
+        self._stats[f"{kind}_stream_tokens"] += tokens
+
+    def _estimated_tokens_saved(self) -> int:
+        """
+        估算因提前中止流式调用而少生成的 token 数：
+        按完整回复的平均长度计，减去中止前已经收到的部分
+        """
+        stats = self._stats
+        if not stats["completed_streams"]:
+            return 0
+        average = stats["completed_stream_tokens"] / stats["completed_streams"]
+        return max(0, round(average * stats["aborted_streams"] - stats["aborted_stream_tokens"]))
+
+    def stats(self) -> Dict[str, Any]:
+        """请求、重试、失败次数，流式调用完成/中止次数，以及响应缓存命中率、请求合并与并发限制统计"""
+        cache = self.response_cache
+        return {
+            "endpoint": self.endpoint,
+            "model": self.model,
+            **self._stats,
+            "estimated_tokens_saved": self._estimated_tokens_saved(),
+            "response_cache": cache.stats() if cache is not None else None,
+            "single_flight": self._single_flight.stats(),
+            "limiter": self.limiter.stats()
+        }
+
+    async def aclose(self) -> None:
+        """等待响应缓存的后台写入完成，关闭连接池"""
+        cache = self.response_cache
+        if cache is not None:
+            await cache.flush()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+# 进程内共享的客户端
+_client: Optional[InferenceClient] = None
+
+
+def get_inference_client() -> InferenceClient:
+    """
+    获取共享的推理客户端
+
+    Returns:
+        InferenceClient: 推理客户端
+    """
+    global _client
+    if _client is None:
+        _client = InferenceClient()
+    return _client
+
+
+async def aclose_inference_client() -> None:
+    """关闭共享的推理客户端（应用退出时调用）"""
+    if _client is not None:
+        await _client.aclose()
@@ -0,0 +1,279 @@
+"""
+对话上下文管理
+按本地估算的 token 数裁剪对话历史：固定保留开头的系统提示，从最新的消息往前保留滑动窗口，
+窗口外的历史丢弃或折叠进滚动摘要（按对话前缀缓存），使每次发往上游的请求大小有上限
+"""
+
+import hashlib
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from models.cache import LRUCache
+
+# 每条消息的固定开销（角色、分隔符等）
+MESSAGE_OVERHEAD = 4
+# 单次请求最多折叠的历史块数，超出部分（最早的历史）直接丢弃，避免首次遇到很长的对话时串行调用过多
+SUMMARY_MAX_FOLDS = 4
+# 摘要缓存有效期（秒）
+SUMMARY_TTL = 86400
+
+# 中日韩字符大致一字一个 token，其余文本大致四个字符一个 token
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+_TRUNCATED = "\n…（中间内容已截断）…\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地估算文本的 token 数（不依赖上游分词器，偏保守）
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """估算一条消息的 token 数"""
+    return MESSAGE_OVERHEAD + estimate_tokens(message["content"])
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """
+    将文本截断到指定 token 数以内，保留开头和结尾
+
+    Args:
+        text: 文本
+        max_tokens: token 上限
+
+    Returns:
+        str: 未超出时原样返回，否则返回截断后的文本
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 按估算的平均每 token 字符数换算要保留的字符数
+    chars_per_token = len(text) / max(1, estimate_tokens(text))
+    keep = max(0, int((max_tokens - estimate_tokens(_TRUNCATED)) * chars_per_token))
+    return text[:keep // 2] + _TRUNCATED + text[len(text) - keep // 2:]
+
+
+def truncate_message(message: Dict[str, str], max_tokens: int) -> Dict[str, str]:
+    """
+    将消息截断到指定 token 数以内
+
+    Args:
+        message: 消息
+        max_tokens: token 上限（含每条消息的固定开销）
+
+    Returns:
+        Dict[str, str]: 未超出时原样返回，否则返回截断后的新消息
+    """
+    if message_tokens(message) <= max_tokens:
+        return message
+    return {**message, "content": truncate_text(message["content"], max_tokens - MESSAGE_OVERHEAD)}
+
+
+# 摘要消息的前缀
+SUMMARY_PREFIX = "以下是之前对话的摘要：\n"
+
+
+class ContextWindow:
+    """对话历史的划分：开头的系统提示、窗口外的历史、窗口内的最近消息"""
+
+    def __init__(self, pinned: List[Dict[str, str]], dropped: List[Dict[str, str]], recent: List[Dict[str, str]]):
+        self.pinned = pinned
+        self.dropped = dropped
+        self.recent = recent
+
+    def build(self, summary: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        组装发往上游的消息列表
+
+        Args:
+            summary: 窗口外历史的摘要
+
+        Returns:
+            List[Dict[str, str]]: 系统提示 + 摘要 + 最近消息
+        """
+        summary_messages = [{"role": "system", "content": SUMMARY_PREFIX + summary}] if summary else []
+        return self.pinned + summary_messages + self.recent
+
+
+def split_context(
+    messages: List[Dict[str, str]],
+    max_tokens: Optional[int] = None,
+    max_messages: Optional[int] = None,
+    reserve: int = 0
+) -> ContextWindow:
+    """
+    按 token 预算划分对话历史
+
+    开头的系统提示固定保留（最多占预算的一半），最新的一条消息始终保留（必要时截断），
+    其余消息从新到旧放入窗口，直到超出 token 预算或消息数上限
+
+    Args:
+        messages: API 格式的消息列表（role、content）
+        max_tokens: token 预算，默认取 settings.LLM_CONTEXT_MAX_TOKENS
+        max_messages: 窗口内最多消息数（不含系统提示），默认取 settings.LLM_CONTEXT_MAX_MESSAGES
+        reserve: 为摘要预留的 token 数
+
+    Returns:
+        ContextWindow: 划分结果
+    """
+    max_tokens = max_tokens or settings.LLM_CONTEXT_MAX_TOKENS
+    max_messages = max_messages or settings.LLM_CONTEXT_MAX_MESSAGES
+
+    pinned_count = 0
+    while pinned_count < len(messages) - 1 and messages[pinned_count]["role"] == "system":
+        pinned_count += 1
+    pinned = messages[:pinned_count]
+    if pinned and sum(message_tokens(m) for m in pinned) > max_tokens // 2:
+        pinned = [truncate_message(m, max_tokens // 2 // len(pinned)) for m in pinned]
+
+    budget = max_tokens - reserve - sum(message_tokens(m) for m in pinned)
+    history = messages[pinned_count:]
+    if not history:
+        return ContextWindow(pinned, [], [])
+
+    recent = [truncate_message(history[-1], max(budget, MESSAGE_OVERHEAD + 1))]
+    budget -= message_tokens(recent[0])
+    start = len(history) - 1
+    while start > 0 and len(recent) < max_messages:
+        cost = message_tokens(history[start - 1])
+        if cost > budget:
+            break
+        budget -= cost
+        start -= 1
+        recent.insert(0, history[start])
+    return ContextWindow(pinned, history[:start], recent)
+
+
+def summary_chunks(messages: List[Dict[str, str]], max_tokens: int) -> List[List[Dict[str, str]]]:
+    """
+    将待折叠的历史按 token 预算分块（每块单独发起一次摘要请求）
+
+    Args:
+        messages: 待折叠的消息
+        max_tokens: 每块的 token 上限
+
+    Returns:
+        List[List[Dict[str, str]]]: 消息块列表
+    """
+    chunks: List[List[Dict[str, str]]] = []
+    used = 0
+    for message in messages:
+        message = truncate_message(message, max_tokens)
+        cost = message_tokens(message)
+        if not chunks or used + cost > max_tokens:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(message)
+        used += cost
+    return chunks
+
+
+def _chain_digest(previous: str, message: Dict[str, str]) -> str:
+    """在前缀摘要的基础上追加一条消息"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(previous.encode("utf-8"))
+    h.update(message["role"].encode("utf-8") + b"\0" + message["content"].encode("utf-8") + b"\0")
+    return h.hexdigest()
+
+
+class SummaryCache:
+    """
+    滚动摘要缓存
+    以（系统提示 + 历史前缀）的摘要为键，同一对话后续的请求只需折叠新移出窗口的消息
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: float = SUMMARY_TTL):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数，默认取 settings.LLM_CONTEXT_SUMMARY_CACHE_SIZE
+            ttl: 条目有效期（秒）
+        """
+        self._cache = LRUCache(max_entries or settings.LLM_CONTEXT_SUMMARY_CACHE_SIZE)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "folds": 0}
+
+    @staticmethod
+    def prefix_keys(window: ContextWindow) -> List[str]:
+        """
+        窗口外历史每个前缀对应的缓存键
+
+        Args:
+            window: 对话历史的划分
+
+        Returns:
+            List[str]: 第 i 个元素对应 dropped[:i + 1]
+        """
+        key = ""
+        for message in window.pinned:
+            key = _chain_digest(key, message)
+        keys = []
+        for message in window.dropped:
+            key = _chain_digest(key, message)
+            keys.append(key)
+        return keys
+
+    def lookup(self, keys: List[str]) -> Tuple[int, Optional[str]]:
+        """
+        查找已缓存的最长前缀摘要
+
+        Args:
+            keys: prefix_keys 返回的缓存键
+
+        Returns:
+            Tuple[int, Optional[str]]: (摘要覆盖的消息数, 摘要)，没有缓存时返回 (0, None)
+        """
+        with self._lock:
+            for covered in range(len(keys), 0, -1):
+                summary = self._cache.get(keys[covered - 1])
+                if summary is not None:
+                    self._stats["hits" if covered == len(keys) else "misses"] += 1
+                    return covered, summary
+            if keys:
+                self._stats["misses"] += 1
+            return 0, None
+
+    def plan(self, window: ContextWindow, chunk_tokens: int) -> Tuple[Optional[str], List[Tuple[List[Dict[str, str]], str]]]:
+        """
+        规划窗口外历史的折叠：从已缓存的最长前缀摘要开始，把其余消息分块依次折叠
+
+        Args:
+            window: 对话历史的划分
+            chunk_tokens: 每块的 token 上限
+
+        Returns:
+            Tuple: (已缓存的摘要, [(消息块, 折叠该块后的缓存键), ...])，最多 SUMMARY_MAX_FOLDS 块
+        """
+        keys = self.prefix_keys(window)
+        covered, summary = self.lookup(keys)
+        folds = []
+        for chunk in summary_chunks(window.dropped[covered:], chunk_tokens):
+            covered += len(chunk)
+            folds.append((chunk, keys[covered - 1]))
+        return summary, folds[-SUMMARY_MAX_FOLDS:]
+
+    def store(self, key: str, summary: str) -> None:
+        """缓存一个前缀的摘要"""
+        with self._lock:
+            self._cache.set(key, summary, self.ttl)
+            self._stats["folds"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """条目数、命中（无需折叠）次数、未命中次数与实际折叠次数"""
+        with self._lock:
+            return {"size": len(self._cache), **self._stats}
+
+
+# 进程内共享的摘要缓存
+summary_cache = SummaryCache()
@@ -0,0 +1,214 @@
+"""
+决策工作流的本地意图识别
+在调用 LLM 分类之前先用关键词/正则规则（以及可选的本地朴素贝叶斯模型）判断输入类型，
+只有本地无法确定时才回退到 LLM 分类，节省一次上游调用
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from config import settings
+
+# 决策工作流支持的输入类型，LLM 返回其他内容时按问题处理
+INTENT_LABELS = ("question", "translate", "summarize")
+DEFAULT_INTENT = "question"
+
+# 本地规则：按顺序匹配，先匹配到的生效
+INTENT_RULES: List[Tuple[Pattern, str]] = [
+    # 以指令词开头
+    (re.compile(r"^\s*(翻译|translate\b)", re.IGNORECASE), "translate"),
+    (re.compile(r"^\s*(总结|概括|摘要|归纳|summari[sz]e\b|summary\b|tl;?dr\b)", re.IGNORECASE), "summarize"),
+    # 句中明确的指令
+    (re.compile(r"(翻译|译|翻)成(英文|英语|中文|汉语|日文|日语|韩文|韩语|法文|法语|德文|德语)"), "translate"),
+    (re.compile(r"\btranslate\b.{0,80}\b(into|to)\s+(english|chinese)\b", re.IGNORECASE), "translate"),
+    (re.compile(r"(总结一下|概括一下|归纳一下|帮我总结|帮我概括|简要概括)"), "summarize"),
+    (re.compile(r"\b(summari[sz]e|give me a summary of)\b", re.IGNORECASE), "summarize"),
+    # 问句
+    (re.compile(r"[?？]\s*$|(吗|呢)\s*[。.]?\s*$"), "question"),
+    (re.compile(r"^\s*(请问|为什么|为何|怎么|怎样|如何|什么|哪|谁|是否|能否|可否)"), "question"),
+    (re.compile(r"^\s*(what|why|how|when|where|who|which|can|could|should|would|is|are|do|does)\b",
+                re.IGNORECASE), "question"),
+]
+
+
+def normalize_intent(label: str) -> str:
+    """规范化 LLM 返回的分类结果"""
+    label = label.lower().strip().strip("。.\"'` ")
+    return label if label in INTENT_LABELS else DEFAULT_INTENT
+
+
+def _features(text: str) -> List[str]:
+    """模型特征：英文单词 + 中文字符二元组"""
+    text = text.lower()
+    words = re.findall(r"[a-z]+", text)
+    chars = [c for c in text if "一" <= c <= "鿿"]
+    return words + [a + b for a, b in zip(chars, chars[1:])]
+
+
+class NaiveBayesIntentModel:
+    """
+    轻量级本地意图模型（多项式朴素贝叶斯，纯 Python，CPU 上微秒级）
+    以规则命中和 LLM 分类的结果在线学习，样本足够且足够确定时才参与判断
+    """
+
+    def __init__(self):
+        """初始化"""
+        self._label_counts: Counter = Counter()
+        self._feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        self._feature_totals: Counter = Counter()
+        self._vocabulary: set = set()
+
+    @property
+    def samples(self) -> int:
+        """已学习的样本数"""
+        return sum(self._label_counts.values())
+
+    def observe(self, text: str, label: str) -> None:
+        """学习一个样本"""
+        features = _features(text)
+        self._label_counts[label] += 1
+        self._feature_counts[label].update(features)
+        self._feature_totals[label] += len(features)
+        self._vocabulary.update(features)
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        预测输入类型
+
+        Args:
+            text: 用户输入
+
+        Returns:
+            Optional[Tuple[str, float]]: (类型, 后验概率)，没有任何样本时返回None
+        """
+        if not self._label_counts:
+            return None
+        features = _features(text)
+        vocabulary = len(self._vocabulary) + 1
+        total = self.samples
+        scores = {}
+        for label, count in self._label_counts.items():
+            score = math.log(count / total)
+            denominator = self._feature_totals[label] + vocabulary
+            counts = self._feature_counts[label]
+            for feature in features:
+                score += math.log((counts[feature] + 1) / denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+class IntentClassifier:
+    """
+    本地意图识别，并按类型统计本地命中（规则/模型）与回退到 LLM 的次数
+    """
+
+    def __init__(self, model: Optional[NaiveBayesIntentModel] = None):
+        """
+        初始化
+
+        Args:
+            model: 本地模型，默认新建一个空的朴素贝叶斯模型（是否使用由 settings.LLM_INTENT_MODEL 控制）
+        """
+        self.model = model or NaiveBayesIntentModel()
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Counter] = {label: Counter() for label in INTENT_LABELS}
+        self._fallbacks = 0
+
+    def classify_local(self, text: str) -> Optional[str]:
+        """
+        本地判断输入类型
+
+        Args:
+            text: 用户输入
+
+        Returns:
+            Optional[str]: 输入类型；本地无法确定时返回None，调用方应回退到 LLM 分类
+        """
+        if not settings.LLM_INTENT_FASTPATH:
+            return None
+        with self._lock:
+            for pattern, label in INTENT_RULES:
+                if pattern.search(text):
+                    self._counts[label]["rule"] += 1
+                    if settings.LLM_INTENT_MODEL:
+                        self.model.observe(text, label)
+                    return label
+
+            if settings.LLM_INTENT_MODEL and self.model.samples >= settings.LLM_INTENT_MODEL_MIN_SAMPLES:
+                prediction = self.model.predict(text)
+                if prediction is not None and prediction[1] >= settings.LLM_INTENT_MODEL_MIN_CONFIDENCE:
+                    self._counts[prediction[0]]["model"] += 1
+                    return prediction[0]
+
+            self._fallbacks += 1
+            return None
+
+    def guess(self, text: str) -> str:
+        """
+        本地无法确定时给出最可能的类型（供推测执行使用）
+        启用模型时取模型预测，否则取 LLM 分类结果中最常见的类型
+
+        Args:
+            text: 用户输入
+
+        Returns:
+            str: 最可能的类型
+        """
+        with self._lock:
+            if settings.LLM_INTENT_MODEL:
+                prediction = self.model.predict(text)
+                if prediction is not None:
+                    return prediction[0]
+            label, count = max(((label, counts["llm"]) for label, counts in self._counts.items()),
+                               key=lambda item: item[1])
+            return label if count else DEFAULT_INTENT
+
+    def record_llm(self, text: str, label: str) -> str:
+        """
+        记录 LLM 分类结果（用于统计和模型学习）
+
+        Args:
+            text: 用户输入
+            label: LLM 返回的分类结果
+
+        Returns:
+            str: 规范化后的类型
+        """
+        label = normalize_intent(label)
+        with self._lock:
+            self._counts[label]["llm"] += 1
+            if settings.LLM_INTENT_MODEL:
+                self.model.observe(text, label)
+        return label
+
+    def stats(self) -> Dict[str, object]:
+        """按类型统计本地命中率"""
+        with self._lock:
+            routes = {}
+            local_total = 0
+            for label, counts in self._counts.items():
+                local = counts["rule"] + counts["model"]
+                routed = local + counts["llm"]
+                local_total += local
+                routes[label] = {
+                    "rule": counts["rule"],
+                    "model": counts["model"],
+                    "llm": counts["llm"],
+                    "local_hit_rate": round(local / routed, 4) if routed else 0.0
+                }
+            classified = local_total + self._fallbacks
+            return {
+                "routes": routes,
+                "llm_fallbacks": self._fallbacks,
+                "local_hit_rate": round(local_total / classified, 4) if classified else 0.0,
+                "model_samples": self.model.samples
+            }
+
+
+# 进程内共享的意图识别
+intent_classifier = IntentClassifier()
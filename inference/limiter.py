@@ -0,0 +1,301 @@
+"""
+上游自适应并发限制
+按观测到的延迟调整同时发往上游的请求数（AIMD）：并发接近上限且首字节延迟接近空载水平时逐步放宽，
+延迟明显升高、上游返回限流/网关错误或超时时按比例收紧；
+超出并发上限的请求进入有界的优先级队列（交互式流式请求优先于普通和批量请求），
+队列已满或排队超时时立即拒绝，由路由返回 429 和 Retry-After
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+
+# 请求优先级（数值越小越优先）
+PRIORITY_INTERACTIVE = 0    # 交互式流式请求
+PRIORITY_DEFAULT = 1        # 普通非流式请求
+PRIORITY_BATCH = 2          # 批量请求
+
+# 空载延迟取最近两个统计窗口内的最小值（秒），上游负载下降后旧的最小值随窗口滚动失效
+BASELINE_WINDOW = 60.0
+# 延迟升高时的收缩比例、上游过载（限流、网关错误、超时）时的收缩比例
+LATENCY_BACKOFF = 0.9
+OVERLOAD_BACKOFF = 0.5
+# 判断延迟升高时额外容忍的绝对值（秒），避免空载延迟只有几毫秒时把抖动当作拥塞
+LATENCY_SLACK = 0.05
+
+_priority: ContextVar[Optional[int]] = ContextVar("llm_request_priority", default=None)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """
+    在代码块内发起的上游调用使用指定的优先级
+
+    Args:
+        priority: PRIORITY_INTERACTIVE、PRIORITY_DEFAULT 或 PRIORITY_BATCH
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority(stream: bool) -> int:
+    """
+    当前上游调用的优先级：未指定时流式调用为交互式，非流式调用为普通
+
+    Args:
+        stream: 是否为流式调用
+
+    Returns:
+        int: 优先级
+    """
+    priority = _priority.get()
+    if priority is not None:
+        return priority
+    return PRIORITY_INTERACTIVE if stream else PRIORITY_DEFAULT
+
+
+class LimiterRejected(Exception):
+    """
+    请求被并发限制拒绝（队列已满或排队超时）
+    """
+    def __init__(self, reason: str, retry_after: int):
+        """
+        初始化异常
+
+        Args:
+            reason: queue_full 或 timeout
+            retry_after: 建议的重试等待秒数
+        """
+        super().__init__(f"上游繁忙，请 {retry_after} 秒后重试（{reason}）")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    自适应并发限制器（单个上游共用一个实例，只用于异步调用）
+    """
+
+    def __init__(
+        self,
+        initial: Optional[int] = None,
+        min_limit: Optional[int] = None,
+        max_limit: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        tolerance: Optional[float] = None
+    ):
+        """
+        初始化
+
+        Args:
+            initial: 初始并发上限，默认取 settings.LLM_LIMIT_INITIAL
+            min_limit: 并发上限的下限，默认取 settings.LLM_LIMIT_MIN
+            max_limit: 并发上限的上限，默认取 settings.LLM_LIMIT_MAX
+            max_queue: 排队请求数上限，默认取 settings.LLM_LIMIT_QUEUE_SIZE
+            queue_timeout: 最长排队时间（秒），默认取 settings.LLM_LIMIT_QUEUE_TIMEOUT
+            tolerance: 首字节延迟超过空载水平的倍数时收紧，默认取 settings.LLM_LIMIT_LATENCY_TOLERANCE
+        """
+        self.min_limit = min_limit or settings.LLM_LIMIT_MIN
+        self.max_limit = max_limit or settings.LLM_LIMIT_MAX
+        self.limit = float(min(max(initial or settings.LLM_LIMIT_INITIAL, self.min_limit), self.max_limit))
+        self.max_queue = settings.LLM_LIMIT_QUEUE_SIZE if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout or settings.LLM_LIMIT_QUEUE_TIMEOUT
+        self.tolerance = tolerance or settings.LLM_LIMIT_LATENCY_TOLERANCE
+        self.in_flight = 0
+        # 排队中的请求：(优先级, 序号, future)，被拒绝或取消的条目在出队时跳过
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._waiting = 0
+        self._sequence = itertools.count()
+        # 空载延迟：当前窗口和上一个窗口的最小首字节延迟
+        self._window_start = time.monotonic()
+        self._window_min: Optional[float] = None
+        self._previous_min: Optional[float] = None
+        self._latency: Optional[float] = None
+        self._hold: Optional[float] = None
+        self._last_decrease = 0.0
+        self._waits: deque = deque(maxlen=1000)
+        self._stats = {
+            "admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+            "increases": 0, "decreases": 0, "max_queue_depth": 0
+        }
+
+    @asynccontextmanager
+    async def acquire(self, priority: int = PRIORITY_DEFAULT) -> AsyncIterator[None]:
+        """
+        获取一个并发名额，代码块结束时释放
+
+        Args:
+            priority: 请求优先级
+
+        Raises:
+            LimiterRejected: 队列已满或排队超时
+        """
+        if not settings.LLM_LIMIT_ENABLED:
+            yield
+            return
+        await self._acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    async def _acquire(self, priority: int) -> None:
+        """获取并发名额，必要时排队"""
+        if self.in_flight < int(self.limit) and not self._waiting:
+            self.in_flight += 1
+            self._stats["admitted"] += 1
+            self._waits.append(0.0)
+            return
+
+        if self._waiting >= self.max_queue and not self._displace(priority):
+            self._stats["rejected_queue_full"] += 1
+            raise LimiterRejected("queue_full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        self._waiting += 1
+        self._stats["queued"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._waiting)
+        start = time.monotonic()
+        displaced = False
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._granted(future):
+                future.cancel()
+                self._stats["rejected_timeout"] += 1
+                raise LimiterRejected("timeout", self.retry_after())
+        except LimiterRejected:
+            # 被优先级更高的请求挤出队列（挤出时已从排队数中扣除）
+            displaced = True
+            raise
+        except BaseException:
+            # 排队期间被取消（如客户端断开）：已分配的名额立即归还
+            if self._granted(future):
+                self._release_slot()
+            else:
+                future.cancel()
+            raise
+        finally:
+            if not displaced:
+                self._waiting -= 1
+            self._waits.append(time.monotonic() - start)
+        self._stats["admitted"] += 1
+
+    @staticmethod
+    def _granted(future: asyncio.Future) -> bool:
+        """排队的请求是否已分配到名额"""
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    def _displace(self, priority: int) -> bool:
+        """队列已满时，挤出排在最后的低优先级请求"""
+        victims = [entry for entry in self._queue if not entry[2].done() and entry[0] > priority]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda entry: (entry[0], entry[1]))
+        victim[2].set_exception(LimiterRejected("queue_full", self.retry_after()))
+        self._waiting -= 1
+        self._stats["rejected_queue_full"] += 1
+        return True
+
+    def _release_slot(self) -> None:
+        """归还名额并唤醒排队的请求"""
+        self.in_flight -= 1
+        while self._queue and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _release(self, hold: float) -> None:
+        """调用结束：并发接近上限时按 AIMD 放宽上限，然后归还名额"""
+        self._hold = hold if self._hold is None else self._hold * 0.9 + hold * 0.1
+        if self.in_flight >= self.limit / 2 and self.limit < self.max_limit:
+            # 每个调用结束放宽 1/limit，即大约每一轮请求放宽 1
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._stats["increases"] += 1
+        self._release_slot()
+
+    def observe_latency(self, latency: float) -> None:
+        """
+        记录一次首字节延迟（流式调用拿到响应头的时间），明显高于空载水平时收紧上限
+
+        Args:
+            latency: 延迟（秒）
+        """
+        now = time.monotonic()
+        if now - self._window_start >= BASELINE_WINDOW:
+            self._previous_min, self._window_min = self._window_min, None
+            self._window_start = now
+        self._window_min = latency if self._window_min is None else min(self._window_min, latency)
+        self._latency = latency if self._latency is None else self._latency * 0.9 + latency * 0.1
+        # 平滑后的延迟持续高于空载水平才收紧，单次抖动不影响
+        if self._latency > self.baseline() * self.tolerance + LATENCY_SLACK:
+            self._decrease(LATENCY_BACKOFF)
+
+    def observe_overload(self) -> None:
+        """上游返回限流/网关错误或超时，收紧上限"""
+        self._decrease(OVERLOAD_BACKOFF)
+
+    def baseline(self) -> Optional[float]:
+        """空载延迟（最近两个窗口内的最小首字节延迟）"""
+        candidates = [v for v in (self._window_min, self._previous_min) if v is not None]
+        return min(candidates) if candidates else None
+
+    def _decrease(self, factor: float) -> None:
+        """按比例收紧上限，每个调用的平均占用时长内最多收紧一次（等上一次收紧生效）"""
+        now = time.monotonic()
+        if now - self._last_decrease < (self._hold or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * factor)
+        self._stats["decreases"] += 1
+
+    def headroom(self) -> int:
+        """
+        不排队即可立即获得的名额数（批量任务据此控制同时发出的调用数）
+
+        Returns:
+            int: 空闲名额数，未启用时视为不限
+        """
+        if not settings.LLM_LIMIT_ENABLED:
+            return self.max_limit
+        return int(self.limit) - self.in_flight - self._waiting
+
+    def retry_after(self) -> int:
+        """估算排到名额所需的秒数（用于 Retry-After）"""
+        hold = self._hold or 1.0
+        return max(1, math.ceil((self._waiting + 1) / max(1, int(self.limit)) * hold))
+
+    def stats(self) -> Dict[str, Any]:
+        """并发上限、进行中与排队的请求数、排队等待时间与拒绝次数"""
+        waits = sorted(self._waits)
+        baseline = self.baseline()
+        return {
+            "enabled": settings.LLM_LIMIT_ENABLED,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": self._waiting,
+            **self._stats,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 1) if waits else 0.0
+            },
+            "latency_ms": round(self._latency * 1000, 1) if self._latency is not None else None,
+            "baseline_latency_ms": round(baseline * 1000, 1) if baseline is not None else None
+        }
@@ -0,0 +1,357 @@
+"""
+LLM 响应缓存
+以规范化后的（模型、温度、最大 token、消息列表）为键缓存上游回复：
+一级为进程内 LRU，二级为 SQLite 文件（重启后仍然有效）；
+可选的相似度匹配只比较最后一条消息，其余上下文必须完全一致；
+异步调用方通过 aget / set_in_background 访问，SQLite 读写、清理和相似度扫描在线程池中执行
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import settings
+from models.cache import LRUCache
+
+# 每写入多少条清理一次过期和超出容量的记录（容量较小时按容量的 1/10）
+_PRUNE_INTERVAL = 100
+
+
+def normalize_text(text: Any) -> str:
+    """规范化文本：统一全半角、换行符，去掉首尾空白（文本内部的空白和缩进保持不变）"""
+    text = unicodedata.normalize("NFKC", str(text))
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+class CacheKey:
+    """一次上游调用对应的缓存键"""
+
+    def __init__(self, payload: Dict[str, Any], scope: str = ""):
+        """
+        根据请求体生成缓存键
+
+        Args:
+            payload: 上游请求体（model、messages、temperature、max_tokens）
+            scope: 隔离范围（如认证令牌指纹），为空时所有调用方共享
+        """
+        messages = [(m.get("role", ""), normalize_text(m.get("content", ""))) for m in payload["messages"]]
+        self.prompt = messages[-1][1] if messages else ""
+        context = [scope, payload["model"], round(float(payload["temperature"]), 3),
+                   payload["max_tokens"], messages[:-1], messages[-1][0] if messages else ""]
+        self.context = _digest(context)
+        self.key = _digest([self.context, self.prompt])
+
+
+def _digest(value: Any) -> str:
+    """对可JSON序列化的值计算摘要"""
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class HashingEmbedder:
+    """
+    字符 n-gram 哈希向量，不依赖额外的模型或库
+    适合识别只有少量字词、标点差异的近似重复输入；需要语义相似度时可替换为实现了
+    embed(text) -> Dict[int, float] 的本地 embedding 模型
+    """
+
+    def __init__(self, ngram: int = 2, dims: int = 4096):
+        """
+        初始化
+
+        Args:
+            ngram: n-gram 长度
+            dims: 哈希空间维度
+        """
+        self.ngram = ngram
+        self.dims = dims
+
+    def embed(self, text: str) -> Dict[int, float]:
+        """生成归一化的稀疏向量"""
+        text = text.lower()
+        grams = [text[i:i + self.ngram] for i in range(max(1, len(text) - self.ngram + 1))]
+        vector: Dict[int, float] = {}
+        for gram in grams:
+            index = zlib.crc32(gram.encode("utf-8")) % self.dims
+            vector[index] = vector.get(index, 0.0) + 1.0
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {k: v / norm for k, v in vector.items()}
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """两个归一化稀疏向量的余弦相似度"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class ResponseCache:
+    """
+    响应缓存：一级 LRU + 二级 SQLite，可选相似度匹配，并统计命中率
+    同步和异步调用都会访问，内部用锁保护；事件循环中只做一级 LRU 的查找，
+    其余操作交给线程池
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        ttl: float,
+        similarity: float = 0.0,
+        embedder: Optional[HashingEmbedder] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite 文件路径（":memory:" 表示不持久化）
+            max_entries: 最大条目数
+            ttl: 条目有效期（秒）
+            similarity: 相似度命中阈值，0 表示只做精确匹配
+            embedder: 相似度匹配使用的向量化工具，默认 HashingEmbedder
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embedder = embedder or HashingEmbedder()
+        self._memory = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._prune_interval = max(1, min(_PRUNE_INTERVAL, max_entries // 10))
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0}
+        # 相似度索引：上下文摘要 -> {键: 最后一条消息的向量}
+        self._index: Dict[str, Dict[str, Dict[int, float]]] = {}
+        # 尚未完成的后台写入
+        self._pending_writes: Set[asyncio.Future] = set()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "key TEXT PRIMARY KEY, context TEXT NOT NULL, prompt TEXT NOT NULL, "
+            "content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_created_at ON llm_responses (created_at)")
+        self._db.commit()
+        self._prune()
+        if self.similarity > 0:
+            self._load_index()
+
+    def _load_index(self) -> None:
+        """从 SQLite 重建相似度索引"""
+        rows = self._db.execute("SELECT key, context, prompt FROM llm_responses ORDER BY created_at").fetchall()
+        for key, context, prompt in rows:
+            self._index.setdefault(context, {})[key] = self.embedder.embed(prompt)
+
+    def _read(self, key: str) -> Optional[str]:
+        """按键读取未过期的回复"""
+        content = self._memory.get(key)
+        if content is not None:
+            return content
+        row = self._db.execute(
+            "SELECT content, created_at FROM llm_responses WHERE key = ? AND created_at > ?",
+            (key, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        content, created_at = row
+        self._memory.set(key, content, created_at + self.ttl - time.time())
+        return content
+
+    def _nearest(self, cache_key: CacheKey) -> Optional[Tuple[str, float]]:
+        """在同一上下文中查找最相似的已缓存输入"""
+        bucket = self._index.get(cache_key.context)
+        if not bucket:
+            return None
+        vector = self.embedder.embed(cache_key.prompt)
+        best_key, best_score = None, 0.0
+        for key, candidate in bucket.items():
+            score = _cosine(vector, candidate)
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is None or best_score < self.similarity:
+            return None
+        return best_key, best_score
+
+    def get(self, cache_key: CacheKey) -> Optional[str]:
+        """
+        读取缓存：先精确匹配，未命中且启用了相似度匹配时再查找相似输入
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存的回复，未命中返回None
+        """
+        with self._lock:
+            content = self._read(cache_key.key)
+            if content is not None:
+                self._stats["exact_hits"] += 1
+                return content
+            if self.similarity > 0:
+                nearest = self._nearest(cache_key)
+                if nearest is not None:
+                    content = self._read(nearest[0])
+                    if content is not None:
+                        self._stats["similar_hits"] += 1
+                        return content
+                    # 已过期或被淘汰
+                    self._index[cache_key.context].pop(nearest[0], None)
+            self._stats["misses"] += 1
+            return None
+
+    async def aget(self, cache_key: CacheKey) -> Optional[str]:
+        """
+        读取缓存（异步）：一级 LRU 精确命中时直接返回；
+        需要查询 SQLite 或做相似度匹配时在线程池中执行，不阻塞事件循环
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存的回复，未命中返回None
+        """
+        # 锁被后台线程占用（正在读写 SQLite）时不在事件循环中等待
+        if self._lock.acquire(blocking=False):
+            try:
+                content = self._memory.get(cache_key.key)
+                if content is not None:
+                    self._stats["exact_hits"] += 1
+                    return content
+            finally:
+                self._lock.release()
+        return await asyncio.to_thread(self.get, cache_key)
+
+    def set_in_background(self, cache_key: CacheKey, content: str) -> None:
+        """
+        在线程池中写入缓存（在事件循环中调用，不等待写入完成）
+
+        Args:
+            cache_key: 缓存键
+            content: 回复内容
+        """
+        # 一级 LRU 先写入（锁空闲时），紧接着的相同请求无需等待 SQLite 写入完成即可命中
+        if self._lock.acquire(blocking=False):
+            try:
+                self._memory.set(cache_key.key, content, self.ttl)
+            finally:
+                self._lock.release()
+        task = asyncio.ensure_future(asyncio.to_thread(self.set, cache_key, content))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def flush(self) -> None:
+        """等待尚未完成的后台写入"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    def set(self, cache_key: CacheKey, content: str) -> None:
+        """
+        写入缓存
+
+        Args:
+            cache_key: 缓存键
+            content: 回复内容
+        """
+        with self._lock:
+            self._memory.set(cache_key.key, content, self.ttl)
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, context, prompt, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (cache_key.key, cache_key.context, cache_key.prompt, content, time.time())
+            )
+            self._db.commit()
+            if self.similarity > 0:
+                self._index.setdefault(cache_key.context, {})[cache_key.key] = self.embedder.embed(cache_key.prompt)
+            self._writes += 1
+            if self._writes % self._prune_interval == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        """删除过期记录和超出容量的最旧记录"""
+        cursor = self._db.execute("DELETE FROM llm_responses WHERE created_at <= ?", (time.time() - self.ttl,))
+        removed = cursor.rowcount
+        cursor = self._db.execute(
+            "DELETE FROM llm_responses WHERE key IN "
+            "(SELECT key FROM llm_responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        removed += cursor.rowcount
+        self._db.commit()
+        if removed and self._index:
+            live = {row[0] for row in self._db.execute("SELECT key FROM llm_responses")}
+            for bucket in self._index.values():
+                for key in [key for key in bucket if key not in live]:
+                    del bucket[key]
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._index.clear()
+            self._db.execute("DELETE FROM llm_responses")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """条目数与命中率统计"""
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        hits = self._stats["exact_hits"] + self._stats["similar_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            "size": size,
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self) -> None:
+        """关闭 SQLite 连接"""
+        with self._lock:
+            self._db.close()
+
+
+def replay_chunks(content: str, size: Optional[int] = None) -> List[str]:
+    """
+    将缓存的完整回复切分为流式片段，流式接口命中缓存时按片段回放
+
+    Args:
+        content: 完整回复
+        size: 每个片段的字符数，默认取 settings.STREAM_FRAME_MAX_CHARS
+
+    Returns:
+        List[str]: 片段列表
+    """
+    size = size or settings.STREAM_FRAME_MAX_CHARS
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+# 进程内共享的响应缓存
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取共享的响应缓存，未启用时返回None
+
+    Returns:
+        Optional[ResponseCache]: 响应缓存
+    """
+    global _response_cache
+    if not settings.LLM_RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            settings.LLM_RESPONSE_CACHE_FILE,
+            max_entries=settings.LLM_RESPONSE_CACHE_SIZE,
+            ttl=settings.LLM_RESPONSE_CACHE_TTL,
+            similarity=settings.LLM_RESPONSE_CACHE_SIMILARITY
+        )
+    return _response_cache
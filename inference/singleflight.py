@@ -0,0 +1,148 @@
+"""
+上游请求合并（single-flight）
+同一时刻的相同请求只向上游发起一次：非流式调用共享同一个结果，
+流式调用由一个上游 SSE 流扇出给所有订阅者（中途加入的订阅者先补发已收到的片段）
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class _Flight:
+    """一次进行中的非流式调用"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """一次进行中的流式调用：缓存已收到的片段并通知订阅者"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        """唤醒所有等待新片段的订阅者"""
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait(self) -> None:
+        """等待新片段或结束"""
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    合并相同的进行中调用
+    所有订阅者都离开（如客户端断开）时取消上游调用
+    """
+
+    def __init__(self):
+        """初始化"""
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行非流式调用，相同 key 的调用进行中时直接等待其结果
+
+        Args:
+            key: 请求键
+            func: 发起上游调用的函数
+
+        Returns:
+            调用结果（所有等待者共享同一个对象）
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(self._flights, key, flight)
+
+    async def stream(self, key: str, func: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        执行流式调用，相同 key 的调用进行中时订阅同一个上游流
+
+        Args:
+            key: 请求键
+            func: 返回上游片段异步迭代器的函数
+
+        Yields:
+            str: 上游片段
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, func()))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        broadcast.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(broadcast.chunks):
+                    chunk = broadcast.chunks[position]
+                    position += 1
+                    yield chunk
+                    continue
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                await broadcast.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # 所有订阅者都已离开，停止读取上游
+                broadcast.task.cancel()
+                self._forget(self._streams, key, broadcast)
+
+    async def _pump(self, key: str, broadcast: _Broadcast, source: AsyncIterator[str]) -> None:
+        """读取上游流并分发给订阅者"""
+        try:
+            async for chunk in source:
+                broadcast.chunks.append(chunk)
+                broadcast.notify()
+        except asyncio.CancelledError:
+            broadcast.error = asyncio.CancelledError()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            broadcast.notify()
+            self._forget(self._streams, key, broadcast)
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    @staticmethod
+    def _forget(calls: Dict[str, Any], key: str, call: Any) -> None:
+        """移除已结束的调用（同一 key 可能已被新的调用占用）"""
+        if calls.get(key) is call:
+            del calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """实际发起的上游调用数与被合并的调用数"""
+        return {**self._stats, "in_flight": len(self._flights) + len(self._streams)}
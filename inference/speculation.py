@@ -0,0 +1,106 @@
+"""
+推测执行
+在等待前置结果（如 LLM 分类）的同时提前执行最可能的后续步骤，猜错时取消。
+推测会额外消耗上游调用，因此限制同时进行的推测数，并在近期命中率过低时暂停推测
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Dict, Optional
+
+from config import settings
+
+
+class Speculation:
+    """
+    推测执行的成本控制与命中统计
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        min_success: Optional[float] = None,
+        window: int = 100,
+        min_samples: int = 20
+    ):
+        """
+        初始化
+
+        Args:
+            max_in_flight: 同时进行的推测数上限，默认取 settings.LLM_DECISION_SPECULATE_MAX_IN_FLIGHT
+            min_success: 近期命中率下限，低于该值时暂停推测，默认取 settings.LLM_DECISION_SPECULATE_MIN_SUCCESS
+            window: 计算近期命中率的推测次数
+            min_samples: 近期推测次数达到该值后才按命中率判断
+        """
+        self.max_in_flight = max_in_flight if max_in_flight is not None else settings.LLM_DECISION_SPECULATE_MAX_IN_FLIGHT
+        self.min_success = min_success if min_success is not None else settings.LLM_DECISION_SPECULATE_MIN_SUCCESS
+        self.min_samples = min_samples
+        self._recent: deque = deque(maxlen=window)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stats = {"started": 0, "hits": 0, "misses": 0, "skipped": 0}
+
+    def _recent_success(self) -> Optional[float]:
+        """近期命中率，样本不足时返回None"""
+        if len(self._recent) < self.min_samples:
+            return None
+        return sum(self._recent) / len(self._recent)
+
+    def start(self, coro: Awaitable[Any]) -> Optional[asyncio.Task]:
+        """
+        在成本限制内启动一次推测
+
+        Args:
+            coro: 推测执行的协程
+
+        Returns:
+            Optional[asyncio.Task]: 推测任务；超出并发上限或近期命中率过低时不启动，返回None
+        """
+        with self._lock:
+            success = self._recent_success()
+            paused = success is not None and success < self.min_success
+            if paused or self._in_flight >= self.max_in_flight:
+                self._stats["skipped"] += 1
+                if paused:
+                    # 暂停期间没有新样本，每次跳过丢弃一个最旧的样本，样本不足后重新开始试探
+                    self._recent.popleft()
+                coro.close()
+                return None
+            self._in_flight += 1
+            self._stats["started"] += 1
+        task = asyncio.ensure_future(coro)
+        task.add_done_callback(self._release)
+        return task
+
+    def _release(self, _: asyncio.Task) -> None:
+        """推测任务结束（完成或取消）"""
+        with self._lock:
+            self._in_flight -= 1
+
+    def record(self, hit: bool) -> None:
+        """
+        记录推测结果
+
+        Args:
+            hit: 推测是否被采用
+        """
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+            self._recent.append(1 if hit else 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """推测次数、命中率与当前进行中的推测数"""
+        with self._lock:
+            decided = self._stats["hits"] + self._stats["misses"]
+            success = self._recent_success()
+            return {
+                **self._stats,
+                "in_flight": self._in_flight,
+                "success_rate": round(self._stats["hits"] / decided, 4) if decided else 0.0,
+                "recent_success_rate": round(success, 4) if success is not None else None
+            }
+
+
+# 决策工作流共享的推测执行控制
+decision_speculation = Speculation()
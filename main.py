@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -5,15 +6,31 @@ from fastapi.responses import FileResponse
 from routers import users, items, llm
 from config import settings
 from models.database import init_db
+from models.cache import item_cache, user_cache
+from inference.client import get_inference_client
+from inference.context import summary_cache
+from inference.intent import intent_classifier
+from inference.speculation import decision_speculation
+from models.streaming import disconnect_stats
 
 # 初始化数据库
 init_db()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时预先构建共享的链和工作流，退出时关闭共享的上游HTTP连接池"""
+    llm.warm_up_llm()
+    yield
+    await llm.close_llm_clients()
+
+
 # 创建 FastAPI 应用实例
 app = FastAPI(
     title=settings.APP_NAME,
     description="FastAPI 学习项目 - 包含常用功能演示",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置 CORS 中间件
@@ -47,6 +64,26 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@app.get("/metrics/cache", tags=["健康检查"])
+async def cache_metrics():
+    """实体读缓存命中率统计"""
+    return {"items": item_cache.stats(), "users": user_cache.stats()}
+
+
+@app.get("/metrics/llm", tags=["健康检查"])
+async def llm_metrics():
+    """上游推理接口请求、重试、失败次数统计，决策工作流本地意图识别、推测执行、对话摘要缓存的命中率，会话、批量任务与客户端断开统计"""
+    return {
+        **get_inference_client().stats(),
+        "intent": intent_classifier.stats(),
+        "speculation": decision_speculation.stats(),
+        "context_summaries": summary_cache.stats(),
+        "sessions": llm.conversation_session_stats() if llm.SESSIONS_AVAILABLE else None,
+        "batches": llm.batch_jobs.stats() if llm.BATCH_AVAILABLE else None,
+        "disconnects": disconnect_stats()
+    }
+
+
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     """返回网站图标"""
@@ -0,0 +1,103 @@
+"""
+批量接口辅助函数
+解析 JSON 数组或 NDJSON 请求体、逐行校验，并按批次切分数据
+"""
+
+import json
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+
+from config import settings
+from models.schemas import BulkRowResult, BulkResponse
+
+
+async def read_bulk_payload(request: Request) -> List[Any]:
+    """
+    读取批量请求体
+
+    Content-Type 为 application/x-ndjson 时按行解析，否则按 JSON 数组解析
+
+    Args:
+        request: 请求对象
+
+    Returns:
+        List[Any]: 原始行数据
+
+    Raises:
+        HTTPException: 请求体格式错误或行数超过上限
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type:
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"请求体解析失败: {str(e)}"
+        )
+
+    if not isinstance(rows, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请求体应为 JSON 数组或 NDJSON"
+        )
+    if len(rows) > settings.BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"单次最多提交 {settings.BULK_MAX_ROWS} 条记录"
+        )
+    return rows
+
+
+def normalize_id_rows(rows: List[Any]) -> List[Any]:
+    """批量删除允许直接提交ID列表，统一转换为 {"id": ...} 形式"""
+    return [{"id": row} if isinstance(row, int) else row for row in rows]
+
+
+def validate_rows(
+    rows: List[Any], schema: Type[BaseModel], results: List[BulkRowResult]
+) -> List[Tuple[int, BaseModel]]:
+    """
+    逐行校验数据，校验失败的行写入结果列表
+
+    Args:
+        rows: 原始行数据
+        schema: 校验使用的 Pydantic 模型
+        results: 按行号排列的结果列表（原地修改）
+
+    Returns:
+        List[Tuple[int, BaseModel]]: 校验通过的 (行号, 模型) 列表
+    """
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as e:
+            errors = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+                for err in e.errors()
+            )
+            results[index] = BulkRowResult(index=index, status="error", error=errors)
+    return valid
+
+
+def chunked(seq: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    """按固定大小切分序列"""
+    for start in range(0, len(seq), size):
+        yield seq[start:start + size]
+
+
+def build_bulk_response(results: List[Optional[BulkRowResult]]) -> BulkResponse:
+    """汇总逐行结果"""
+    failed = sum(1 for result in results if result.status == "error")
+    return BulkResponse(
+        total=len(results),
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results
+    )
@@ -0,0 +1,210 @@
+"""
+实体读缓存
+GET /items/{id} 与 GET /users/{id} 的读穿透缓存：
+一级为进程内有界 LRU（带 TTL），二级为可选的共享缓存后端；写操作时写穿透或失效
+"""
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from config import settings
+from models.schemas import ItemResponse, UserResponse
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class CacheBackend(ABC):
+    """
+    缓存后端接口
+    共享缓存（如 Redis、Memcached）实现该接口即可作为二级缓存接入
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中返回None"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """写入缓存"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除缓存"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """清空缓存"""
+
+
+class LRUCache(CacheBackend):
+    """进程内有界 LRU 缓存，超出容量时淘汰最久未访问的条目"""
+
+    def __init__(self, max_entries: int):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数
+        """
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LocalSharedBackend(CacheBackend):
+    """
+    共享缓存后端的本地替身
+    与真实共享缓存一样只保存序列化后的字符串，便于在没有外部缓存服务时验证二级缓存逻辑
+    """
+
+    def __init__(self):
+        """初始化存储"""
+        self._store: Dict[str, Tuple[str, float]] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        raw, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._store.pop(key, None)
+            return None
+        return raw
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._store[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key: str) -> None:
+        self._store.pop(key, None)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+
+class EntityCache(Generic[T]):
+    """
+    实体缓存：一级 LRU + 可选二级共享后端，并统计命中率
+    缓存的是响应模型（已序列化的实体），命中时不访问数据库
+    """
+
+    def __init__(self, name: str, schema: Type[T], shared: Optional[CacheBackend] = None):
+        """
+        初始化实体缓存
+
+        Args:
+            name: 缓存名称（同时作为共享后端的键前缀）
+            schema: 响应模型，用于在二级缓存中序列化/反序列化
+            shared: 二级共享缓存后端，为None时只使用进程内缓存
+        """
+        self.name = name
+        self._schema = schema
+        self._local = LRUCache(settings.ENTITY_CACHE_SIZE)
+        self._shared = shared
+        self._ttl = settings.ENTITY_CACHE_TTL
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, entity_id: int) -> str:
+        """共享后端中的键"""
+        return f"{self.name}:{entity_id}"
+
+    def get(self, entity_id: int) -> Optional[T]:
+        """
+        读取实体
+
+        Args:
+            entity_id: 实体ID
+
+        Returns:
+            Optional[T]: 缓存的响应模型，未命中返回None
+        """
+        value = self._local.get(self._key(entity_id))
+        if value is not None:
+            self.local_hits += 1
+            return value
+        if self._shared is not None:
+            raw = self._shared.get(self._key(entity_id))
+            if raw is not None:
+                value = self._schema.model_validate_json(raw)
+                self._local.set(self._key(entity_id), value, self._ttl)
+                self.shared_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, entity_id: int, entity: Any) -> T:
+        """
+        写入实体（读穿透回填或写穿透）
+
+        Args:
+            entity_id: 实体ID
+            entity: ORM对象或响应模型
+
+        Returns:
+            T: 写入缓存的响应模型
+        """
+        value = self._schema.model_validate(entity)
+        self._local.set(self._key(entity_id), value, self._ttl)
+        if self._shared is not None:
+            self._shared.set(self._key(entity_id), value.model_dump_json(), self._ttl)
+        return value
+
+    def invalidate(self, entity_id: int) -> None:
+        """失效实体"""
+        self._local.delete(self._key(entity_id))
+        if self._shared is not None:
+            self._shared.delete(self._key(entity_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率统计"""
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "size": len(self._local),
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+def _create_shared_backend() -> Optional[CacheBackend]:
+    """根据配置创建二级共享缓存后端"""
+    if settings.ENTITY_CACHE_SHARED_BACKEND == "local":
+        return LocalSharedBackend()
+    return None
+
+
+# 进程级实体缓存，物品与用户共用同一个二级后端（以键前缀区分）
+_shared_backend = _create_shared_backend()
+item_cache: EntityCache[ItemResponse] = EntityCache("items", ItemResponse, _shared_backend)
+user_cache: EntityCache[UserResponse] = EntityCache("users", UserResponse, _shared_backend)
@@ -0,0 +1,160 @@
+"""
+HTTP 条件请求
+根据行版本生成强 ETag 与 Last-Modified，客户端携带 If-None-Match / If-Modified-Since
+且资源未变化时直接返回 304，不再序列化响应体
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, Optional
+
+from fastapi import Request, Response, status
+
+from models.database import LOCAL_TZ
+
+# 要求客户端每次使用前重新验证，配合 ETag 实现低成本轮询
+CACHE_CONTROL = "no-cache"
+
+
+def _row_token(row: Any) -> str:
+    """单行的版本标识（ID + 版本号 + 更新时间）"""
+    updated_at = getattr(row, "updated_at", None)
+    return f"{row.id}:{row.version}:{updated_at.isoformat() if updated_at else ''}"
+
+
+def _quote(digest: str) -> str:
+    """生成强 ETag（带双引号）"""
+    return f'"{digest}"'
+
+
+def entity_etag(entity: Any) -> str:
+    """
+    生成单个实体的 ETag
+
+    Args:
+        entity: ORM对象或响应模型（需包含 id、version、updated_at）
+
+    Returns:
+        str: 强 ETag
+    """
+    return _quote(hashlib.blake2b(_row_token(entity).encode("utf-8"), digest_size=12).hexdigest())
+
+
+def page_etag(rows: Iterable[Any], total: Optional[int], has_more: bool) -> str:
+    """
+    生成列表页的 ETag，只依赖每行的 ID/版本以及总数，不需要加载完整数据
+
+    Args:
+        rows: 当前页的行（ORM对象或只含键列的查询结果）
+        total: 总记录数
+        has_more: 是否还有下一页
+
+    Returns:
+        str: 强 ETag
+    """
+    digest = hashlib.blake2b(f"{total}:{int(has_more)}".encode("utf-8"), digest_size=12)
+    for row in rows:
+        digest.update(b"|")
+        digest.update(_row_token(row).encode("utf-8"))
+    return _quote(digest.hexdigest())
+
+
+def last_modified(entity: Any) -> Optional[datetime]:
+    """实体最后修改时间（UTC），旧数据没有更新时间时使用创建时间"""
+    value = getattr(entity, "updated_at", None) or getattr(entity, "created_at", None)
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=LOCAL_TZ)
+    return value.astimezone(timezone.utc)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 是否命中（按 RFC 9110 使用弱比较）
+
+    Args:
+        if_none_match: 请求头的值
+        etag: 当前资源的 ETag
+
+    Returns:
+        bool: 是否命中
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified_since(if_modified_since: Optional[str], modified: Optional[datetime]) -> bool:
+    """判断 If-Modified-Since 是否命中（HTTP 日期只精确到秒）"""
+    if not if_modified_since or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return modified.replace(microsecond=0) <= since
+
+
+def not_modified(etag: str, modified: Optional[datetime] = None) -> Response:
+    """构造 304 响应"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def conditional_entity(request: Request, response: Response, entity: Any) -> Optional[Response]:
+    """
+    处理单个实体的条件请求
+
+    为响应设置 ETag / Last-Modified；If-None-Match 存在时只按 ETag 判断，否则按 If-Modified-Since 判断
+
+    Args:
+        request: 请求对象
+        response: 路由注入的响应对象（用于设置响应头）
+        entity: ORM对象或响应模型
+
+    Returns:
+        Optional[Response]: 资源未变化时返回 304 响应，否则返回None
+    """
+    etag = entity_etag(entity)
+    modified = last_modified(entity)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        unchanged = etag_matches(if_none_match, etag)
+    else:
+        unchanged = _not_modified_since(request.headers.get("if-modified-since"), modified)
+    if unchanged:
+        return not_modified(etag, modified)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if modified is not None:
+        response.headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return None
+
+
+def conditional_page(response: Response, etag: str, unchanged: bool) -> Optional[Response]:
+    """
+    处理列表页的条件请求
+
+    Args:
+        response: 路由注入的响应对象
+        etag: fetch_page 计算出的 ETag
+        unchanged: fetch_page 是否已判定 If-None-Match 命中
+
+    Returns:
+        Optional[Response]: 命中时返回 304 响应，否则返回None
+    """
+    if unchanged:
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
@@ -3,13 +3,46 @@
 使用SQLAlchemy + SQLite内存数据库
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy import create_engine, event, inspect, literal_column, text, Index, Column, Integer, String, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn
 from datetime import datetime, timezone, timedelta
+from config import settings
+from models.search import ensure_fts, drop_fts
 
-# 创建文件数据库引擎（修复多线程问题）
-engine = create_engine('sqlite:///faststudy.db', echo=True, connect_args={"check_same_thread": False})
+# 数据库中的时间按东八区本地时间存储（不带时区信息）
+LOCAL_TZ = timezone(timedelta(hours=8))
+
+
+def _local_now() -> datetime:
+    """当前东八区时间（去掉时区信息，与数据库中读出的值保持一致）"""
+    return datetime.now(LOCAL_TZ).replace(tzinfo=None)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """新连接建立时设置SQLite PRAGMA（WAL、同步级别、缓存等）"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+    finally:
+        cursor.close()
+
+# 创建文件数据库引擎（修复多线程问题，连接池适配多线程并发读）
+engine = create_engine(
+    f'sqlite:///{settings.DATABASE_FILE}',
+    echo=settings.db_echo,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
+)
+event.listen(engine, "connect", _set_sqlite_pragmas)
 
 # 创建基类
 Base = declarative_base()
@@ -17,6 +50,21 @@ Base = declarative_base()
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 创建异步数据库引擎（aiosqlite驱动，查询不再阻塞事件循环）
+async_engine = create_async_engine(
+    f'sqlite+aiosqlite:///{settings.DATABASE_FILE}',
+    echo=settings.db_echo,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
+)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# 创建异步会话工厂（提交后不过期对象，便于直接返回给响应模型）
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 class User(Base):
     """用户模型"""
     __tablename__ = "users"
@@ -27,9 +75,19 @@ class User(Base):
     full_name = Column(String(100))
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.now(timezone(timedelta(hours=8))))
+    # 行版本：每次 UPDATE 自动递增，用于生成 ETag / Last-Modified
+    updated_at = Column(DateTime, default=_local_now, onupdate=_local_now)
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version + 1"))
     
     # 关系
     items = relationship("Item", back_populates="owner")
+    
+    # 索引（游标分页按创建时间排序时使用；NOCASE 索引供用户名/邮箱前缀搜索使用）
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_username_nocase", text("username COLLATE NOCASE")),
+        Index("ix_users_email_nocase", text("email COLLATE NOCASE")),
+    )
 
 class Item(Base):
     """物品模型"""
@@ -41,9 +99,17 @@ class Item(Base):
     price = Column(Float, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.now(timezone(timedelta(hours=8))))
+    # 行版本：每次 UPDATE 自动递增，用于生成 ETag / Last-Modified
+    updated_at = Column(DateTime, default=_local_now, onupdate=_local_now)
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version + 1"))
     
     # 关系
     owner = relationship("User", back_populates="items")
+    
+    # 索引（游标分页按创建时间排序时使用）
+    __table_args__ = (
+        Index("ix_items_created_at_id", "created_at", "id"),
+    )
 
 def _create_test_data(db: Session) -> None:
     """创建测试数据（10个用户和30个物品）"""
@@ -86,9 +152,13 @@ def reset_db():
     except Exception:
         pass
 
-    # 删除并重建所有表
+    # 删除并重建所有表（全文索引表不在元数据中，需单独删除和创建）
+    with engine.begin() as conn:
+        drop_fts(conn)
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        ensure_fts(conn)
 
     db = SessionLocal()
     try:
@@ -105,9 +175,35 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """获取异步数据库会话（供路由依赖注入使用）"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _ensure_columns() -> None:
+    """为已存在的表补齐新增的列（create_all 不会修改已有表）"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+def _ensure_indexes() -> None:
+    """为已存在的表补建新增的索引（create_all 不会为已有表创建索引）"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def init_db():
     """初始化数据库并创建测试数据（扩充：用户10条、物品30条）"""
     Base.metadata.create_all(bind=engine)
+    _ensure_columns()
+    _ensure_indexes()
+    with engine.begin() as conn:
+        ensure_fts(conn)
 
     db = SessionLocal()
     try:
@@ -0,0 +1,63 @@
+"""
+当前用户解析缓存
+进程级 TTL 缓存，避免每次写请求都查询一次当前用户；
+用户激活状态变化时由用户路由调用 invalidate 失效
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+from config import settings
+
+# 模拟认证下所有请求共用同一身份；接入真实认证后以令牌作为缓存键
+DEFAULT_IDENTITY = "default"
+
+# 缓存未命中标记（区分“未缓存”和“已缓存但没有活跃用户”）
+MISSING = object()
+
+
+class IdentityCache:
+    """身份 -> 活跃用户ID 的 TTL 缓存"""
+
+    def __init__(self):
+        """初始化缓存"""
+        self._entries: Dict[str, Tuple[Optional[int], float]] = {}
+
+    def get(self, key: str):
+        """
+        读取缓存
+
+        Args:
+            key: 身份标识
+
+        Returns:
+            活跃用户ID；没有活跃用户时为None；未命中或已过期时为 MISSING
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        user_id, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._entries.pop(key, None)
+            return MISSING
+        return user_id
+
+    def set(self, key: str, user_id: Optional[int]) -> None:
+        """写入缓存"""
+        self._entries[key] = (user_id, time.monotonic() + settings.IDENTITY_CACHE_TTL)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+        失效缓存
+
+        Args:
+            key: 身份标识，为None时清空全部
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+# 进程级身份缓存
+identity_cache = IdentityCache()
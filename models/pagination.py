@@ -0,0 +1,311 @@
+"""
+分页辅助函数
+提供偏移分页与游标（Keyset）分页共用的排序、游标编解码逻辑，以及列表总数的计算策略
+"""
+
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.conditional import etag_matches, page_etag
+
+# 支持的排序方式：按主键，或按创建时间 + 主键
+SORT_FIELDS = {
+    "id": ("id",),
+    "created_at": ("created_at", "id"),
+}
+
+
+def _encode_value(value: Any) -> Any:
+    """将排序键的值转换为可JSON序列化的形式"""
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    """还原排序键的值"""
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(sort: str, row: Any) -> str:
+    """
+    根据一行数据生成不透明游标
+
+    Args:
+        sort: 排序方式
+        row: ORM对象
+
+    Returns:
+        str: base64url编码的游标
+    """
+    values = [_encode_value(getattr(row, field)) for field in SORT_FIELDS[sort]]
+    payload = json.dumps({"s": sort, "k": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    """
+    解析游标
+
+    Args:
+        cursor: 客户端传入的游标
+        sort: 当前请求的排序方式
+
+    Returns:
+        List[Any]: 排序键的值
+
+    Raises:
+        HTTPException: 游标格式错误或与排序方式不匹配
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = [_decode_value(v) for v in payload["k"]]
+        cursor_sort = payload["s"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+    if cursor_sort != sort or len(values) != len(SORT_FIELDS[sort]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="分页游标与排序方式不匹配"
+        )
+    return values
+
+
+def apply_order(query: Select, model: Any, sort: str) -> Select:
+    """为查询添加稳定排序（分页结果可复现）"""
+    return query.order_by(*[getattr(model, field) for field in SORT_FIELDS[sort]])
+
+
+def apply_keyset(query: Select, model: Any, sort: str, cursor: str) -> Select:
+    """
+    为查询添加游标定位条件，直接通过索引跳到上一页末尾之后
+
+    Args:
+        query: 已包含过滤条件的查询
+        model: ORM模型类
+        sort: 排序方式
+        cursor: 游标
+
+    Returns:
+        Select: 添加定位条件后的查询
+    """
+    values = decode_cursor(cursor, sort)
+    columns = [getattr(model, field) for field in SORT_FIELDS[sort]]
+    if len(columns) == 1:
+        return query.where(columns[0] > values[0])
+    return query.where(tuple_(*columns) > tuple_(*values))
+
+
+def split_page(rows: Sequence[Any], page_size: int, sort: str) -> Tuple[List[Any], Optional[str]]:
+    """
+    拆分多取一行的查询结果，得到当前页数据和下一页游标
+
+    Args:
+        rows: 以 limit(page_size + 1) 查询得到的数据
+        page_size: 每页大小
+        sort: 排序方式
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: 当前页数据、下一页游标（没有下一页时为None）
+    """
+    page_rows = list(rows[:page_size])
+    next_cursor = None
+    if len(rows) > page_size and page_rows:
+        next_cursor = encode_cursor(sort, page_rows[-1])
+    return page_rows, next_cursor
+
+
+class CountCache:
+    """
+    列表总数缓存
+    按 (表名, 过滤条件) 缓存总数；表发生写操作时递增版本号，使该表的精确缓存失效
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大缓存条目数，超出时淘汰最早写入的条目
+        """
+        self._max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], Tuple[int, int, float]] = {}
+        self._generations: Dict[str, int] = {}
+
+    def generation(self, table: str) -> int:
+        """获取表的当前版本号（在计数查询前读取，避免并发写入时缓存旧值）"""
+        return self._generations.get(table, 0)
+
+    def get(self, table: str, key: str, count_mode: str) -> Optional[int]:
+        """
+        读取缓存的总数
+
+        Args:
+            table: 表名
+            key: 过滤条件
+            count_mode: exact 只接受未失效的条目，estimate 接受有效期内的旧条目
+
+        Returns:
+            Optional[int]: 缓存的总数，未命中时为None
+        """
+        entry = self._entries.get((table, key))
+        if entry is None:
+            return None
+        total, generation, stored_at = entry
+        age = time.monotonic() - stored_at
+        if count_mode == "estimate":
+            return total if age <= settings.COUNT_ESTIMATE_TTL else None
+        if generation == self.generation(table) and age <= settings.COUNT_CACHE_TTL:
+            return total
+        return None
+
+    def set(self, table: str, key: str, total: int, generation: int) -> None:
+        """写入总数缓存"""
+        self._entries.pop((table, key), None)
+        if len(self._entries) >= self._max_entries:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[(table, key)] = (total, generation, time.monotonic())
+
+    def invalidate(self, table: str) -> None:
+        """表发生写操作后调用，使该表的精确缓存失效"""
+        self._generations[table] = self.generation(table) + 1
+
+
+# 进程级总数缓存
+count_cache = CountCache()
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query: Select,
+    model: Any,
+    count_key: str,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    sort: str,
+    count_mode: str,
+    order_by: Optional[Sequence[Any]] = None,
+    if_none_match: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    执行分页查询
+
+    总数策略：
+    - exact：优先使用未失效的缓存；未命中时偏移分页用窗口函数随数据一次查出总数
+    - estimate：允许使用有效期内的旧缓存，未命中时同 exact
+    - none：不计算总数
+
+    条件请求：客户端携带 If-None-Match 时先只查本页的 ID/版本列计算 ETag，
+    命中则不再加载完整数据；未命中再按ID加载本页数据
+
+    Args:
+        db: 异步数据库会话
+        query: 已包含过滤条件的查询
+        model: ORM模型类
+        count_key: 过滤条件的缓存键
+        page: 当前页码（游标分页模式下忽略）
+        page_size: 每页大小
+        cursor: 分页游标
+        sort: 排序方式
+        count_mode: 总数策略
+        order_by: 自定义排序列（如全文检索相关度），指定时只支持偏移分页
+        if_none_match: 请求头 If-None-Match 的值
+
+    Returns:
+        Dict[str, Any]: PaginatedResponse 所需字段，以及 etag 和 not_modified（If-None-Match 是否命中）
+
+    Raises:
+        HTTPException: 自定义排序时传入了游标
+    """
+    if order_by is not None and cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="当前排序方式不支持游标分页"
+        )
+
+    table = model.__tablename__
+    total = None if count_mode == "none" else count_cache.get(table, count_key, count_mode)
+    need_count = count_mode != "none" and total is None
+    generation = count_cache.generation(table)
+    window_count = need_count and not cursor
+
+    # 游标分页的定位条件会改变窗口计数，需要单独计数
+    if need_count and cursor:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    # 游标分页直接定位到上一页末尾之后，偏移分页跳过前面的记录
+    if order_by is not None:
+        page_query = query.order_by(*order_by)
+    else:
+        page_query = apply_order(query, model, sort)
+    if cursor:
+        page_query = apply_keyset(page_query, model, sort, cursor)
+    else:
+        page_query = page_query.offset((page - 1) * page_size)
+    # 条件请求只查键列（排序键 + 版本），足以生成游标和 ETag
+    keys_only = if_none_match is not None
+    if keys_only:
+        key_columns = {"id", "version", "updated_at", *SORT_FIELDS.get(sort, ())}
+        page_query = page_query.with_only_columns(
+            *[getattr(model, name) for name in sorted(key_columns)], maintain_column_froms=True
+        )
+    if window_count:
+        page_query = page_query.add_columns(func.count().over().label("total"))
+
+    # 查询数据（多取一行用于判断是否还有下一页）
+    result = await db.execute(page_query.limit(page_size + 1))
+    if window_count:
+        rows = result.all()
+        if rows:
+            total = rows[0].total
+        else:
+            # 页码超出范围时窗口函数没有返回行，退回单独计数
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        if not keys_only:
+            rows = [row[0] for row in rows]
+    elif keys_only:
+        rows = result.all()
+    else:
+        rows = result.scalars().all()
+    if order_by is not None:
+        data, next_cursor = list(rows[:page_size]), None
+    else:
+        data, next_cursor = split_page(rows, page_size, sort)
+
+    if need_count:
+        count_cache.set(table, count_key, total, generation)
+
+    etag = page_etag(data, total, len(rows) > page_size)
+    not_modified = etag_matches(if_none_match, etag)
+    if keys_only and not not_modified and data:
+        # 按键加载本页完整数据，并保持查询顺序
+        ids = [row.id for row in data]
+        loaded = {row.id: row for row in await db.scalars(select(model).where(model.id.in_(ids)))}
+        data = [loaded[row_id] for row_id in ids if row_id in loaded]
+
+    return {
+        "etag": etag,
+        "not_modified": not_modified,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": None if total is None else (total + page_size - 1) // page_size,
+        "data": data,
+        "next_cursor": next_cursor
+    }
@@ -3,7 +3,7 @@ Pydantic模型定义
 用于请求和响应数据验证
 """
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional, List, Generic, TypeVar
 from datetime import datetime
 
@@ -13,14 +13,33 @@ T = TypeVar('T')
 # 通用分页响应模型
 class PaginatedResponse(BaseModel, Generic[T]):
     """通用分页响应模型"""
-    total: int          # 总记录数
-    page: int           # 当前页码
-    page_size: int      # 每页大小
-    total_pages: int    # 总页数
+    total: Optional[int]        # 总记录数（count_mode=none 时为空）
+    page: int                   # 当前页码
+    page_size: int              # 每页大小
+    total_pages: Optional[int]  # 总页数（count_mode=none 时为空）
     data: List[T]       # 数据列表
+    next_cursor: Optional[str] = None  # 下一页游标（没有下一页时为空）
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+# 批量操作的响应模型
+class BulkRowResult(BaseModel):
+    """批量操作的单行结果"""
+    index: int                      # 请求中的行号（从0开始）
+    status: str                     # created / updated / deleted / error
+    id: Optional[int] = None        # 记录ID
+    error: Optional[str] = None     # 失败原因
+
+class BulkDeleteRow(BaseModel):
+    """批量删除的单行请求"""
+    id: int
+
+class BulkResponse(BaseModel):
+    """批量操作响应模型"""
+    total: int                      # 提交的行数
+    succeeded: int                  # 成功行数
+    failed: int                     # 失败行数
+    results: List[BulkRowResult]    # 按行号排列的结果
 
 # 用户相关的Pydantic模型
 class UserBase(BaseModel):
@@ -36,13 +55,17 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     is_active: Optional[bool] = None
 
+class UserBulkUpdate(UserUpdate):
+    id: int
+
 class UserResponse(UserBase):
     id: int
     is_active: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    version: int = 1
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # 物品相关的Pydantic模型
 class ItemBase(BaseModel):
@@ -58,13 +81,17 @@ class ItemUpdate(BaseModel):
     description: Optional[str] = None
     price: Optional[float] = None
 
+class ItemBulkUpdate(ItemUpdate):
+    id: int
+
 class ItemResponse(ItemBase):
     id: int
     owner_id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    version: int = 1
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # 包含关系的响应模型
 class UserWithItems(UserResponse):
@@ -0,0 +1,128 @@
+"""
+全文检索
+使用 SQLite FTS5（trigram 分词器）镜像物品的 name/description 与用户的 username/email，
+由触发器保持同步，支持中文子串匹配并按 bm25 排序
+"""
+
+from typing import Dict, Tuple
+
+from sqlalchemy import Select, column, func, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+
+# 全文索引表定义：索引表名 -> (内容表名, 镜像的列)，索引表 rowid 与内容表 id 一一对应
+FTS_TABLES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "items_fts": ("items", ("name", "description")),
+    "users_fts": ("users", ("username", "email")),
+}
+
+# trigram 分词器按三个字符切分，短于三个字符的关键词无法使用索引
+MIN_FTS_QUERY_LENGTH = 3
+
+# 当前SQLite是否支持 FTS5 trigram，由 ensure_fts 设置
+FTS_ENABLED = False
+
+
+def _fts_ddl(fts_table: str, content_table: str, columns: Tuple[str, ...]) -> list:
+    """生成全文索引表和同步触发器的建表语句"""
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {cols}, content='{content_table}', content_rowid='id', tokenize='trigram'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values});
+        END""",
+    ]
+
+
+def ensure_fts(conn: Connection) -> bool:
+    """
+    创建全文索引表和同步触发器；索引表首次创建时从内容表重建索引
+
+    Args:
+        conn: 数据库连接（需在事务中）
+
+    Returns:
+        bool: 是否启用了全文检索（SQLite 不支持 FTS5 trigram 时返回False）
+    """
+    global FTS_ENABLED
+    try:
+        for fts_table, (content_table, columns) in FTS_TABLES.items():
+            existed = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": fts_table}
+            ).first() is not None
+            for ddl in _fts_ddl(fts_table, content_table, columns):
+                conn.exec_driver_sql(ddl)
+            if not existed:
+                conn.exec_driver_sql(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+    except Exception as e:
+        print(f"SQLite 不支持 FTS5 trigram，搜索退回 LIKE 查询: {e}")
+        FTS_ENABLED = False
+        return False
+    FTS_ENABLED = True
+    return True
+
+
+def drop_fts(conn: Connection) -> None:
+    """删除全文索引表（触发器随内容表一起删除）"""
+    for fts_table in FTS_TABLES:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+def can_use_fts(search: str) -> bool:
+    """判断关键词能否走全文索引"""
+    return FTS_ENABLED and len(search) >= MIN_FTS_QUERY_LENGTH
+
+
+def _match_expression(search: str) -> str:
+    """将关键词转换为 FTS5 短语查询（整体作为子串匹配，转义双引号）"""
+    return '"' + search.replace('"', '""') + '"'
+
+
+def fts_match(fts_table: str, search: str) -> Select:
+    """
+    构造全文检索子查询，返回匹配记录的ID和 bm25 得分（越小越相关）
+
+    Args:
+        fts_table: 全文索引表名
+        search: 搜索关键词
+
+    Returns:
+        Select: 包含 id、score 两列的查询
+    """
+    fts = literal_column(fts_table)
+    source = table(fts_table, column("rowid"))
+    return (
+        select(source.c.rowid.label("id"), func.bm25(fts).label("score"))
+        .select_from(source)
+        .where(fts.match(_match_expression(search)))
+    )
+
+
+def items_match(search: str) -> Select:
+    """物品全文检索子查询"""
+    return fts_match("items_fts", search)
+
+
+def users_match(search: str) -> Select:
+    """用户全文检索子查询"""
+    return fts_match("users_fts", search)
+
+
+def prefix_pattern(search: str) -> str:
+    """
+    生成前缀匹配的 LIKE 模式（转义通配符，以 / 作为转义字符）
+    模式作为绑定参数整体传入，SQLite 才能利用 NOCASE 索引做前缀范围查找
+    """
+    escaped = search.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"{escaped}%"
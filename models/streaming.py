@@ -0,0 +1,351 @@
+"""
+流式响应辅助函数
+将上游逐 token 的输出合并成帧再写给客户端：首个 token 立即发送，
+之后按字符数或时间间隔批量刷新，不引入固定延迟；
+可选以 SSE / NDJSON 事件输出，携带带类型的错误和最终的用量统计
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+from inference.client import LLMAPIError
+from inference.context import estimate_tokens
+from inference.limiter import LimiterRejected
+
+
+async def coalesce(
+    chunks: AsyncIterator[str],
+    max_chars: Optional[int] = None,
+    max_delay: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    合并流式文本片段
+
+    - 第一个非空片段立即发送，保证首字节时间
+    - 之后缓冲的字符数达到 max_chars 或距首个缓冲片段超过 max_delay 时发送一帧
+    - 上游停顿时也会按时间刷新已缓冲的内容；上游出错时先发出缓冲内容再抛出异常
+    - 同一时刻只预取一个上游片段，客户端写入变慢时上游读取随之放缓（背压）
+
+    Args:
+        chunks: 上游文本片段
+        max_chars: 单帧最大字符数，默认取 settings.STREAM_FRAME_MAX_CHARS
+        max_delay: 缓冲最长时间（秒），默认取 settings.STREAM_FRAME_MAX_DELAY
+
+    Yields:
+        str: 合并后的文本帧
+    """
+    max_chars = settings.STREAM_FRAME_MAX_CHARS if max_chars is None else max_chars
+    max_delay = settings.STREAM_FRAME_MAX_DELAY if max_delay is None else max_delay
+    iterator = chunks.__aiter__()
+    buffer = []
+    buffered = 0
+    deadline = 0.0
+    first_sent = False
+    pending: Optional[asyncio.Future] = None
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            if buffer:
+                done, _ = await asyncio.wait({pending}, timeout=max(0.0, deadline - time.monotonic()))
+                if not done:
+                    # 上游停顿，先把已缓冲的内容发出去
+                    yield "".join(buffer)
+                    buffer, buffered = [], 0
+                    continue
+            try:
+                chunk = await pending
+            except StopAsyncIteration:
+                break
+            except BaseException:
+                pending = None
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, buffered = [], 0
+                raise
+            pending = None
+            if not chunk:
+                continue
+
+            if not first_sent:
+                first_sent = True
+                yield chunk
+                continue
+
+            if not buffer:
+                deadline = time.monotonic() + max_delay
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= max_chars or time.monotonic() >= deadline:
+                yield "".join(buffer)
+                buffer, buffered = [], 0
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # 客户端断开等原因提前结束时，取消预取并关闭上游
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+# 客户端断开统计：轮询检测到的断开次数、被服务器取消（如 Starlette 检测到断开）的次数、断开前已转发的片段数
+_disconnect_stats = {"detected": 0, "cancelled": 0, "forwarded_chunks": 0}
+
+
+def disconnect_stats() -> Dict[str, int]:
+    """客户端断开统计"""
+    return dict(_disconnect_stats)
+
+
+async def cancel_on_disconnect(
+    chunks: AsyncIterator[str],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    客户端断开时停止读取上游片段并关闭上游迭代器（随之关闭上游 HTTP 响应，中止生成）
+
+    等待上游期间每隔 poll_interval 检查一次客户端是否断开；上游持续输出时，
+    距上次检查超过 poll_interval 也会在转发片段前检查一次。
+    服务器检测到断开而取消响应任务时同样会关闭上游。
+
+    Args:
+        chunks: 上游文本片段
+        is_disconnected: 检查客户端是否断开的函数（如 Request.is_disconnected）
+        poll_interval: 检查间隔（秒），默认取 settings.STREAM_DISCONNECT_POLL
+
+    Yields:
+        str: 上游片段
+    """
+    poll_interval = settings.STREAM_DISCONNECT_POLL if poll_interval is None else poll_interval
+    iterator = chunks.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    forwarded = 0
+    last_check = time.monotonic()
+
+    try:
+        while True:
+            pending = asyncio.ensure_future(iterator.__anext__())
+            while True:
+                done, _ = await asyncio.wait({pending}, timeout=poll_interval)
+                if done:
+                    break
+                last_check = time.monotonic()
+                if await is_disconnected():
+                    _disconnect_stats["detected"] += 1
+                    _disconnect_stats["forwarded_chunks"] += forwarded
+                    return
+            future, pending = pending, None
+            try:
+                chunk = future.result()
+            except StopAsyncIteration:
+                return
+            if time.monotonic() - last_check >= poll_interval:
+                last_check = time.monotonic()
+                if await is_disconnected():
+                    _disconnect_stats["detected"] += 1
+                    _disconnect_stats["forwarded_chunks"] += forwarded
+                    return
+            forwarded += 1
+            yield chunk
+    except (GeneratorExit, asyncio.CancelledError):
+        _disconnect_stats["cancelled"] += 1
+        _disconnect_stats["forwarded_chunks"] += forwarded
+        raise
+    finally:
+        # 取消正在等待的上游读取并关闭上游迭代器
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+# 结构化流式输出格式：plain 为原有的纯文本（默认），sse 为 Server-Sent Events，ndjson 为每行一个 JSON 对象
+STREAM_FORMATS = ("plain", "sse", "ndjson")
+STREAM_MEDIA_TYPES = {
+    "plain": "text/plain",
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson"
+}
+
+
+def negotiate_stream_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    """
+    确定本次请求的流式输出格式：显式指定的格式优先，其次按 Accept 头，默认 plain
+
+    Args:
+        fmt: 请求参数中指定的格式
+        accept: Accept 请求头
+
+    Returns:
+        str: plain、sse 或 ndjson
+
+    Raises:
+        ValueError: 指定了不支持的格式
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"不支持的流式输出格式: {fmt}，可选 {', '.join(STREAM_FORMATS)}")
+        return fmt
+    accept = (accept or "").lower()
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept or "application/jsonl" in accept:
+        return "ndjson"
+    return "plain"
+
+
+def stream_error(error: BaseException) -> Dict[str, Any]:
+    """
+    将异常转换为带类型的错误事件
+
+    - overloaded：上游并发已满，请求被拒绝（附带 retry_after 秒数）
+    - upstream_http_error：上游返回非 200 状态码（附带 status_code）
+    - upstream_error：上游网络错误、流中返回的错误或响应解析失败
+    - internal_error：其他错误
+
+    Args:
+        error: 异常
+
+    Returns:
+        dict: 错误事件内容
+    """
+    if isinstance(error, LimiterRejected):
+        return {"type": "overloaded", "message": str(error), "retry_after": error.retry_after}
+    if isinstance(error, LLMAPIError):
+        if error.status_code is not None:
+            return {"type": "upstream_http_error", "message": str(error), "status_code": error.status_code}
+        return {"type": "upstream_error", "message": str(error)}
+    return {"type": "internal_error", "message": str(error) or type(error).__name__}
+
+
+class StreamMeter:
+    """
+    统计一次流式响应的用量与耗时：首 token 时间、等待上游的时间、输出字符数与估算的 token 数
+    """
+
+    def __init__(self):
+        """初始化（以创建时刻作为请求开始时间）"""
+        self.started = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.upstream_time = 0.0
+        self.chunks = 0
+        self.parts: List[str] = []
+
+    async def track(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        透传上游片段，同时累计等待上游的时间和首个非空片段的到达时间
+
+        Args:
+            chunks: 上游文本片段
+
+        Yields:
+            str: 原样输出的文本片段
+        """
+        iterator = chunks.__aiter__()
+        try:
+            while True:
+                start = time.monotonic()
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    self.upstream_time += time.monotonic() - start
+                if chunk:
+                    if self.first_token is None:
+                        self.first_token = time.monotonic()
+                    self.chunks += 1
+                    self.parts.append(chunk)
+                yield chunk
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def usage(self, finish_reason: str) -> Dict[str, Any]:
+        """
+        用量与耗时汇总（流结束时作为最后一个事件发送）
+
+        Args:
+            finish_reason: stop（正常结束）或 error（出错结束）
+
+        Returns:
+            dict: 用量与耗时
+        """
+        now = time.monotonic()
+        text = "".join(self.parts)
+        tokens = estimate_tokens(text)
+        ttft = self.first_token - self.started if self.first_token is not None else None
+        generation = now - self.first_token if self.first_token is not None else 0.0
+        return {
+            "finish_reason": finish_reason,
+            "completion_chars": len(text),
+            "completion_tokens": tokens,
+            "upstream_chunks": self.chunks,
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "upstream_ms": round(self.upstream_time * 1000, 1),
+            "total_ms": round((now - self.started) * 1000, 1),
+            "tokens_per_second": round(tokens / generation, 1) if generation > 0 else None
+        }
+
+
+def _encode_event(fmt: str, event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """按格式编码一个事件"""
+    if fmt == "sse":
+        head = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return json.dumps({"type": event, **data}, ensure_ascii=False) + "\n"
+
+
+async def structured_stream(
+    chunks: AsyncIterator[str],
+    fmt: str,
+    meter: Optional[StreamMeter] = None
+) -> AsyncIterator[str]:
+    """
+    以结构化事件输出流式响应（SSE 或 NDJSON）
+
+    事件类型：
+    - delta：文本增量 {"content": ...}；SSE 的 id 为该帧结束时已输出的字符数，断线后客户端据此得知已收到的内容
+    - error：带类型的错误 {"error": {"type": ..., "message": ...}}
+    - usage：最后一个事件，包含首 token 时间、上游耗时、token 数与生成速度（见 StreamMeter.usage）
+
+    Args:
+        chunks: 上游文本片段（合并成帧的规则与纯文本模式相同）
+        fmt: sse 或 ndjson
+        meter: 已经在统计 chunks 的 StreamMeter（由调用方提前开始计时）；未传入时在此新建
+
+    Yields:
+        str: 编码后的事件
+    """
+    if meter is None:
+        meter = StreamMeter()
+        chunks = meter.track(chunks)
+    offset = 0
+    finish_reason = "stop"
+    try:
+        async for frame in coalesce(chunks):
+            offset += len(frame)
+            yield _encode_event(fmt, "delta", {"content": frame}, offset)
+    except Exception as e:
+        finish_reason = "error"
+        yield _encode_event(fmt, "error", {"error": stream_error(e)})
+    yield _encode_event(fmt, "usage", meter.usage(finish_reason))
@@ -1,30 +1,50 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from models.database import get_db
-from models.schemas import ItemCreate, ItemResponse, ItemUpdate, PaginatedResponse
+from collections import defaultdict, deque
+from config import settings
+from models.database import get_async_db
+from models.schemas import (
+    ItemCreate, ItemResponse, ItemUpdate, ItemBulkUpdate, PaginatedResponse,
+    BulkDeleteRow, BulkResponse, BulkRowResult
+)
 from models.database import Item, User
+from models.bulk import read_bulk_payload, normalize_id_rows, validate_rows, chunked, build_bulk_response
+from models.pagination import fetch_page, count_cache
+from models.search import can_use_fts, items_match
+from models.identity import identity_cache, DEFAULT_IDENTITY, MISSING
+from models.cache import item_cache
+from models.conditional import conditional_entity, conditional_page
 
 router = APIRouter()
 
-def get_current_user_id(db: Session = Depends(get_db)):
+async def get_active_user_id(db: AsyncSession = Depends(get_async_db)) -> Optional[int]:
+    """解析当前活跃用户ID（进程级缓存，请求内由依赖注入缓存复用），没有活跃用户时返回None"""
+    user_id = identity_cache.get(DEFAULT_IDENTITY)
+    if user_id is MISSING:
+        # 实际应用中这里会验证token并返回真实用户ID
+        # 这里返回第一个活跃用户作为示例
+        user_id = await db.scalar(select(User.id).where(User.is_active == True).limit(1))
+        identity_cache.set(DEFAULT_IDENTITY, user_id)
+    return user_id
+
+
+async def get_current_user_id(active_user_id: Optional[int] = Depends(get_active_user_id)):
     """依赖注入示例 - 获取当前用户ID（模拟）"""
-    # 实际应用中这里会验证token并返回真实用户ID
-    # 这里返回第一个活跃用户作为示例
-    user = db.query(User).filter(User.is_active == True).first()
-    return user.id if user else 1
+    return active_user_id if active_user_id else 1
 
 
 @router.post("/items", response_model=ItemResponse, status_code=status.HTTP_201_CREATED)
 async def create_item(
     item: ItemCreate,
-    current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    active_user_id: Optional[int] = Depends(get_active_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新物品（演示依赖注入）"""
-    # 检查用户是否存在
-    user = db.query(User).filter(User.id == current_user_id, User.is_active == True).first()
-    if not user:
+    # 检查用户是否存在（解析结果只包含活跃用户，无需再次查询）
+    if not active_user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
@@ -35,62 +55,243 @@ async def create_item(
         name=item.name,
         description=item.description,
         price=item.price,
-        owner_id=current_user_id
+        owner_id=active_user_id
     )
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    count_cache.invalidate(Item.__tablename__)
+    await db.refresh(db_item)
     return db_item
 
 
+@router.post("/items/bulk", response_model=BulkResponse)
+async def bulk_create_items(
+    request: Request,
+    active_user_id: Optional[int] = Depends(get_active_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量创建物品
+    
+    请求体为 ItemCreate 的 JSON 数组，或 Content-Type: application/x-ndjson 的逐行 JSON。
+    校验通过的行在同一事务中按批次 executemany 写入，返回逐行结果。
+    """
+    rows = await read_bulk_payload(request)
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+    valid = validate_rows(rows, ItemCreate, results)
+    
+    # 检查用户是否存在（与单条创建一致，物品归属当前用户）
+    if not active_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="用户不存在"
+        )
+    
+    table = Item.__table__
+    try:
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            # RETURNING 不保证与参数顺序一致（强制排序会退化为逐行插入），
+            # 因此按行内容回填ID；内容完全相同的行互换ID不影响结果
+            pending = defaultdict(deque)
+            for index, item in chunk:
+                pending[(item.name, item.description, item.price)].append(index)
+            returned = await db.execute(
+                insert(table).returning(table.c.id, table.c.name, table.c.description, table.c.price),
+                [
+                    {"name": item.name, "description": item.description,
+                     "price": item.price, "owner_id": active_user_id}
+                    for _, item in chunk
+                ]
+            )
+            for item_id, name, description, price in returned:
+                index = pending[(name, description, price)].popleft()
+                results[index] = BulkRowResult(index=index, status="created", id=item_id)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"批量写入失败，已回滚: {str(e)}"
+        )
+    
+    count_cache.invalidate(Item.__tablename__)
+    return build_bulk_response(results)
+
+
+@router.put("/items/bulk", response_model=BulkResponse)
+async def bulk_update_items(
+    request: Request,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量更新物品
+    
+    请求体为 ItemBulkUpdate（ItemUpdate 字段 + id）的 JSON 数组或 NDJSON，只能修改当前用户的物品。
+    """
+    rows = await read_bulk_payload(request)
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+    valid = validate_rows(rows, ItemBulkUpdate, results)
+    
+    try:
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            # 一次查出本批物品的归属，用于存在性和权限检查
+            owners = dict((await db.execute(
+                select(Item.id, Item.owner_id).where(Item.id.in_([row.id for _, row in chunk]))
+            )).all())
+            params = []
+            for index, row in chunk:
+                if row.id not in owners:
+                    results[index] = BulkRowResult(index=index, status="error", id=row.id, error="物品不存在")
+                elif owners[row.id] != current_user_id:
+                    results[index] = BulkRowResult(index=index, status="error", id=row.id, error="没有权限修改此物品")
+                else:
+                    update_data = row.model_dump(exclude_unset=True)
+                    if len(update_data) > 1:
+                        params.append(update_data)
+                    results[index] = BulkRowResult(index=index, status="updated", id=row.id)
+            if params:
+                await db.execute(update(Item), params)
+        await db.commit()
+        for result in results:
+            if result is not None and result.status == "updated":
+                item_cache.invalidate(result.id)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"批量更新失败，已回滚: {str(e)}"
+        )
+    
+    count_cache.invalidate(Item.__tablename__)
+    return build_bulk_response(results)
+
+
+@router.delete("/items/bulk", response_model=BulkResponse)
+async def bulk_delete_items(
+    request: Request,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量删除物品
+    
+    请求体为物品ID数组（或 {"id": ...} 对象数组 / NDJSON），只能删除当前用户的物品。
+    """
+    rows = normalize_id_rows(await read_bulk_payload(request))
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+    valid = validate_rows(rows, BulkDeleteRow, results)
+    
+    try:
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            owners = dict((await db.execute(
+                select(Item.id, Item.owner_id).where(Item.id.in_([row.id for _, row in chunk]))
+            )).all())
+            ids = set()
+            for index, row in chunk:
+                if row.id not in owners:
+                    results[index] = BulkRowResult(index=index, status="error", id=row.id, error="物品不存在")
+                elif owners[row.id] != current_user_id:
+                    results[index] = BulkRowResult(index=index, status="error", id=row.id, error="没有权限删除此物品")
+                else:
+                    ids.add(row.id)
+                    results[index] = BulkRowResult(index=index, status="deleted", id=row.id)
+            if ids:
+                await db.execute(
+                    delete(Item).where(Item.id.in_(ids)).execution_options(synchronize_session=False)
+                )
+        await db.commit()
+        for result in results:
+            if result is not None and result.status == "deleted":
+                item_cache.invalidate(result.id)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"批量删除失败，已回滚: {str(e)}"
+        )
+    
+    count_cache.invalidate(Item.__tablename__)
+    return build_bulk_response(results)
+
+
 @router.get("/items", response_model=PaginatedResponse[ItemResponse])
 async def get_items(
-    page: int = Query(1, ge=1, description="当前页码"),
+    request: Request,
+    response: Response,
+    page: int = Query(1, ge=1, description="当前页码（游标分页模式下忽略）"),
     page_size: int = Query(10, ge=1, le=100, description="每页记录数"),
     search: Optional[str] = Query(None, description="搜索关键词"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，传入时使用游标分页（取自上一页的 next_cursor）"),
+    sort: Optional[str] = Query(
+        None, pattern="^(id|created_at|relevance)$",
+        description="排序方式：id、created_at 或 relevance（默认有搜索关键词时按相关度，否则按 id）"
+    ),
+    count_mode: str = Query("exact", pattern="^(exact|estimate|none)$", description="总数策略：exact / estimate / none"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取物品列表（支持搜索和分页）"""
-    query = db.query(Item)
+    """获取物品列表（支持全文搜索，以及偏移分页和游标分页两种模式）"""
+    query = select(Item)
+    order_by = None
+    if sort is None:
+        sort = "relevance" if search and not cursor else "id"
     
-    # 搜索过滤
-    if search:
-        query = query.filter(
+    # 搜索过滤：关键词足够长时走 FTS5 全文索引，否则退回 LIKE 查询
+    if search and can_use_fts(search):
+        matches = items_match(search).subquery()
+        if sort == "relevance":
+            query = query.join(matches, Item.id == matches.c.id)
+            order_by = (matches.c.score, Item.id)
+        else:
+            query = query.where(Item.id.in_(select(matches.c.id)))
+    elif search:
+        query = query.where(
             (Item.name.ilike(f"%{search}%")) |
             (Item.description.ilike(f"%{search}%"))
         )
     
-    # 计算总记录数
-    total = query.count()
-    
-    # 计算总页数
-    total_pages = (total + page_size - 1) // page_size
+    # 没有可用的相关度时按主键排序
+    if sort == "relevance" and order_by is None:
+        sort = "id"
     
-    # 计算跳过的记录数
-    skip = (page - 1) * page_size
+    # 查询数据并按总数策略计算总记录数
+    result = await fetch_page(
+        db, query, Item, count_key=search or "",
+        page=page, page_size=page_size, cursor=cursor, sort=sort, count_mode=count_mode,
+        order_by=order_by, if_none_match=request.headers.get("if-none-match")
+    )
     
-    # 查询数据
-    items = query.offset(skip).limit(page_size).all()
+    # 本页未变化时返回 304，不再序列化响应体
+    not_modified = conditional_page(response, result.pop("etag"), result.pop("not_modified"))
+    if not_modified is not None:
+        return not_modified
     
     # 返回包含分页信息的响应
-    return PaginatedResponse(
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
-        data=items
-    )
+    return PaginatedResponse(**result)
 
 
 @router.get("/items/{item_id}", response_model=ItemResponse)
-async def get_item(item_id: int, db: Session = Depends(get_db)):
-    """根据ID获取物品信息"""
-    item = db.query(Item).filter(Item.id == item_id).first()
-    if not item:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="物品不存在"
-        )
+async def get_item(
+    item_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """根据ID获取物品信息（读穿透缓存，支持 If-None-Match / If-Modified-Since 条件请求）"""
+    item = item_cache.get(item_id)
+    if item is None:
+        db_item = await db.get(Item, item_id)
+        if not db_item:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="物品不存在"
+            )
+        item = item_cache.set(item_id, db_item)
+    
+    # 物品未变化时返回 304，不再序列化响应体
+    not_modified = conditional_entity(request, response, item)
+    if not_modified is not None:
+        return not_modified
     return item
 
 
@@ -99,10 +300,10 @@ async def update_item(
     item_id: int,
     item_update: ItemUpdate,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新物品信息"""
-    item = db.query(Item).filter(Item.id == item_id).first()
+    item = await db.get(Item, item_id)
     if not item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -121,19 +322,21 @@ async def update_item(
     for field, value in update_data.items():
         setattr(item, field, value)
     
-    db.commit()
-    db.refresh(item)
-    return item
+    await db.commit()
+    count_cache.invalidate(Item.__tablename__)
+    await db.refresh(item)
+    # 写穿透：用更新后的数据覆盖缓存
+    return item_cache.set(item_id, item)
 
 
 @router.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_item(
     item_id: int,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除物品"""
-    item = db.query(Item).filter(Item.id == item_id).first()
+    item = await db.get(Item, item_id)
     if not item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,5 +349,7 @@ async def delete_item(
             detail="没有权限删除此物品"
         )
     
-    db.delete(item)
-    db.commit()
\ No newline at end of file
+    await db.delete(item)
+    await db.commit()
+    count_cache.invalidate(Item.__tablename__)
+    item_cache.invalidate(item_id)
@@ -2,49 +2,117 @@
 LangChain 和 LangGraph 相关路由
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends, Header
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
+import json
 import os
 
+from config import settings
+from inference.client import aclose_inference_client
+from inference.limiter import LimiterRejected
+from models.streaming import (
+    STREAM_MEDIA_TYPES,
+    StreamMeter,
+    cancel_on_disconnect,
+    coalesce,
+    negotiate_stream_format,
+    structured_stream
+)
+
 router = APIRouter()
 
 # 尝试导入依赖，失败则设置为None
 try:
     from examples.langchain_example import (
-        simple_llm_call,
-        run_simple_chain,
-        translate_text,
-        validate_model,
         get_llm,
-        simple_llm_call_stream,
-        run_simple_chain_stream,
-        translate_text_stream,
-        validate_model_stream
+        create_simple_chain,
+        create_translation_chain,
+        simple_llm_call_async,
+        simple_llm_call_astream,
+        run_simple_chain_async,
+        run_simple_chain_astream,
+        translate_text_async,
+        translate_text_astream,
+        validate_model_async,
+        validate_model_astream
     )
     LANGCHAIN_AVAILABLE = True
 except ImportError:
     LANGCHAIN_AVAILABLE = False
-    simple_llm_call = None
-    run_simple_chain = None
-    translate_text = None
-    validate_model = None
     get_llm = None
-    simple_llm_call_stream = None
-    run_simple_chain_stream = None
-    translate_text_stream = None
-    validate_model_stream = None
+    create_simple_chain = None
+    create_translation_chain = None
+    simple_llm_call_async = None
+    simple_llm_call_astream = None
+    run_simple_chain_async = None
+    run_simple_chain_astream = None
+    translate_text_async = None
+    translate_text_astream = None
+    validate_model_async = None
+    validate_model_astream = None
 
 try:
     from examples.langgraph_example import (
         ConversationWorkflow,
-        DecisionWorkflow
+        DecisionWorkflow,
+        get_workflow
     )
     LANGGRAPH_AVAILABLE = True
 except ImportError:
     LANGGRAPH_AVAILABLE = False
     ConversationWorkflow = None
     DecisionWorkflow = None
+    get_workflow = None
+
+try:
+    from examples.langgraph_sessions import (
+        aclose_conversation_sessions,
+        conversation_session_stats,
+        get_conversation_sessions
+    )
+    SESSIONS_AVAILABLE = True
+except ImportError:
+    SESSIONS_AVAILABLE = False
+    aclose_conversation_sessions = None
+    conversation_session_stats = None
+    get_conversation_sessions = None
+
+try:
+    from examples.langchain_batch import batch_jobs
+    BATCH_AVAILABLE = True
+except ImportError:
+    BATCH_AVAILABLE = False
+    batch_jobs = None
+
+
+def warm_up_llm() -> None:
+    """预先构建共享的链和编译好的工作流（应用启动时调用），避免首个请求承担构建开销"""
+    if LANGCHAIN_AVAILABLE:
+        create_simple_chain()
+        create_translation_chain()
+    if LANGGRAPH_AVAILABLE:
+        get_workflow(ConversationWorkflow)
+        get_workflow(DecisionWorkflow)
+
+
+async def close_llm_clients() -> None:
+    """取消未完成的批量任务，关闭共享的上游HTTP连接池和会话存储（应用退出时调用）"""
+    if BATCH_AVAILABLE:
+        await batch_jobs.cancel_all()
+    await aclose_inference_client()
+    if SESSIONS_AVAILABLE:
+        await aclose_conversation_sessions()
+
+
+def require_sessions() -> None:
+    """会话依赖未安装时返回 503"""
+    if not SESSIONS_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="会话功能依赖未安装，请先安装依赖：poetry install"
+        )
 
 
 # 定义请求模型
@@ -64,9 +132,40 @@ class TranslationRequest(BaseModel):
     text: str = Field(..., description="要翻译的文本")
 
 
+class BatchRequest(BaseModel):
+    """批量链调用请求模型"""
+    inputs: List[str] = Field(
+        ..., min_length=1, max_length=settings.LLM_BATCH_MAX_ITEMS,
+        description="输入文本列表"
+    )
+    max_concurrency: Optional[int] = Field(
+        default=None, ge=1, le=settings.LLM_BATCH_MAX_CONCURRENCY,
+        description="同时执行的项数，默认取 LLM_BATCH_MAX_CONCURRENCY"
+    )
+
+
+class TranslationBatchRequest(BaseModel):
+    """批量翻译请求模型"""
+    texts: List[str] = Field(
+        ..., min_length=1, max_length=settings.LLM_BATCH_MAX_ITEMS,
+        description="要翻译的文本列表"
+    )
+    max_concurrency: Optional[int] = Field(
+        default=None, ge=1, le=settings.LLM_BATCH_MAX_CONCURRENCY,
+        description="同时执行的项数，默认取 LLM_BATCH_MAX_CONCURRENCY"
+    )
+
+
 class ConversationRequest(BaseModel):
     """对话请求模型"""
-    messages: List[Dict[str, str]] = Field(..., description="对话消息列表")
+    messages: List[Dict[str, str]] = Field(
+        ..., max_length=settings.LLM_CONVERSATION_MAX_MESSAGES,
+        description="对话消息列表（发往上游时按 token 预算裁剪）；传入 session_id 时只需包含本轮新增的消息"
+    )
+    session_id: Optional[str] = Field(
+        default=None, min_length=1, max_length=128,
+        description="会话ID（由客户端生成，如 UUID）：传入时服务端保存对话历史"
+    )
 
 
 class DecisionRequest(BaseModel):
@@ -101,6 +200,185 @@ def get_api_key(authorization: str = Header(...)):
     return authorization[7:]
 
 
+# 辅助函数：确定流式输出格式
+def get_stream_format(
+    format: Optional[str] = Query(
+        default=None,
+        description="流式输出格式：plain（纯文本，默认）、sse（Server-Sent Events）或 ndjson（每行一个 JSON）"
+    ),
+    accept: Optional[str] = Header(default=None)
+) -> str:
+    """
+    确定流式输出格式：优先使用 format 参数，其次按 Accept 头（text/event-stream、application/x-ndjson）
+    
+    Args:
+        format: 请求参数中指定的格式
+        accept: Accept 请求头
+        
+    Returns:
+        str: plain、sse 或 ndjson
+        
+    Raises:
+        HTTPException: 指定了不支持的格式
+    """
+    try:
+        return negotiate_stream_format(format, accept)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def upstream_busy(error: LimiterRejected) -> HTTPException:
+    """
+    上游并发已满、请求被拒绝时返回 429，并通过 Retry-After 告知建议的重试时间
+    
+    Args:
+        error: 并发限制的拒绝异常
+        
+    Returns:
+        HTTPException: 429 异常
+    """
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def admit_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    在发送响应头之前读取第一个片段：请求被并发限制拒绝时直接返回 429，
+    其他错误仍在流中按所选格式输出
+    
+    Args:
+        chunks: 上游文本片段
+        
+    Returns:
+        AsyncIterator[str]: 包含第一个片段的完整片段流
+        
+    Raises:
+        HTTPException: 请求被并发限制拒绝
+    """
+    iterator = chunks.__aiter__()
+    first: Optional[str] = None
+    error: Optional[Exception] = None
+    try:
+        first = await iterator.__anext__()
+    except StopAsyncIteration:
+        pass
+    except LimiterRejected as e:
+        raise upstream_busy(e)
+    except Exception as e:
+        error = e
+    
+    async def resumed():
+        try:
+            if error is not None:
+                raise error
+            if first is not None:
+                yield first
+                async for chunk in iterator:
+                    yield chunk
+        finally:
+            await iterator.aclose()
+    
+    return resumed()
+
+
+async def stream_response(chunks: AsyncIterator[str], stream_format: str, http_request: Request) -> StreamingResponse:
+    """
+    按格式输出流式响应，客户端断开时立即中止上游请求
+    
+    - plain：合并成帧的纯文本，出错时输出“错误: ...”
+    - sse / ndjson：文本增量、带类型的错误事件和最后的用量统计（首 token 时间、上游耗时、生成速度）
+    
+    Args:
+        chunks: 上游文本片段
+        stream_format: 流式输出格式
+        http_request: 原始请求（用于检测客户端断开）
+        
+    Returns:
+        StreamingResponse: 流式响应
+        
+    Raises:
+        HTTPException: 请求被并发限制拒绝（429）
+    """
+    chunks = cancel_on_disconnect(chunks, http_request.is_disconnected)
+    meter = None
+    if stream_format != "plain":
+        # 从排队前开始计时，首 token 时间包含排队等待
+        meter = StreamMeter()
+        chunks = meter.track(chunks)
+    chunks = await admit_stream(chunks)
+    if meter is not None:
+        # 禁止代理缓冲，事件即时到达客户端
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return StreamingResponse(
+            structured_stream(chunks, stream_format, meter),
+            media_type=STREAM_MEDIA_TYPES[stream_format],
+            headers=headers
+        )
+    
+    async def plain_response():
+        try:
+            # 上游片段合并成帧输出：首个 token 立即发送，之后按大小/时间刷新
+            async for frame in coalesce(chunks):
+                yield frame
+        except Exception as e:
+            yield f"错误: {str(e)}"
+    
+    return StreamingResponse(plain_response(), media_type="text/plain")
+
+
+def batch_response(chain, inputs: List[Dict[str, str]], api_key: str,
+                   max_concurrency: Optional[int], http_request: Request) -> StreamingResponse:
+    """
+    开始批量任务，以 NDJSON 按完成顺序输出每一项的结果
+    
+    - job：第一行，包含任务ID（同时通过 X-Batch-Job-Id 响应头返回）、总项数和并发数
+    - result / error：每一项完成后输出一行，index 为该项在输入列表中的序号
+    - done：最后一行，包含完成状态（completed 或 cancelled）与成功、失败的项数
+    
+    客户端断开或调用 DELETE /langchain/batch/{job_id} 时取消任务
+    
+    Args:
+        chain: 共享的链
+        inputs: 链的输入列表
+        api_key: 认证令牌
+        max_concurrency: 同时执行的项数
+        http_request: 原始请求（用于检测客户端断开）
+        
+    Returns:
+        StreamingResponse: NDJSON 流式响应
+    """
+    job = batch_jobs.start(chain, inputs, auth_token=api_key, max_concurrency=max_concurrency)
+    
+    async def lines():
+        try:
+            async for event in job.events():
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            job.cancel()
+    
+    headers = {"X-Batch-Job-Id": job.id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(
+        cancel_on_disconnect(lines(), http_request.is_disconnected),
+        media_type=STREAM_MEDIA_TYPES["ndjson"],
+        headers=headers
+    )
+
+
+def require_batch() -> None:
+    """批量接口依赖未安装时返回 503"""
+    if not LANGCHAIN_AVAILABLE or not BATCH_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="LangChain 依赖未安装，请先安装依赖：poetry install"
+        )
+
+
 # LangChain 相关路由
 @router.post("/langchain/simple-llm", tags=["LangChain"])
 async def langchain_simple_llm(
@@ -125,9 +403,11 @@ async def langchain_simple_llm(
     
     try:
         # 调用LLM，直接传递auth_token
-        response = simple_llm_call(request.prompt, request.model, auth_token=api_key)
+        response = await simple_llm_call_async(request.prompt, request.model, auth_token=api_key)
         
         return {"response": response}
+    except LimiterRejected as e:
+        raise upstream_busy(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -138,153 +418,118 @@ async def langchain_simple_llm(
 @router.post("/langchain/simple-llm-stream", tags=["LangChain"])
 async def langchain_simple_llm_stream(
     request: SimpleLLMRequest,
-    api_key: str = Depends(get_api_key)
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+    stream_format: str = Depends(get_stream_format)
 ):
     """
     简单LLM调用（流式输出）
     
     Args:
         request: 请求模型，包含提示词和模型名称
+        http_request: 原始请求（用于检测客户端断开）
         api_key: 认证令牌
+        stream_format: 流式输出格式（plain、sse 或 ndjson）
         
     Returns:
         StreamingResponse: 流式响应结果
     """
-    from fastapi.responses import StreamingResponse
-    import asyncio
-    
     if not LANGCHAIN_AVAILABLE:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="LangChain 依赖未安装，请先安装依赖：poetry install"
         )
     
-    async def stream_response():
-        try:
-            # 使用stream方法获取流式响应
-            for chunk in simple_llm_call_stream(request.prompt, request.model, auth_token=api_key):
-                # 输出chunk内容
-                yield chunk
-                # 短暂延迟，模拟流式效果
-                await asyncio.sleep(0.01)
-        except Exception as e:
-            yield f"错误: {str(e)}"
-    
-    return StreamingResponse(stream_response(), media_type="text/plain")
+    replies = simple_llm_call_astream(request.prompt, request.model, auth_token=api_key)
+    return await stream_response(replies, stream_format, http_request)
 
 
 @router.post("/langchain/simple-chain-stream", tags=["LangChain"])
 async def langchain_simple_chain_stream(
     request: SimpleChainRequest,
-    api_key: str = Depends(get_api_key)
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+    stream_format: str = Depends(get_stream_format)
 ):
     """
     简单链调用（流式输出）
     
     Args:
         request: 请求模型，包含输入文本
+        http_request: 原始请求（用于检测客户端断开）
         api_key: 认证令牌
+        stream_format: 流式输出格式（plain、sse 或 ndjson）
         
     Returns:
         StreamingResponse: 流式响应结果
     """
-    from fastapi.responses import StreamingResponse
-    import asyncio
-    
     if not LANGCHAIN_AVAILABLE:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="LangChain 依赖未安装，请先安装依赖：poetry install"
         )
     
-    async def stream_response():
-        try:
-            # 使用stream方法获取流式响应
-            for chunk in run_simple_chain_stream(request.input, auth_token=api_key):
-                # 输出chunk内容
-                yield chunk
-                # 短暂延迟，模拟流式效果
-                await asyncio.sleep(0.01)
-        except Exception as e:
-            yield f"错误: {str(e)}"
-    
-    return StreamingResponse(stream_response(), media_type="text/plain")
+    replies = run_simple_chain_astream(request.input, auth_token=api_key)
+    return await stream_response(replies, stream_format, http_request)
 
 
 @router.post("/langchain/translate-stream", tags=["LangChain"])
 async def langchain_translate_stream(
     request: TranslationRequest,
-    api_key: str = Depends(get_api_key)
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+    stream_format: str = Depends(get_stream_format)
 ):
     """
     翻译功能（流式输出）
     
     Args:
         request: 请求模型，包含要翻译的文本
+        http_request: 原始请求（用于检测客户端断开）
         api_key: 认证令牌
+        stream_format: 流式输出格式（plain、sse 或 ndjson）
         
     Returns:
         StreamingResponse: 流式响应结果
     """
-    from fastapi.responses import StreamingResponse
-    import asyncio
-    
     if not LANGCHAIN_AVAILABLE:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="LangChain 依赖未安装，请先安装依赖：poetry install"
         )
     
-    async def stream_response():
-        try:
-            # 使用stream方法获取流式响应
-            for chunk in translate_text_stream(request.text, auth_token=api_key):
-                # 输出chunk内容
-                yield chunk
-                # 短暂延迟，模拟流式效果
-                await asyncio.sleep(0.01)
-        except Exception as e:
-            yield f"错误: {str(e)}"
-    
-    return StreamingResponse(stream_response(), media_type="text/plain")
+    replies = translate_text_astream(request.text, auth_token=api_key)
+    return await stream_response(replies, stream_format, http_request)
 
 
 @router.post("/model/validate-stream", tags=["模型验证"])
 async def validate_llm_model_stream(
     request: ModelValidationRequest,
-    api_key: str = Depends(get_api_key)
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+    stream_format: str = Depends(get_stream_format)
 ):
     """
     验证模型是否可用（流式输出）
     
     Args:
         request: 请求模型，包含测试提示词
+        http_request: 原始请求（用于检测客户端断开）
         api_key: 认证令牌 (API key)
+        stream_format: 流式输出格式（plain、sse 或 ndjson）
         
     Returns:
         StreamingResponse: 包含验证结果的流式响应
     """
-    from fastapi.responses import StreamingResponse
-    import asyncio
-    
     if not LANGCHAIN_AVAILABLE:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="模型验证功能未可用，请确保依赖已正确安装"
         )
     
-    async def stream_response():
-        try:
-            # 使用stream方法获取流式响应
-            for chunk in validate_model_stream(api_key, request.prompt):
-                # 输出chunk内容
-                yield chunk
-                # 短暂延迟，模拟流式效果
-                await asyncio.sleep(0.01)
-        except Exception as e:
-            yield f"错误: {str(e)}"
-    
-    return StreamingResponse(stream_response(), media_type="text/plain")
+    # 结构化模式下错误以带类型的 error 事件输出，不内联为文本
+    replies = validate_model_astream(api_key, request.prompt, inline_errors=stream_format == "plain")
+    return await stream_response(replies, stream_format, http_request)
 
 
 @router.post("/langchain/simple-chain", tags=["LangChain"])
@@ -310,9 +555,11 @@ async def langchain_simple_chain(
     
     try:
         # 调用链，直接传递auth_token
-        response = run_simple_chain(request.input, auth_token=api_key)
+        response = await run_simple_chain_async(request.input, auth_token=api_key)
         
         return {"response": response}
+    except LimiterRejected as e:
+        raise upstream_busy(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -343,9 +590,11 @@ async def langchain_translate(
     
     try:
         # 调用翻译功能，直接传递auth_token
-        translation = translate_text(request.text, auth_token=api_key)
+        translation = await translate_text_async(request.text, auth_token=api_key)
         
         return {"translation": translation}
+    except LimiterRejected as e:
+        raise upstream_busy(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -353,6 +602,70 @@ async def langchain_translate(
         )
 
 
+@router.post("/langchain/batch", tags=["LangChain"])
+async def langchain_batch(
+    request: BatchRequest,
+    http_request: Request,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    批量简单链调用（各项并发执行，按完成顺序以 NDJSON 返回结果）
+    
+    Args:
+        request: 请求模型，包含输入文本列表和并发数
+        http_request: 原始请求（用于检测客户端断开）
+        api_key: 认证令牌
+        
+    Returns:
+        StreamingResponse: NDJSON 流式响应
+    """
+    require_batch()
+    inputs = [{"input": text} for text in request.inputs]
+    return batch_response(create_simple_chain(), inputs, api_key, request.max_concurrency, http_request)
+
+
+@router.post("/langchain/translate-batch", tags=["LangChain"])
+async def langchain_translate_batch(
+    request: TranslationBatchRequest,
+    http_request: Request,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    批量翻译（各项并发执行，按完成顺序以 NDJSON 返回结果）
+    
+    Args:
+        request: 请求模型，包含要翻译的文本列表和并发数
+        http_request: 原始请求（用于检测客户端断开）
+        api_key: 认证令牌
+        
+    Returns:
+        StreamingResponse: NDJSON 流式响应
+    """
+    require_batch()
+    inputs = [{"text": text} for text in request.texts]
+    return batch_response(create_translation_chain(), inputs, api_key, request.max_concurrency, http_request)
+
+
+@router.delete("/langchain/batch/{job_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["LangChain"])
+async def cancel_langchain_batch(
+    job_id: str,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    取消批量任务（未完成的项不再执行，正在执行的上游调用随之中止）
+    
+    Args:
+        job_id: 任务ID
+        api_key: 认证令牌
+    """
+    require_batch()
+    if not batch_jobs.cancel(job_id, auth_token=api_key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="批量任务不存在或已结束"
+        )
+
+
 # LangGraph 相关路由
 @router.post("/langgraph/conversation", tags=["LangGraph"])
 async def langgraph_conversation(
@@ -375,15 +688,26 @@ async def langgraph_conversation(
             detail="LangGraph 依赖未安装，请先安装依赖：poetry install"
         )
     
+    if request.session_id is not None:
+        require_sessions()
+    
     try:
         # 转换消息格式
         messages = [(msg["role"], msg["content"]) for msg in request.messages]
         
-        # 创建并运行对话工作流，传递auth_token
-        workflow = ConversationWorkflow(auth_token=api_key)
-        result = workflow.run(messages)
+        if request.session_id is not None:
+            # 会话历史保存在服务端，本轮消息通过 add_messages 追加
+            sessions = await get_conversation_sessions()
+            result = await sessions.arun(request.session_id, messages, auth_token=api_key)
+            return {"response": result["messages"][-1].content, "session_id": request.session_id}
+        
+        # 使用共享的已编译工作流，auth_token 通过运行配置传入
+        workflow = get_workflow(ConversationWorkflow)
+        result = await workflow.arun(messages, auth_token=api_key)
         
         return {"response": result["messages"][-1].content}
+    except LimiterRejected as e:
+        raise upstream_busy(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -394,53 +718,72 @@ async def langgraph_conversation(
 @router.post("/langgraph/conversation-stream", tags=["LangGraph"])
 async def langgraph_conversation_stream(
     request: ConversationRequest,
-    api_key: str = Depends(get_api_key)
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+    stream_format: str = Depends(get_stream_format)
 ):
     """
     对话工作流（流式输出）
     
     Args:
         request: 请求模型，包含对话消息列表
+        http_request: 原始请求（用于检测客户端断开）
         api_key: 认证令牌
+        stream_format: 流式输出格式（plain、sse 或 ndjson）
         
     Returns:
         StreamingResponse: 流式响应结果
     """
-    from fastapi.responses import StreamingResponse
-    import asyncio
-    
     if not LANGGRAPH_AVAILABLE:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="LangGraph 依赖未安装，请先安装依赖：poetry install"
         )
     
-    async def stream_response():
-        try:
-            # 转换消息格式
-            messages = [(msg["role"], msg["content"]) for msg in request.messages]
-            
-            # 创建并运行对话工作流，传递auth_token
-            workflow = ConversationWorkflow(auth_token=api_key)
-            
-            # 直接使用LLM的stream方法，而不是通过workflow.stream
-            llm = workflow.llm
-            
-            # 流式生成响应
-            for chunk in llm.stream(messages):
-                if hasattr(chunk, "content") and chunk.content:
-                    # 确保换行符被正确处理
-                    content = chunk.content
-                    # 替换思考过程的标签，使其更美观
-                    content = content.replace("<think>", "\n<think>")
-                    content = content.replace("</think>", "</think>\n")
-                    yield content
-                    # 短暂延迟，模拟流式效果
-                    await asyncio.sleep(0.01)
-        except Exception as e:
-            yield f"错误: {str(e)}"
+    if request.session_id is not None:
+        require_sessions()
+    
+    async def contents():
+        # 转换消息格式
+        messages = [(msg["role"], msg["content"]) for msg in request.messages]
+        
+        if request.session_id is not None:
+            # 会话历史保存在服务端，回复完整生成后写入会话
+            sessions = await get_conversation_sessions()
+            replies = sessions.astream_reply(request.session_id, messages, auth_token=api_key)
+        else:
+            # 使用共享的工作流，直接流式调用对话链，而不是通过workflow.stream
+            replies = get_workflow(ConversationWorkflow).astream_reply(messages, auth_token=api_key)
+        
+        async for content in replies:
+            # 替换思考过程的标签，使其更美观
+            content = content.replace("<think>", "\n<think>")
+            content = content.replace("</think>", "</think>\n")
+            yield content
     
-    return StreamingResponse(stream_response(), media_type="text/plain")
+    # 流式生成响应（合并成帧输出）
+    return await stream_response(contents(), stream_format, http_request)
+
+
+@router.delete("/langgraph/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["LangGraph"])
+async def delete_langgraph_session(
+    session_id: str,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    删除对话会话
+    
+    Args:
+        session_id: 会话ID
+        api_key: 认证令牌
+    """
+    require_sessions()
+    sessions = await get_conversation_sessions()
+    if not await sessions.delete(session_id, auth_token=api_key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="会话不存在"
+        )
 
 
 @router.post("/langgraph/decision", tags=["LangGraph"])
@@ -465,11 +808,13 @@ async def langgraph_decision(
         )
     
     try:
-        # 创建并运行决策工作流，传递auth_token
-        workflow = DecisionWorkflow(auth_token=api_key)
-        result = workflow.run(request.input)
+        # 使用共享的已编译工作流，auth_token 通过运行配置传入
+        workflow = get_workflow(DecisionWorkflow)
+        result = await workflow.arun(request.input, auth_token=api_key)
         
         return {"response": result["messages"][-1].content}
+    except LimiterRejected as e:
+        raise upstream_busy(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -480,89 +825,33 @@ async def langgraph_decision(
 @router.post("/langgraph/decision-stream", tags=["LangGraph"])
 async def langgraph_decision_stream(
     request: DecisionRequest,
-    api_key: str = Depends(get_api_key)
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+    stream_format: str = Depends(get_stream_format)
 ):
     """
     决策工作流（流式输出）
     
     Args:
         request: 请求模型，包含输入内容
+        http_request: 原始请求（用于检测客户端断开）
         api_key: 认证令牌
+        stream_format: 流式输出格式（plain、sse 或 ndjson）
         
     Returns:
         StreamingResponse: 流式响应结果
     """
-    from fastapi.responses import StreamingResponse
-    import asyncio
-    
     if not LANGGRAPH_AVAILABLE:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="LangGraph 依赖未安装，请先安装依赖：poetry install"
         )
     
-    async def stream_response():
-        try:
-            # 创建决策工作流，传递auth_token
-            workflow = DecisionWorkflow(auth_token=api_key)
-            
-            # 先进行分类
-            classification = workflow.llm.invoke([
-                ("system", "请将用户输入分类为以下类型之一：question（问题）、translate（翻译请求）、summarize（总结请求）。只返回类型名称，不要返回其他内容。"),
-                ("user", request.input)
-            ])
-            
-            classification_result = classification.content.lower().strip()
-            
-            # 根据分类结果执行相应的处理
-            if classification_result == "summarize":
-                # 提取需要总结的文本（移除"总结"等关键词）
-                import re
-                text_to_summarize = re.sub(r'^(总结|summarize)[:：]?\s*', '', request.input, flags=re.IGNORECASE)
-                
-                # 构建总结提示
-                summarize_messages = [
-                    ("system", "请总结用户输入的文本，保持简洁明了。"),
-                    ("user", text_to_summarize)
-                ]
-                
-                # 流式生成总结
-                for chunk in workflow.llm.stream(summarize_messages):
-                    if hasattr(chunk, "content") and chunk.content:
-                        yield chunk.content
-                        await asyncio.sleep(0.01)
-            elif classification_result == "translate":
-                # 提取需要翻译的文本（移除"翻译"等关键词）
-                import re
-                text_to_translate = re.sub(r'^(翻译|translate)[:：]?\s*', '', request.input, flags=re.IGNORECASE)
-                
-                # 构建翻译提示
-                translate_messages = [
-                    ("system", "请将用户输入的文本翻译成英文。"),
-                    ("user", text_to_translate)
-                ]
-                
-                # 流式生成翻译
-                for chunk in workflow.llm.stream(translate_messages):
-                    if hasattr(chunk, "content") and chunk.content:
-                        yield chunk.content
-                        await asyncio.sleep(0.01)
-            else:  # question
-                # 构建回答提示
-                answer_messages = [
-                    ("system", "你是一个 helpful 的助手。请用中文回答用户的问题。"),
-                    ("user", request.input)
-                ]
-                
-                # 流式生成回答
-                for chunk in workflow.llm.stream(answer_messages):
-                    if hasattr(chunk, "content") and chunk.content:
-                        yield chunk.content
-                        await asyncio.sleep(0.01)
-        except Exception as e:
-            yield f"错误: {str(e)}"
+    workflow = get_workflow(DecisionWorkflow)
     
-    return StreamingResponse(stream_response(), media_type="text/plain")
+    # 先进行分类，再根据分类结果流式生成回复（提示消息与工作流节点一致，可推测执行）
+    replies = workflow.astream_decision(request.input, auth_token=api_key)
+    return await stream_response(replies, stream_format, http_request)
 
 
 # 模型验证相关路由
@@ -581,7 +870,7 @@ async def validate_llm_model(
     Returns:
         dict: 包含验证结果
     """
-    if validate_model is None:
+    if validate_model_async is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="模型验证功能未可用，请确保依赖已正确安装"
@@ -589,7 +878,7 @@ async def validate_llm_model(
     
     try:
         # 直接调用模型验证函数
-        result = validate_model(api_key, request.prompt)
+        result = await validate_model_async(api_key, request.prompt)
         
         if result["success"]:
             return {
@@ -607,6 +896,8 @@ async def validate_llm_model(
     except HTTPException:
         # 重新抛出HTTPException，保留原始状态码和详情
         raise
+    except LimiterRejected as e:
+        raise upstream_busy(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
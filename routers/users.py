@@ -1,45 +1,69 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List
-from models.database import get_db
-from models.schemas import UserCreate, UserResponse, UserUpdate, PaginatedResponse
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from sqlalchemy import select, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from config import settings
+from models.database import get_async_db
+from models.schemas import (
+    UserCreate, UserResponse, UserUpdate, UserBulkUpdate, PaginatedResponse,
+    BulkDeleteRow, BulkResponse, BulkRowResult
+)
 from models.database import User
+from models.bulk import read_bulk_payload, normalize_id_rows, validate_rows, chunked, build_bulk_response
+from models.pagination import fetch_page, count_cache
+from models.search import can_use_fts, users_match, prefix_pattern
+from models.identity import identity_cache
+from models.cache import user_cache
+from models.conditional import conditional_entity, conditional_page
 
 router = APIRouter()
 
 @router.get("/users", response_model=PaginatedResponse[UserResponse])
 async def get_users(
-    page: int = Query(1, ge=1, description="当前页码"),
+    request: Request,
+    response: Response,
+    page: int = Query(1, ge=1, description="当前页码（游标分页模式下忽略）"),
     page_size: int = Query(10, ge=1, le=100, description="每页记录数"),
-    db: Session = Depends(get_db)
+    search: Optional[str] = Query(None, description="搜索关键词（匹配用户名或邮箱）"),
+    cursor: Optional[str] = Query(None, description="分页游标，传入时使用游标分页（取自上一页的 next_cursor）"),
+    sort: str = Query("id", pattern="^(id|created_at)$", description="排序方式：id 或 created_at"),
+    count_mode: str = Query("exact", pattern="^(exact|estimate|none)$", description="总数策略：exact / estimate / none"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取用户列表（支持分页）"""
-    # 计算总记录数
-    total = db.query(User).filter(User.is_active == True).count()
+    """获取用户列表（支持搜索，以及偏移分页和游标分页两种模式）"""
+    query = select(User).where(User.is_active == True)
     
-    # 计算总页数
-    total_pages = (total + page_size - 1) // page_size
+    # 搜索过滤：关键词足够长时走 FTS5 全文索引做子串匹配，否则按前缀匹配（使用 NOCASE 索引）
+    if search and can_use_fts(search):
+        query = query.where(User.id.in_(select(users_match(search).subquery().c.id)))
+    elif search:
+        pattern = prefix_pattern(search)
+        query = query.where(
+            (User.username.like(pattern, escape="/")) |
+            (User.email.like(pattern, escape="/"))
+        )
     
-    # 计算跳过的记录数
-    skip = (page - 1) * page_size
+    # 查询数据并按总数策略计算总记录数
+    result = await fetch_page(
+        db, query, User, count_key=search or "",
+        page=page, page_size=page_size, cursor=cursor, sort=sort, count_mode=count_mode,
+        if_none_match=request.headers.get("if-none-match")
+    )
     
-    # 查询数据
-    users = db.query(User).filter(User.is_active == True).offset(skip).limit(page_size).all()
+    # 本页未变化时返回 304，不再序列化响应体
+    not_modified = conditional_page(response, result.pop("etag"), result.pop("not_modified"))
+    if not_modified is not None:
+        return not_modified
     
     # 返回包含分页信息的响应
-    return PaginatedResponse(
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
-        data=users
-    )
+    return PaginatedResponse(**result)
 
 @router.post("/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """创建新用户"""
     # 检查用户名是否已存在
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user.username))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -47,7 +71,7 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # 检查邮箱是否已存在
-    existing_email = db.query(User).filter(User.email == user.email).first()
+    existing_email = await db.scalar(select(User).where(User.email == user.email))
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -61,25 +85,185 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
         full_name=user.full_name
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    count_cache.invalidate(User.__tablename__)
+    # 新的活跃用户可能成为当前用户（例如此前没有活跃用户）
+    identity_cache.invalidate()
+    await db.refresh(db_user)
     return db_user
 
-@router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
-    """根据ID获取用户信息"""
-    user = db.query(User).filter(User.id == user_id, User.is_active == True).first()
-    if not user:
+@router.post("/users/bulk", response_model=BulkResponse)
+async def bulk_create_users(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    批量创建用户
+    
+    请求体为 UserCreate 的 JSON 数组，或 Content-Type: application/x-ndjson 的逐行 JSON。
+    用户名/邮箱重复的行标记为失败，其余行在同一事务中按批次 executemany 写入。
+    """
+    rows = await read_bulk_payload(request)
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+    valid = validate_rows(rows, UserCreate, results)
+    seen_usernames = set()
+    seen_emails = set()
+    
+    try:
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            # 一次查出本批中已存在的用户名和邮箱
+            existing_usernames = set(await db.scalars(
+                select(User.username).where(User.username.in_([user.username for _, user in chunk]))
+            ))
+            existing_emails = set(await db.scalars(
+                select(User.email).where(User.email.in_([user.email for _, user in chunk]))
+            ))
+            to_insert = []
+            for index, user in chunk:
+                if user.username in existing_usernames or user.username in seen_usernames:
+                    results[index] = BulkRowResult(index=index, status="error", error="用户名已存在")
+                elif user.email in existing_emails or user.email in seen_emails:
+                    results[index] = BulkRowResult(index=index, status="error", error="邮箱已存在")
+                else:
+                    seen_usernames.add(user.username)
+                    seen_emails.add(user.email)
+                    to_insert.append((index, user))
+            if not to_insert:
+                continue
+            # RETURNING 不保证与参数顺序一致，按唯一的用户名回填ID
+            index_by_username = {user.username: index for index, user in to_insert}
+            returned = await db.execute(
+                insert(User.__table__).returning(User.__table__.c.id, User.__table__.c.username),
+                [
+                    {"username": user.username, "email": user.email, "full_name": user.full_name}
+                    for _, user in to_insert
+                ]
+            )
+            for user_id, username in returned:
+                index = index_by_username[username]
+                results[index] = BulkRowResult(index=index, status="created", id=user_id)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"批量写入失败，已回滚: {str(e)}"
         )
+    
+    count_cache.invalidate(User.__tablename__)
+    identity_cache.invalidate()
+    return build_bulk_response(results)
+
+@router.put("/users/bulk", response_model=BulkResponse)
+async def bulk_update_users(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    批量更新用户
+    
+    请求体为 UserBulkUpdate（UserUpdate 字段 + id）的 JSON 数组或 NDJSON，只能更新激活状态的用户。
+    """
+    rows = await read_bulk_payload(request)
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+    valid = validate_rows(rows, UserBulkUpdate, results)
+    status_changed = False
+    
+    try:
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            active_ids = set(await db.scalars(
+                select(User.id).where(User.id.in_([row.id for _, row in chunk]), User.is_active == True)
+            ))
+            params = []
+            for index, row in chunk:
+                if row.id not in active_ids:
+                    results[index] = BulkRowResult(index=index, status="error", id=row.id, error="用户不存在")
+                    continue
+                update_data = row.model_dump(exclude_unset=True)
+                if len(update_data) > 1:
+                    params.append(update_data)
+                results[index] = BulkRowResult(index=index, status="updated", id=row.id)
+            if params:
+                await db.execute(update(User), params)
+                status_changed = status_changed or any("is_active" in data for data in params)
+        await db.commit()
+        for result in results:
+            if result is not None and result.status == "updated":
+                user_cache.invalidate(result.id)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"批量更新失败，已回滚: {str(e)}"
+        )
+    
+    count_cache.invalidate(User.__tablename__)
+    if status_changed:
+        identity_cache.invalidate()
+    return build_bulk_response(results)
+
+@router.delete("/users/bulk", response_model=BulkResponse)
+async def bulk_delete_users(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    批量软删除用户（设置为非活跃状态）
+    
+    请求体为用户ID数组（或 {"id": ...} 对象数组 / NDJSON）。
+    """
+    rows = normalize_id_rows(await read_bulk_payload(request))
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+    valid = validate_rows(rows, BulkDeleteRow, results)
+    
+    try:
+        for chunk in chunked(valid, settings.BULK_CHUNK_SIZE):
+            ids = [row.id for _, row in chunk]
+            existing_ids = set(await db.scalars(select(User.id).where(User.id.in_(ids))))
+            for index, row in chunk:
+                if row.id in existing_ids:
+                    results[index] = BulkRowResult(index=index, status="deleted", id=row.id)
+                else:
+                    results[index] = BulkRowResult(index=index, status="error", id=row.id, error="用户不存在")
+            if existing_ids:
+                await db.execute(
+                    update(User).where(User.id.in_(existing_ids)).values(is_active=False)
+                    .execution_options(synchronize_session=False)
+                )
+        await db.commit()
+        for result in results:
+            if result is not None and result.status == "deleted":
+                user_cache.invalidate(result.id)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"批量删除失败，已回滚: {str(e)}"
+        )
+    
+    count_cache.invalidate(User.__tablename__)
+    identity_cache.invalidate()
+    return build_bulk_response(results)
+
+@router.get("/users/{user_id}", response_model=UserResponse)
+async def get_user(
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """根据ID获取用户信息（读穿透缓存，只缓存激活状态的用户；支持条件请求）"""
+    user = user_cache.get(user_id)
+    if user is None:
+        db_user = await db.scalar(select(User).where(User.id == user_id, User.is_active == True))
+        if not db_user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="用户不存在"
+            )
+        user = user_cache.set(user_id, db_user)
+    
+    # 用户未变化时返回 304，不再序列化响应体
+    not_modified = conditional_entity(request, response, user)
+    if not_modified is not None:
+        return not_modified
     return user
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(user_id: int, user_update: UserUpdate, db: AsyncSession = Depends(get_async_db)):
     """更新用户信息"""
-    user = db.query(User).filter(User.id == user_id, User.is_active == True).first()
+    user = await db.scalar(select(User).where(User.id == user_id, User.is_active == True))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -88,22 +272,37 @@ async def update_user(user_id: int, user_update: UserUpdate, db: Session = Depen
     
     # 更新字段
     update_data = user_update.model_dump(exclude_unset=True)
+    status_changed = "is_active" in update_data and update_data["is_active"] != user.is_active
     for field, value in update_data.items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    count_cache.invalidate(User.__tablename__)
+    # 激活状态变化会影响当前用户解析
+    if status_changed:
+        identity_cache.invalidate()
+    await db.refresh(user)
+    # 写穿透：仍为激活状态时用更新后的数据覆盖缓存，否则失效
+    if user.is_active:
+        return user_cache.set(user_id, user)
+    user_cache.invalidate(user_id)
     return user
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """软删除用户（设置为非活跃状态）"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
         )
     
+    status_changed = user.is_active
     user.is_active = False
-    db.commit()
\ No newline at end of file
+    await db.commit()
+    count_cache.invalidate(User.__tablename__)
+    user_cache.invalidate(user_id)
+    # 激活状态变化会影响当前用户解析
+    if status_changed:
+        identity_cache.invalidate()
@@ -0,0 +1,238 @@
+"""上游自适应并发限制器测试（直接驱动 AdaptiveLimiter，不依赖上游服务）"""
+
+import asyncio
+
+import pytest
+
+from inference import limiter as limiter_module
+from inference.limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_DEFAULT,
+    PRIORITY_INTERACTIVE,
+    AdaptiveLimiter,
+    LimiterRejected
+)
+
+
+def make_limiter(**kwargs) -> AdaptiveLimiter:
+    """构造测试用的限制器（默认并发上限 1，上下限固定）"""
+    options = {"initial": 1, "min_limit": 1, "max_limit": 1, "max_queue": 4, "queue_timeout": 5.0}
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+
+async def settle() -> None:
+    """让已就绪的任务运行到下一个等待点"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestAdaptiveLimiter:
+    """AdaptiveLimiter 排队、挤出、超时、取消与 AIMD 调整"""
+
+    def test_queued_requests_admitted_by_priority(self):
+        """名额释放后按优先级出队，同优先级先到先得"""
+        async def scenario():
+            limiter = make_limiter()
+            order = []
+
+            async def call(name, priority):
+                async with limiter.acquire(priority):
+                    order.append(name)
+
+            await limiter._acquire(PRIORITY_DEFAULT)
+            tasks = [
+                asyncio.ensure_future(call("batch", PRIORITY_BATCH)),
+                asyncio.ensure_future(call("default", PRIORITY_DEFAULT)),
+                asyncio.ensure_future(call("interactive-1", PRIORITY_INTERACTIVE)),
+                asyncio.ensure_future(call("interactive-2", PRIORITY_INTERACTIVE)),
+            ]
+            await settle()
+            assert limiter.stats()["queue_depth"] == 4
+
+            limiter._release(0.01)
+            await asyncio.gather(*tasks)
+            assert order == ["interactive-1", "interactive-2", "default", "batch"]
+            assert limiter.in_flight == 0
+            assert limiter.stats()["queue_depth"] == 0
+
+        asyncio.run(scenario())
+
+    def test_displacement_rejects_lowest_priority_waiter(self):
+        """队列已满时，高优先级请求挤出排在最后的低优先级请求，排队数不超过上限"""
+        async def scenario():
+            limiter = make_limiter(max_queue=2)
+            await limiter._acquire(PRIORITY_DEFAULT)
+
+            async def call(priority):
+                async with limiter.acquire(priority):
+                    return priority
+
+            first_batch = asyncio.ensure_future(call(PRIORITY_BATCH))
+            second_batch = asyncio.ensure_future(call(PRIORITY_BATCH))
+            await settle()
+            interactive = asyncio.ensure_future(call(PRIORITY_INTERACTIVE))
+            await settle()
+
+            # 后到的批量请求被挤出
+            assert second_batch.done()
+            with pytest.raises(LimiterRejected) as info:
+                second_batch.result()
+            assert info.value.reason == "queue_full"
+            assert limiter.stats()["queue_depth"] == 2
+
+            # 同等或更低优先级的请求不能挤出别人，直接被拒绝
+            with pytest.raises(LimiterRejected):
+                await call(PRIORITY_BATCH)
+            assert limiter.stats()["queue_depth"] == 2
+            assert limiter.stats()["rejected_queue_full"] == 2
+
+            limiter._release(0.01)
+            assert await interactive == PRIORITY_INTERACTIVE
+            assert await first_batch == PRIORITY_BATCH
+            assert limiter.in_flight == 0
+            assert limiter.stats()["queue_depth"] == 0
+
+        asyncio.run(scenario())
+
+    def test_queue_timeout_rejects(self):
+        """排队超时时拒绝，并从排队数中扣除"""
+        async def scenario():
+            limiter = make_limiter(queue_timeout=0.05)
+            await limiter._acquire(PRIORITY_DEFAULT)
+            with pytest.raises(LimiterRejected) as info:
+                async with limiter.acquire(PRIORITY_BATCH):
+                    pass
+            assert info.value.reason == "timeout"
+            assert info.value.retry_after >= 1
+            assert limiter.stats()["queue_depth"] == 0
+            assert limiter.stats()["rejected_timeout"] == 1
+
+            # 超时的请求不会再占用随后释放的名额
+            limiter._release(0.01)
+            assert limiter.in_flight == 0
+
+        asyncio.run(scenario())
+
+    def test_slot_granted_at_timeout_is_kept(self, monkeypatch):
+        """排队超时的同时已分配到名额时，请求照常执行，名额不会丢失"""
+        async def scenario():
+            limiter = make_limiter()
+            await limiter._acquire(PRIORITY_DEFAULT)
+
+            async def granted_then_timeout(future, timeout):
+                # 持有者恰好在超时时刻释放名额，名额已交给排队的请求
+                limiter._release_slot()
+                assert future.done()
+                raise asyncio.TimeoutError()
+
+            monkeypatch.setattr(limiter_module.asyncio, "wait_for", granted_then_timeout)
+            async with limiter.acquire(PRIORITY_DEFAULT):
+                assert limiter.in_flight == 1
+            monkeypatch.undo()
+
+            assert limiter.in_flight == 0
+            assert limiter.stats()["rejected_timeout"] == 0
+            assert limiter.stats()["queue_depth"] == 0
+
+        asyncio.run(scenario())
+
+    def test_cancel_while_queued(self):
+        """排队期间取消时移出队列，之后释放的名额交给下一个请求"""
+        async def scenario():
+            limiter = make_limiter()
+            await limiter._acquire(PRIORITY_DEFAULT)
+
+            async def call():
+                async with limiter.acquire(PRIORITY_DEFAULT):
+                    return True
+
+            cancelled = asyncio.ensure_future(call())
+            waiting = asyncio.ensure_future(call())
+            await settle()
+            cancelled.cancel()
+            await settle()
+            assert cancelled.cancelled()
+            assert limiter.stats()["queue_depth"] == 1
+
+            limiter._release(0.01)
+            assert await waiting
+            assert limiter.in_flight == 0
+            assert limiter.stats()["queue_depth"] == 0
+
+        asyncio.run(scenario())
+
+    def test_cancel_after_slot_granted(self, monkeypatch):
+        """名额已分配但请求尚未恢复执行时被取消，名额立即归还"""
+        async def scenario():
+            limiter = make_limiter()
+            await limiter._acquire(PRIORITY_DEFAULT)
+
+            async def granted_then_cancelled(future, timeout):
+                # 持有者释放名额交给排队的请求，请求恢复执行前被取消（如客户端断开）
+                limiter._release_slot()
+                assert future.done()
+                raise asyncio.CancelledError()
+
+            monkeypatch.setattr(limiter_module.asyncio, "wait_for", granted_then_cancelled)
+            with pytest.raises(asyncio.CancelledError):
+                async with limiter.acquire(PRIORITY_DEFAULT):
+                    pass
+            monkeypatch.undo()
+
+            assert limiter.in_flight == 0
+            assert limiter.stats()["queue_depth"] == 0
+
+        asyncio.run(scenario())
+
+    def test_additive_increase(self):
+        """并发接近上限时，每个调用结束放宽 1/limit"""
+        async def scenario():
+            limiter = make_limiter(initial=4, min_limit=1, max_limit=10)
+            for _ in range(4):
+                await limiter._acquire(PRIORITY_DEFAULT)
+            limiter._release(0.01)
+            assert limiter.limit == pytest.approx(4.25)
+            assert limiter.stats()["increases"] == 1
+
+            # 并发低于上限的一半时不放宽
+            for _ in range(3):
+                limiter._release(0.01)
+            assert limiter.stats()["increases"] == 2
+            assert limiter.in_flight == 0
+
+        asyncio.run(scenario())
+
+    def test_overload_decrease_with_cooldown(self):
+        """上游过载时减半（不低于下限），调用平均占用时长内只收紧一次"""
+        limiter = make_limiter(initial=32, min_limit=4, max_limit=64)
+        limiter._hold = 10.0
+        limiter.observe_overload()
+        assert limiter.limit == 16
+        limiter.observe_overload()
+        assert limiter.limit == 16
+        assert limiter.stats()["decreases"] == 1
+
+        limiter._last_decrease -= 11.0
+        limiter.observe_overload()
+        assert limiter.limit == 8
+        limiter._last_decrease -= 11.0
+        limiter.observe_overload()
+        limiter._last_decrease -= 11.0
+        limiter.observe_overload()
+        assert limiter.limit == 4
+
+    def test_latency_decrease(self):
+        """平滑后的首字节延迟明显高于空载水平时收紧，轻微抖动不收紧"""
+        limiter = make_limiter(initial=20, min_limit=4, max_limit=64, tolerance=2.0)
+        limiter._hold = 0.0
+        for _ in range(10):
+            limiter.observe_latency(0.1)
+        limiter.observe_latency(0.12)
+        assert limiter.limit == 20
+        assert limiter.baseline() == pytest.approx(0.1)
+
+        for _ in range(30):
+            limiter.observe_latency(1.0)
+        assert limiter.limit < 20
+        assert limiter.stats()["decreases"] >= 1
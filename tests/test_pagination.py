@@ -0,0 +1,84 @@
+"""游标分页辅助函数测试"""
+
+import base64
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from models.pagination import decode_cursor, encode_cursor, split_page
+
+
+def raw_cursor(payload) -> str:
+    """按游标格式编码任意内容"""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+class TestCursor:
+    """游标编解码"""
+
+    def test_round_trip_by_id(self):
+        """按主键排序的游标可以还原排序键"""
+        cursor = encode_cursor("id", SimpleNamespace(id=42))
+        assert "=" not in cursor
+        assert decode_cursor(cursor, "id") == [42]
+
+    def test_round_trip_by_created_at(self):
+        """按创建时间排序的游标保留时间（含微秒）与主键"""
+        created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+        cursor = encode_cursor("created_at", SimpleNamespace(id=7, created_at=created_at))
+        assert decode_cursor(cursor, "created_at") == [created_at, 7]
+
+    def test_cursor_is_url_safe(self):
+        """游标只包含 URL 安全字符"""
+        cursor = encode_cursor("created_at", SimpleNamespace(id=10 ** 12, created_at=datetime(2024, 1, 1)))
+        assert all(c.isalnum() or c in "-_" for c in cursor)
+
+    def test_sort_mismatch(self):
+        """游标与当前排序方式不匹配时返回 400"""
+        cursor = encode_cursor("id", SimpleNamespace(id=1))
+        with pytest.raises(HTTPException) as info:
+            decode_cursor(cursor, "created_at")
+        assert info.value.status_code == 400
+        assert info.value.detail == "分页游标与排序方式不匹配"
+
+    @pytest.mark.parametrize("cursor", [
+        "not-a-cursor",
+        "游标",
+        raw_cursor([1, 2]),
+        raw_cursor({"s": "id"}),
+        raw_cursor({"s": "id", "k": 5}),
+    ])
+    def test_invalid_cursor(self, cursor):
+        """格式错误的游标返回 400"""
+        with pytest.raises(HTTPException) as info:
+            decode_cursor(cursor, "id")
+        assert info.value.status_code == 400
+        assert info.value.detail == "无效的分页游标"
+
+    def test_wrong_key_count(self):
+        """排序键数量与排序方式不一致时返回 400"""
+        with pytest.raises(HTTPException) as info:
+            decode_cursor(raw_cursor({"s": "created_at", "k": [1]}), "created_at")
+        assert info.value.status_code == 400
+
+
+class TestSplitPage:
+    """多取一行的结果拆分为当前页与下一页游标"""
+
+    def test_has_next_page(self):
+        """多取到一行时返回本页最后一行的游标"""
+        rows = [SimpleNamespace(id=i) for i in range(1, 5)]
+        page, next_cursor = split_page(rows, 3, "id")
+        assert [row.id for row in page] == [1, 2, 3]
+        assert decode_cursor(next_cursor, "id") == [3]
+
+    def test_last_page(self):
+        """没有多取到行时没有下一页"""
+        rows = [SimpleNamespace(id=i) for i in range(1, 4)]
+        page, next_cursor = split_page(rows, 3, "id")
+        assert len(page) == 3
+        assert next_cursor is None
+        assert split_page([], 3, "id") == ([], None)
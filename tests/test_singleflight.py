@@ -0,0 +1,193 @@
+"""上游请求合并（single-flight）测试"""
+
+import asyncio
+
+import pytest
+
+from inference.singleflight import SingleFlight
+
+
+async def settle() -> None:
+    """让已就绪的任务运行到下一个等待点"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class FakeUpstream:
+    """模拟上游：记录调用次数，由测试控制何时返回结果或下一个片段"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.closed = 0
+        self.release = asyncio.Event()
+        self.chunks: asyncio.Queue = asyncio.Queue()
+
+    async def complete(self, result="reply", error=None):
+        """非流式调用：等待 release 后返回结果或抛出异常"""
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if error is not None:
+            raise error
+        return {"content": result}
+
+    async def stream(self):
+        """流式调用：依次输出 chunks 中的片段，遇到 None 结束，遇到异常时抛出"""
+        self.calls += 1
+        try:
+            while True:
+                chunk = await self.chunks.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            self.closed += 1
+
+
+async def collect(chunks, into):
+    """读取全部片段"""
+    async for chunk in chunks:
+        into.append(chunk)
+    return into
+
+
+class TestSingleFlightDo:
+    """非流式调用合并"""
+
+    def test_concurrent_calls_share_one_upstream_call(self):
+        """相同 key 的并发调用只发起一次上游调用，所有等待者得到同一个结果"""
+        async def scenario():
+            flight, upstream = SingleFlight(), FakeUpstream()
+            waiters = [asyncio.ensure_future(flight.do("k", upstream.complete)) for _ in range(3)]
+            await settle()
+            upstream.release.set()
+            results = await asyncio.gather(*waiters)
+            assert upstream.calls == 1
+            assert all(result is results[0] for result in results)
+            assert flight.stats() == {"leaders": 1, "coalesced": 2, "in_flight": 0}
+
+        asyncio.run(scenario())
+
+    def test_leader_error_reaches_every_waiter(self):
+        """上游调用的异常传给每一个等待者"""
+        async def scenario():
+            flight, upstream = SingleFlight(), FakeUpstream()
+            error = RuntimeError("upstream failed")
+            waiters = [
+                asyncio.ensure_future(flight.do("k", lambda: upstream.complete(error=error)))
+                for _ in range(3)
+            ]
+            await settle()
+            upstream.release.set()
+            results = await asyncio.gather(*waiters, return_exceptions=True)
+            assert results == [error, error, error]
+            assert upstream.calls == 1
+
+        asyncio.run(scenario())
+
+    def test_disconnecting_waiter_does_not_cancel_shared_call(self):
+        """一个等待者离开（如客户端断开）时，其余等待者仍拿到结果；全部离开时取消上游调用"""
+        async def scenario():
+            flight, upstream = SingleFlight(), FakeUpstream()
+            leader = asyncio.ensure_future(flight.do("k", upstream.complete))
+            follower = asyncio.ensure_future(flight.do("k", upstream.complete))
+            await settle()
+            leader.cancel()
+            await settle()
+            assert upstream.cancelled == 0
+            upstream.release.set()
+            assert await follower == {"content": "reply"}
+            assert upstream.calls == 1
+
+            upstream.release.clear()
+            only = asyncio.ensure_future(flight.do("k2", upstream.complete))
+            await settle()
+            only.cancel()
+            await settle()
+            assert upstream.cancelled == 1
+            assert flight.stats()["in_flight"] == 0
+
+        asyncio.run(scenario())
+
+
+class TestSingleFlightStream:
+    """流式调用扇出"""
+
+    def test_late_joiner_replays_earlier_chunks(self):
+        """中途加入的订阅者先收到已经输出的片段，再继续接收后续片段"""
+        async def scenario():
+            flight, upstream = SingleFlight(), FakeUpstream()
+            first = asyncio.ensure_future(collect(flight.stream("k", upstream.stream), []))
+            upstream.chunks.put_nowait("a")
+            upstream.chunks.put_nowait("b")
+            await settle()
+            late = asyncio.ensure_future(collect(flight.stream("k", upstream.stream), []))
+            await settle()
+            upstream.chunks.put_nowait("c")
+            upstream.chunks.put_nowait(None)
+            assert await first == ["a", "b", "c"]
+            assert await late == ["a", "b", "c"]
+            assert upstream.calls == 1
+            assert upstream.closed == 1
+
+        asyncio.run(scenario())
+
+    def test_upstream_error_reaches_every_subscriber(self):
+        """上游流出错时，每个订阅者先收到已输出的片段再收到异常"""
+        async def scenario():
+            flight, upstream = SingleFlight(), FakeUpstream()
+            received = [[], []]
+            subscribers = [asyncio.ensure_future(collect(flight.stream("k", upstream.stream), into))
+                           for into in received]
+            upstream.chunks.put_nowait("a")
+            error = RuntimeError("stream broke")
+            upstream.chunks.put_nowait(error)
+            results = await asyncio.gather(*subscribers, return_exceptions=True)
+            assert results == [error, error]
+            assert received == [["a"], ["a"]]
+
+        asyncio.run(scenario())
+
+    def test_disconnecting_subscriber_does_not_stop_stream(self):
+        """一个订阅者离开时上游流继续；所有订阅者离开时关闭上游流"""
+        async def scenario():
+            flight, upstream = SingleFlight(), FakeUpstream()
+            leaving = flight.stream("k", upstream.stream)
+            staying = asyncio.ensure_future(collect(flight.stream("k", upstream.stream), []))
+            upstream.chunks.put_nowait("a")
+            assert await leaving.__anext__() == "a"
+            await leaving.aclose()
+            await settle()
+            assert upstream.closed == 0
+
+            upstream.chunks.put_nowait("b")
+            upstream.chunks.put_nowait(None)
+            assert await staying == ["a", "b"]
+
+            only = flight.stream("k2", upstream.stream)
+            upstream.chunks.put_nowait("x")
+            assert await only.__anext__() == "x"
+            await only.aclose()
+            await settle()
+            assert upstream.closed == 2
+            assert flight.stats()["in_flight"] == 0
+
+        asyncio.run(scenario())
+
+    def test_cancelled_upstream_raises_for_remaining_subscribers(self):
+        """上游读取被取消时，仍在等待的订阅者收到 CancelledError 而不是挂起"""
+        async def scenario():
+            flight, upstream = SingleFlight(), FakeUpstream()
+            subscriber = asyncio.ensure_future(collect(flight.stream("k", upstream.stream), []))
+            await settle()
+            flight._streams["k"].task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await subscriber
+
+        asyncio.run(scenario())
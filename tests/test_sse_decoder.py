@@ -0,0 +1,98 @@
+"""增量 SSE 解码器测试"""
+
+import json
+
+import pytest
+
+from inference.client import STREAM_DONE, LLMAPIError, SSEDecoder, decode_sse_line
+
+
+def event(content: str, **extra) -> bytes:
+    """构造一行增量事件"""
+    body = {"choices": [{"delta": {"content": content}}], **extra}
+    return b"data: " + json.dumps(body, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+
+CONTENTS = ["你好", "，世界", " ✓ emoji 😀", 'quote "x"\nnew line', "", "末尾"]
+STREAM = b"".join(event(content) for content in CONTENTS) + b"data: [DONE]\n\n"
+EXPECTED = [content for content in CONTENTS if content]
+
+
+def decode_chunks(chunks) -> list:
+    """按块输入解码器，返回解析出的全部内容"""
+    decoder = SSEDecoder()
+    contents = []
+    for chunk in chunks:
+        contents.extend(decoder.feed(chunk))
+    contents.extend(decoder.flush())
+    assert decoder.done
+    return contents
+
+
+class TestSSEDecoder:
+    """SSEDecoder 跨块切分、结束标记与错误处理"""
+
+    def test_whole_stream(self):
+        """整块输入"""
+        assert decode_chunks([STREAM]) == EXPECTED
+
+    def test_every_split_point(self):
+        """在任意字节处切成两块（包括多字节字符中间和换行符两侧）结果都相同"""
+        for split in range(1, len(STREAM)):
+            assert decode_chunks([STREAM[:split], STREAM[split:]]) == EXPECTED, split
+
+    def test_byte_by_byte(self):
+        """逐字节输入"""
+        assert decode_chunks([STREAM[i:i + 1] for i in range(len(STREAM))]) == EXPECTED
+
+    def test_crlf_line_endings(self):
+        """CRLF 换行，且 \\r 与 \\n 分在两块"""
+        stream = STREAM.replace(b"\n", b"\r\n")
+        index = stream.index(b"\r\n")
+        assert decode_chunks([stream[:index + 1], stream[index + 1:]]) == EXPECTED
+
+    def test_content_after_done_is_ignored(self):
+        """结束标记之后的内容被忽略"""
+        decoder = SSEDecoder()
+        assert decoder.feed(event("a") + b"data: [DONE]\n" + event("b")) == ["a"]
+        assert decoder.done
+        assert decoder.feed(event("c")) == []
+
+    def test_last_line_without_newline(self):
+        """上游没有以换行符结尾时，flush 解析最后一行"""
+        decoder = SSEDecoder()
+        assert decoder.feed(event("a") + b'data: {"choices":[{"delta":{"content":"b"}}]}') == ["a"]
+        assert decoder.flush() == ["b"]
+        assert not decoder.done
+
+    def test_comments_and_non_content_lines(self):
+        """注释行、空行、无 content 的事件和无法解析的行被跳过"""
+        decoder = SSEDecoder()
+        chunk = b": keep-alive\n\ndata: {\"choices\":[{\"delta\":{\"role\":\"assistant\"}}]}\ndata: not json\n" + event("x")
+        assert decoder.feed(chunk) == ["x"]
+
+    def test_error_event_raises(self):
+        """流中返回 error 字段时抛出 LLMAPIError（字符串形式的 error 也能处理）"""
+        decoder = SSEDecoder()
+        with pytest.raises(LLMAPIError, match="rate limited"):
+            decoder.feed(b'data: {"error": {"message": "rate limited"}}\n')
+        with pytest.raises(LLMAPIError, match="boom"):
+            SSEDecoder().feed(b'data: {"error": "boom", "choices": [{"delta": {"content": "x"}}]}\n')
+
+
+class TestDecodeSSELine:
+    """单行解析（快速路径与完整 JSON 解析结果一致）"""
+
+    @pytest.mark.parametrize("line, expected", [
+        (b'data: {"choices":[{"delta":{"content":"plain"}}]}', "plain"),
+        (b'data: {"choices": [{"delta": {"content": "spaced"}}]}', "spaced"),
+        (b'data:{"choices":[{"delta":{"content":"\\u4f60\\"\\n"}}]}', '你"\n'),
+        ('data: {"choices":[{"delta":{"content":"中文"}}]}', "中文"),
+        (b'data: {"choices":[{"delta":{"content":null}}]}', ""),
+        (b"data: [DONE]", STREAM_DONE),
+        (b"", None),
+        (b": comment", None),
+    ])
+    def test_decode(self, line, expected):
+        """bytes 与 str 输入、转义字符、空内容、结束标记和注释行"""
+        assert decode_sse_line(line) == expected
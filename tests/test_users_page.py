@@ -136,6 +136,26 @@ class TestUsersPage:
         page.wait_for_selector('#usersTableBody tr')
         expect(page.locator('#usersTableBody tr')).to_have_count(10)
 
+    def test_search_users_as_you_type(self, setup: Page):
+        """测试输入时自动触发服务端搜索（防抖）"""
+        page = setup
+        page.wait_for_selector('#usersTableBody tr')
+
+        # 短关键词按用户名/邮箱前缀匹配，不点击搜索按钮
+        page.fill('#searchInput', 'al')
+        rows = page.locator('#usersTableBody tr')
+        expect(rows).to_have_count(1)
+        expect(rows.locator('td:nth-child(2)')).to_have_text('alice_wang')
+
+        # 长关键词按子串匹配
+        page.fill('#searchInput', 'smith')
+        expect(rows).to_have_count(1)
+        expect(rows.locator('td:nth-child(2)')).to_have_text('jane_smith')
+
+        # 重置搜索
+        page.click('button:has-text("重置")')
+        expect(page.locator('#usersTableBody tr')).to_have_count(10)
+
     def test_pagination(self, setup: Page):
         """测试分页功能"""
         page = setup